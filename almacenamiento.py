@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escritura de archivos subidos para la WebApp
+Guardado atómico (temporal + rename) y concurrente mediante un pool de hilos,
+con deduplicación por hash de contenido. Borrado en dos pasos: apartar
+(rename a una papelera) y purgar en segundo plano.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+# Hilos para escritura de archivos (I/O, no CPU)
+WORKERS_ESCRITURA = min(16, (os.cpu_count() or 1) * 4)
+
+# Cantidad de archivos por lote antes de sincronizar el directorio
+TAMANO_LOTE_FSYNC = 256
+
+# Entradas borradas entre avisos de progreso al purgar la papelera
+TAMANO_LOTE_PURGA = 500
+
+_pool_escritura = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool_escritura():
+    """Devuelve el pool de hilos compartido para escrituras (creación perezosa)"""
+    global _pool_escritura
+    with _pool_lock:
+        if _pool_escritura is None:
+            # Importado recién acá: quien solo usa guardar_atomico (mapeo de
+            # logos, estado) no carga concurrent.futures
+            from concurrent.futures import ThreadPoolExecutor
+
+            _pool_escritura = ThreadPoolExecutor(
+                max_workers=WORKERS_ESCRITURA,
+                thread_name_prefix='escritura'
+            )
+        return _pool_escritura
+
+
+def _escribir_temporal(origen, destino, fsync=True):
+    """
+    Escribe el contenido en un temporal oculto junto al destino
+
+    Returns:
+        Ruta (str) del temporal escrito
+    """
+    destino = Path(destino)
+    fd, temporal = tempfile.mkstemp(dir=destino.parent,
+                                    prefix=f'.{destino.name}.',
+                                    suffix='.tmp')
+    try:
+        # mkstemp crea con permisos 0600; dejar los habituales de un archivo subido
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(origen, (bytes, bytearray, memoryview)):
+                f.write(origen)
+            else:
+                stream = getattr(origen, 'stream', origen)
+                shutil.copyfileobj(stream, f, 1024 * 1024)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        _eliminar_silencioso(temporal)
+        raise
+
+    return temporal
+
+
+def _eliminar_silencioso(ruta):
+    """Elimina un archivo ignorando errores (limpieza de temporales)"""
+    try:
+        os.unlink(ruta)
+    except OSError:
+        pass
+
+
+def _publicar(temporal, destino):
+    """
+    Mueve el temporal al destino e indica si el nombre destino es nuevo
+
+    El alta se reclama con link(), que falla si el nombre ya existe: de dos
+    escrituras simultáneas de un mismo nombre nuevo, solo una lo da por
+    nuevo. Sin hardlinks se reclama con O_CREAT | O_EXCL (el destino queda
+    vacío durante un instante, hasta el replace).
+
+    Returns:
+        True si el destino no existía
+    """
+    try:
+        os.link(temporal, destino)
+    except FileExistsError:
+        creado = False
+    except OSError:
+        try:
+            os.close(os.open(destino, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+            creado = True
+        except FileExistsError:
+            creado = False
+    else:
+        _eliminar_silencioso(temporal)
+        return True
+
+    os.replace(temporal, destino)
+    return creado
+
+
+def guardar_atomico(origen, destino, fsync=True):
+    """
+    Guarda un archivo de forma atómica: escribe en un temporal oculto
+    dentro de la misma carpeta y luego lo renombra al destino final.
+    Un lector nunca ve un archivo escrito a medias.
+
+    Args:
+        origen: FileStorage de werkzeug, objeto tipo archivo o bytes
+        destino: Ruta final del archivo
+        fsync: Si True, fuerza los datos a disco antes del rename
+
+    Returns:
+        Path del archivo guardado
+    """
+    destino = Path(destino)
+    temporal = _escribir_temporal(origen, destino, fsync)
+    try:
+        os.replace(temporal, destino)
+    except BaseException:
+        _eliminar_silencioso(temporal)
+        raise
+
+    return destino
+
+
+def _guardar_nuevo(origen, destino, fsync=True):
+    """
+    Como guardar_atomico, pero indica si el destino es un nombre nuevo
+
+    Returns:
+        Tupla (ruta, creado)
+    """
+    destino = Path(destino)
+    temporal = _escribir_temporal(origen, destino, fsync)
+    try:
+        return destino, _publicar(temporal, destino)
+    except BaseException:
+        _eliminar_silencioso(temporal)
+        raise
+
+
+def _leer_bytes(origen):
+    """Lee todo el contenido de un FileStorage, objeto tipo archivo o bytes"""
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        return bytes(origen)
+    stream = getattr(origen, 'stream', origen)
+    return stream.read()
+
+
+def hash_contenido(datos):
+    """Hash SHA-256 (hex) del contenido de un archivo"""
+    return hashlib.sha256(datos).hexdigest()
+
+
+def guardar_por_contenido(origen, carpeta, prefijo='', extension='.png', fsync=True):
+    """
+    Guarda un archivo con nombre derivado de su contenido
+
+    Si ya existe un archivo con los mismos bytes no se vuelve a escribir:
+    se devuelve la ruta existente para referenciarla desde el mapeo.
+
+    Args:
+        origen: FileStorage de werkzeug, objeto tipo archivo o bytes
+        carpeta: Carpeta donde se guarda el archivo
+        prefijo: Prefijo del nombre de archivo
+        extension: Extensión (incluyendo el punto)
+        fsync: Si True, fuerza los datos a disco antes del rename
+
+    Returns:
+        Tupla (ruta, reutilizado)
+    """
+    datos = _leer_bytes(origen)
+    ruta = Path(carpeta) / f"{prefijo}{hash_contenido(datos)[:32]}{extension.lower()}"
+
+    if ruta.exists():
+        return ruta, True
+
+    # Publicar con link() y no con replace(): si otro hilo guardó el mismo
+    # contenido en paralelo, el objeto existente no se reemplaza (los hardlinks
+    # que ya apuntan a él siguen compartiendo el mismo inodo)
+    temporal = _escribir_temporal(datos, ruta, fsync)
+    try:
+        os.link(temporal, ruta)
+        reutilizado = False
+    except FileExistsError:
+        reutilizado = True
+    except OSError:
+        # Sistema de archivos sin hardlinks
+        os.replace(temporal, ruta)
+        return ruta, False
+    finally:
+        _eliminar_silencioso(temporal)
+
+    return ruta, reutilizado
+
+
+def guardar_deduplicado(origen, destino, almacen, fsync=True):
+    """
+    Guarda un archivo con su nombre definitivo pero almacenando el contenido
+    una sola vez: el destino es un hardlink al objeto del almacén.
+
+    Si el sistema de archivos no soporta hardlinks se guarda una copia normal.
+
+    Args:
+        origen: FileStorage de werkzeug, objeto tipo archivo o bytes
+        destino: Ruta final del archivo (p. ej. qrs/whokey-001.png)
+        almacen: Carpeta de objetos por contenido (p. ej. qrs/.objetos)
+        fsync: Si True, fuerza los datos a disco antes del rename
+
+    Returns:
+        Tupla (ruta, reutilizado, creado): reutilizado si el contenido ya
+        estaba en el almacén, creado si el destino no existía
+    """
+    destino = Path(destino)
+    datos = _leer_bytes(origen)
+    Path(almacen).mkdir(exist_ok=True)
+    objeto, reutilizado = guardar_por_contenido(datos, almacen,
+                                                extension=destino.suffix, fsync=fsync)
+
+    temporal = destino.parent / f".{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(objeto, temporal)
+    except OSError:
+        _, creado = _guardar_nuevo(datos, destino, fsync)
+        return destino, reutilizado, creado
+    try:
+        creado = _publicar(temporal, destino)
+    except BaseException:
+        _eliminar_silencioso(temporal)
+        raise
+
+    return destino, reutilizado, creado
+
+
+def purgar_objetos_huerfanos(almacen):
+    """
+    Elimina del almacén los objetos que ya no referencia ningún archivo
+    (su único enlace es el propio objeto)
+
+    Returns:
+        Cantidad de objetos eliminados
+    """
+    eliminados = 0
+    try:
+        entradas = list(os.scandir(almacen))
+    except FileNotFoundError:
+        return 0
+
+    for entrada in entradas:
+        try:
+            if entrada.is_file() and entrada.stat().st_nlink <= 1:
+                os.unlink(entrada.path)
+                eliminados += 1
+        except OSError:
+            continue
+
+    return eliminados
+
+
+def apartar(ruta, papelera):
+    """
+    Mueve un archivo o carpeta a la papelera con un solo rename (atómico,
+    sin importar cuántos archivos tenga). La papelera tiene que estar en el
+    mismo sistema de archivos.
+
+    Returns:
+        Ruta dentro de la papelera, o None si ruta no existía
+    """
+    ruta = Path(ruta)
+    papelera = Path(papelera)
+    papelera.mkdir(parents=True, exist_ok=True)
+    destino = papelera / f"{ruta.name}.{time.time_ns()}.{os.getpid()}.{threading.get_ident()}"
+    try:
+        os.rename(ruta, destino)
+    except FileNotFoundError:
+        return None
+    return destino
+
+
+def purgar_papelera(papelera, al_avanzar=None, lote=TAMANO_LOTE_PURGA):
+    """
+    Borra el contenido de la papelera (de las hojas hacia arriba)
+
+    Un archivo que no se puede borrar no detiene la purga: se cuenta como
+    error y queda en la papelera para la próxima. Lo que ya no existe (lo
+    borró otro proceso) cuenta como borrado.
+
+    Args:
+        papelera: Carpeta de la papelera (no se borra)
+        al_avanzar: Función opcional (eliminados, errores), llamada cada
+            lote entradas
+        lote: Entradas borradas entre avisos
+
+    Returns:
+        Tupla (eliminados, errores)
+    """
+    eliminados = 0
+    errores = 0
+
+    def borrar(funcion, ruta):
+        nonlocal eliminados, errores
+        try:
+            funcion(ruta)
+            eliminados += 1
+        except FileNotFoundError:
+            eliminados += 1
+        except OSError:
+            errores += 1
+        if al_avanzar and (eliminados + errores) % lote == 0:
+            al_avanzar(eliminados, errores)
+
+    for raiz, carpetas, archivos in os.walk(papelera, topdown=False):
+        for nombre in archivos:
+            borrar(os.unlink, os.path.join(raiz, nombre))
+        for nombre in carpetas:
+            ruta = os.path.join(raiz, nombre)
+            # Un enlace simbólico a carpeta aparece en carpetas: se borra el enlace
+            borrar(os.unlink if os.path.islink(ruta) else os.rmdir, ruta)
+
+    return eliminados, errores
+
+
+def fsync_directorio(carpeta):
+    """Sincroniza las entradas de un directorio (persistencia de los renames)"""
+    try:
+        fd = os.open(str(carpeta), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # Algunos sistemas (p. ej. Windows) no permiten fsync sobre directorios
+        pass
+    finally:
+        os.close(fd)
+
+
+def guardar_lote(archivos, carpeta, fsync=True, almacen=None):
+    """
+    Guarda varios archivos en paralelo con el pool compartido
+
+    Los datos de cada archivo se sincronizan en su propio hilo y el
+    directorio se sincroniza una sola vez cada TAMANO_LOTE_FSYNC archivos.
+
+    Args:
+        archivos: Lista de tuplas (nombre_destino, origen)
+        carpeta: Carpeta destino
+        fsync: Si True, persiste datos y entradas de directorio
+        almacen: Si se indica, deduplica el contenido en esa carpeta de objetos
+
+    Returns:
+        Tupla (guardados, errores, creados): nombres guardados, mensajes de
+        error y cantidad de guardados que no existían (el alta es atómica,
+        ver _publicar)
+    """
+    carpeta = Path(carpeta)
+    pool = obtener_pool_escritura()
+    guardados = []
+    errores = []
+    creados = 0
+
+    for inicio in range(0, len(archivos), TAMANO_LOTE_FSYNC):
+        lote = archivos[inicio:inicio + TAMANO_LOTE_FSYNC]
+        if almacen is not None:
+            futuros = [
+                (nombre, pool.submit(guardar_deduplicado, origen, carpeta / nombre,
+                                     almacen, fsync))
+                for nombre, origen in lote
+            ]
+        else:
+            futuros = [
+                (nombre, pool.submit(_guardar_nuevo, origen, carpeta / nombre, fsync))
+                for nombre, origen in lote
+            ]
+
+        for nombre, futuro in futuros:
+            try:
+                creados += futuro.result()[-1]
+                guardados.append(nombre)
+            except Exception as e:
+                errores.append(f"{nombre}: {e}")
+
+        if fsync:
+            fsync_directorio(carpeta)
+
+    return guardados, errores, creados
+
+
+class ContadorArchivos:
+    """
+    Contador incremental de archivos de una carpeta
+
+    Evita volver a listar toda la carpeta después de cada subida: se
+    inicializa con un único glob y luego se actualiza con cada alta o baja.
+    """
+
+    def __init__(self, carpeta, patron):
+        self.carpeta = Path(carpeta)
+        self.patron = patron
+        self._total = None
+        self._lock = threading.Lock()
+
+    def total(self):
+        """Devuelve el total actual (lista la carpeta solo la primera vez)"""
+        with self._lock:
+            if self._total is None:
+                self._total = sum(1 for _ in self.carpeta.glob(self.patron))
+            return self._total
+
+    def sumar(self, cantidad):
+        """Suma archivos nuevos al contador"""
+        with self._lock:
+            if self._total is not None:
+                self._total += cantidad
+
+    def reiniciar(self):
+        """Invalida el contador (se recalcula en la próxima consulta)"""
+        with self._lock:
+            self._total = None
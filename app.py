@@ -5,13 +5,25 @@ Backend Flask para el Generador de Planchas de Stickers
 Versión: 3.0
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response
 from werkzeug.utils import secure_filename
-import os
+import gzip
+import hashlib
 import json
+import os
 from pathlib import Path
 import shutil
-from pdf_generator import GeneradorPlanchasPDF, parsear_ids_texto
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager
+from pdf_generator import (GeneradorPlanchasPDF, parsear_ids_texto, ErrorIdsTexto,
+                           FORMATOS_EXPORTACION, zip_en_streaming)
+from mapeo_logos import MapeoLogosRangos
+from almacenamiento import (guardar_atomico, guardar_lote, guardar_por_contenido,
+                            ContadorArchivos, purgar_objetos_huerfanos, apartar,
+                            purgar_papelera)
+from estado_servidor import EstadoServidor
+from planificador_renders import PlanificadorRenders, ColaLlena, RendersEnCurso, PRIORIDADES
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500 MB max
@@ -19,19 +31,267 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['QRS_FOLDER'] = 'qrs'
 app.config['LOGOS_FOLDER'] = 'logos_especiales'
 app.config['OUTPUT_FOLDER'] = 'output'
+app.config['LOGOS_MAPEO_FILE'] = 'logos_especiales_mapeo.json'
+app.config['CHECKPOINTS_FOLDER'] = os.path.join('output', '.checkpoints')
+# /api/eventos en modo WSGI (cada conexión ocupa un hilo): conexiones por
+# proceso (las demás pestañas consultan /api/status) y segundos de cada
+# conexión antes de que el navegador reconecte. En modo ASGI no se aplican.
+app.config['SSE_CONEXIONES_MAXIMAS'] = 2
+app.config['SSE_DURACION_MAXIMA'] = 300
+# Carpetas borradas que esperan la purga en segundo plano (mismo disco que qrs/)
+app.config['PAPELERA_FOLDER'] = '.papelera'
+# Procesos que dibujan páginas en paralelo al exportar una página por archivo
+app.config['WORKERS_EXPORTACION'] = max(1, (os.cpu_count() or 2) // 2)
+# Guardar una copia gzip de cada PDF generado para enviarla a quien la acepte
+app.config['PRECOMPRIMIR_DESCARGAS'] = True
+# Planificador de renders (por proceso): turnos simultáneos, páginas que se
+# dibujan a la vez y pedidos en espera antes de responder 503
+app.config['RENDERS_SIMULTANEOS'] = 2
+app.config['PAGINAS_EN_VUELO'] = 200
+app.config['COLA_RENDERS_MAXIMA'] = 32
+
+# Carpeta (dentro de qrs/) donde se guarda una sola copia de cada contenido
+CARPETA_OBJETOS = '.objetos'
 
 # Extensiones permitidas
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
-# Crear carpetas necesarias
-for folder in [app.config['UPLOAD_FOLDER'], app.config['QRS_FOLDER'], 
-               app.config['LOGOS_FOLDER'], app.config['OUTPUT_FOLDER']]:
-    Path(folder).mkdir(exist_ok=True)
+# Los logos también pueden ser vectoriales (ver logos_vectoriales)
+EXTENSIONES_LOGO = ALLOWED_EXTENSIONS | {'svg', 'pdf'}
+
+# Nombres posibles del logo principal (se guarda uno solo)
+LOGOS_PRINCIPALES = ('logo.png', 'logo.svg', 'logo.pdf')
+
+# Las carpetas de trabajo se crean con el primer request (ver asegurar_carpetas)
+_carpetas_creadas = False
+
+# Límite de renders simultáneos compartido entre procesos (LimiteEntreProcesos,
+# lo asigna servidor_produccion antes del fork de los workers; None = sin límite)
+limite_renders = None
+
+# Serializa las actualizaciones del mapeo de logos (leer-modificar-guardar)
+mapeo_lock = threading.Lock()
+
+class _CandadoCarpetas:
+    """
+    Escrituras en las carpetas de trabajo (compartido: varias a la vez)
+    contra limpiezas (exclusivo): una limpieza espera a que terminen las
+    escrituras en curso y las nuevas esperan a que termine la limpieza
+    """
+    
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._escrituras = 0
+        self._limpiando = False
+    
+    @contextmanager
+    def escritura(self):
+        with self._condicion:
+            self._condicion.wait_for(lambda: not self._limpiando)
+            self._escrituras += 1
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._escrituras -= 1
+                self._condicion.notify_all()
+    
+    @contextmanager
+    def limpieza(self):
+        with self._condicion:
+            self._condicion.wait_for(lambda: not self._limpiando)
+            self._limpiando = True
+            self._condicion.wait_for(lambda: self._escrituras == 0)
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._limpiando = False
+                self._condicion.notify_all()
+
+
+# Subidas contra limpiar-todo / clear-logos-especiales (ninguna subida cae
+# entre el rename de la carpeta y su nueva creación)
+candado_carpetas = _CandadoCarpetas()
+
+# Conexiones SSE abiertas en este proceso (modo WSGI)
+sse_lock = threading.Lock()
+_conexiones_sse = 0
+
+# Purga de la papelera: un solo hilo por proceso; si se aparta algo mientras
+# purga, vuelve a recorrer la papelera al terminar
+purga_lock = threading.Lock()
+_hilo_purga = None
+_purga_repetir = False
+
+# Contador incremental de QRs (evita re-listar la carpeta tras cada subida)
+contador_qrs = ContadorArchivos(app.config['QRS_FOLDER'], 'whokey-*.png')
+
+
+def _ruta_logo_principal():
+    """Ruta del logo principal subido (raster o vectorial), o None"""
+    for nombre in LOGOS_PRINCIPALES:
+        if Path(nombre).exists():
+            return Path(nombre)
+    return None
+
+
+def _archivos_logos_especiales():
+    """Archivos de la carpeta de logos especiales"""
+    return [ruta for ruta in Path(app.config['LOGOS_FOLDER']).glob('logo_especial_*')
+            if ruta.suffix[1:].lower() in EXTENSIONES_LOGO]
+
+
+def _calcular_estado(recontar=False):
+    """Estado de archivos que ve la UI (se recalcula solo cuando cambia algo)"""
+    if recontar:
+        contador_qrs.reiniciar()
+    qrs_count = contador_qrs.total()
+    logos_especiales_count = len(_archivos_logos_especiales())
+    
+    # Cargar mapeo de logos especiales si existe
+    try:
+        logos_especiales_mapeo = MapeoLogosRangos.cargar(app.config['LOGOS_MAPEO_FILE'])
+    except Exception:
+        logos_especiales_mapeo = MapeoLogosRangos()
+    
+    return {
+        'qrs_count': qrs_count,
+        'logo_principal_exists': _ruta_logo_principal() is not None,
+        'logos_especiales_count': logos_especiales_count,
+        'logos_especiales_ids': logos_especiales_mapeo.rangos_texto(),
+        'paginas_estimadas': (qrs_count + 27) // 28
+    }
+
+
+def _firma_disco():
+    """stat de carpetas y archivos de entrada: cambia si otro proceso los modifica"""
+    firma = []
+    for ruta in (app.config['QRS_FOLDER'], app.config['LOGOS_FOLDER'],
+                 app.config['LOGOS_MAPEO_FILE'], *LOGOS_PRINCIPALES):
+        try:
+            st = os.stat(ruta)
+            firma.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            firma.append(None)
+    return tuple(firma)
+
+
+# Estado publicado a los navegadores (/api/status y /api/eventos)
+estado = EstadoServidor(_calcular_estado, _firma_disco)
+
+# Turnos de render por prioridad; el resumen de la cola se publica en el estado
+planificador = PlanificadorRenders(
+    renders_simultaneos=app.config['RENDERS_SIMULTANEOS'],
+    paginas_en_vuelo=app.config['PAGINAS_EN_VUELO'],
+    cola_maxima=app.config['COLA_RENDERS_MAXIMA'],
+    al_cambiar=lambda: estado.publicar(cola_renders=planificador.resumen())
+)
+
+
+def _prioridad(opciones, defecto='normal'):
+    """Prioridad pedida en el body JSON o en la query (?prioridad=urgente)"""
+    prioridad = str(opciones.get('prioridad') or defecto).lower()
+    if prioridad not in PRIORIDADES:
+        raise ValueError(f"Prioridad no válida: {prioridad} (usa {', '.join(PRIORIDADES)})")
+    return prioridad
+
+
+def _respuesta_cola_llena(e):
+    respuesta = jsonify({'success': False, 'error': str(e)})
+    respuesta.status_code = 503
+    respuesta.headers['Retry-After'] = '60'
+    return respuesta
+
+
+def asegurar_carpetas():
+    """Crea las carpetas necesarias (una sola vez, no al importar el módulo)"""
+    global _carpetas_creadas
+    if _carpetas_creadas:
+        return
+    for folder in [app.config['UPLOAD_FOLDER'], app.config['QRS_FOLDER'], 
+                   app.config['LOGOS_FOLDER'], app.config['OUTPUT_FOLDER']]:
+        Path(folder).mkdir(exist_ok=True)
+    _carpetas_creadas = True
+    # Restos de una purga interrumpida (reinicio) o que falló en parte
+    papelera = Path(app.config['PAPELERA_FOLDER'])
+    if papelera.is_dir() and any(papelera.iterdir()):
+        _iniciar_purga()
+
+
+def _vaciar_carpetas(carpetas):
+    """
+    Aparta las carpetas a la papelera (un rename cada una) y las vuelve a
+    crear vacías: las subidas nuevas pueden empezar enseguida y el borrado
+    de los archivos viejos queda para el hilo de purga
+    """
+    for carpeta in carpetas:
+        apartar(carpeta, app.config['PAPELERA_FOLDER'])
+        Path(carpeta).mkdir(parents=True, exist_ok=True)
+    _iniciar_purga()
 
 
-def allowed_file(filename):
+def _iniciar_purga():
+    """Lanza el hilo de purga de la papelera (o le pide otra vuelta si ya corre)"""
+    global _hilo_purga, _purga_repetir
+    with purga_lock:
+        if _hilo_purga is not None:
+            _purga_repetir = True
+            return
+        _hilo_purga = threading.Thread(target=_purgar_papelera, name='purga-papelera',
+                                       daemon=True)
+        _hilo_purga.start()
+
+
+def _purgar_papelera():
+    """Borra la papelera por lotes y publica el avance como 'limpieza'"""
+    global _hilo_purga, _purga_repetir
+    eliminados = errores = 0
+    
+    def publicar(activa, nuevos=0, nuevos_errores=0):
+        estado.publicar(limpieza={'activa': activa, 'eliminados': eliminados + nuevos,
+                                  'errores': errores + nuevos_errores})
+    
+    publicar(True)
+    while True:
+        with purga_lock:
+            _purga_repetir = False
+        vuelta = purgar_papelera(app.config['PAPELERA_FOLDER'],
+                                 al_avanzar=lambda e, err: publicar(True, e, err))
+        eliminados += vuelta[0]
+        errores += vuelta[1]
+        with purga_lock:
+            if not _purga_repetir:
+                _hilo_purga = None
+                break
+    
+    if errores:
+        print(f"⚠️  Purga de la papelera: {errores} entrada(s) no se pudieron borrar "
+              f"(se reintentan en la próxima limpieza)")
+    publicar(False)
+
+
+@app.before_request
+def _preparar_carpetas():
+    asegurar_carpetas()
+
+
+def allowed_file(filename, extensiones=ALLOWED_EXTENSIONS):
     """Verifica si la extensión del archivo es permitida"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in extensiones
+
+
+def _logo_vectorial_invalido(ruta):
+    """Mensaje de error si ruta es un logo SVG/PDF que no se puede dibujar"""
+    if Path(ruta).suffix[1:].lower() not in EXTENSIONES_LOGO - ALLOWED_EXTENSIONS:
+        return None
+    from logos_vectoriales import validar_logo_vectorial
+    
+    try:
+        validar_logo_vectorial(ruta)
+    except ValueError as e:
+        return str(e)
+    return None
 
 
 @app.route('/')
@@ -43,32 +303,52 @@ def index():
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Obtiene el estado actual del sistema"""
-    qrs_path = Path(app.config['QRS_FOLDER'])
-    logo_principal = Path('logo.png')
-    logos_especiales_path = Path(app.config['LOGOS_FOLDER'])
+    estado.revisar()
+    _, datos = estado.instantanea()
+    return jsonify({'success': True, **datos})
+
+
+@app.route('/api/cola-renders', methods=['GET'])
+def get_cola_renders():
+    """Cola del planificador: renders activos, en espera y tiempos de espera"""
+    return jsonify({'success': True, **planificador.estadisticas()})
+
+
+@app.route('/api/eventos', methods=['GET'])
+def eventos():
+    """
+    Server-Sent Events: el estado completo (evento 'estado') al conectarse
+    y cada vez que cambia, incluido el progreso de la generación del PDF
     
-    # Contar archivos
-    qrs = list(qrs_path.glob('whokey-*.png'))
-    logos_especiales = list(logos_especiales_path.glob('*.png'))
+    Cada conexión ocupa un hilo del servidor WSGI: hay un máximo por proceso
+    (las que sobran reciben 503 y la página pasa a consultar /api/status) y
+    cada flujo se cierra a los SSE_DURACION_MAXIMA segundos para que el
+    navegador reconecte y los hilos vuelvan a repartirse.
+    """
+    global _conexiones_sse
+    maximo = app.config['SSE_CONEXIONES_MAXIMAS']
+    with sse_lock:
+        if maximo is not None and _conexiones_sse >= maximo:
+            respuesta = jsonify({'success': False,
+                                 'error': 'Demasiadas conexiones de eventos; usa /api/status'})
+            respuesta.status_code = 503
+            respuesta.headers['Retry-After'] = '60'
+            return respuesta
+        _conexiones_sse += 1
     
-    # Cargar mapeo de logos especiales si existe
-    mapeo_file = Path('logos_especiales_mapeo.json')
-    logos_especiales_mapeo = {}
-    if mapeo_file.exists():
-        try:
-            with open(mapeo_file, 'r') as f:
-                logos_especiales_mapeo = json.load(f)
-        except:
-            pass
+    def liberar():
+        global _conexiones_sse
+        with sse_lock:
+            _conexiones_sse -= 1
     
-    return jsonify({
-        'success': True,
-        'qrs_count': len(qrs),
-        'logo_principal_exists': logo_principal.exists(),
-        'logos_especiales_count': len(logos_especiales),
-        'logos_especiales_ids': list(logos_especiales_mapeo.keys()) if logos_especiales_mapeo else [],
-        'paginas_estimadas': (len(qrs) + 27) // 28 if qrs else 0
-    })
+    respuesta = Response(estado.eventos_sse(duracion_maxima=app.config['SSE_DURACION_MAXIMA']),
+                         mimetype='text/event-stream', headers={
+                             'Cache-Control': 'no-cache',
+                             'X-Accel-Buffering': 'no'
+                         })
+    # Se llama al cerrar la respuesta, aunque el flujo no haya empezado
+    respuesta.call_on_close(liberar)
+    return respuesta
 
 
 @app.route('/api/upload-qrs', methods=['POST'])
@@ -78,33 +358,67 @@ def upload_qrs():
         return jsonify({'success': False, 'error': 'No se enviaron archivos'}), 400
     
     files = request.files.getlist('files[]')
-    uploaded = 0
     errors = []
     
-    qrs_path = Path(app.config['QRS_FOLDER'])
-    
+    # Nombre destino -> archivo (si se repite un nombre, gana el último)
+    pendientes = {}
     for file in files:
         if file and file.filename:
             # Verificar que sea un archivo whokey-NNN.png
             filename = secure_filename(file.filename)
             
-            if not filename.lower().startswith('whokey-') or not filename.lower().endswith('.png'):
+            if not nombre_qr_valido(filename):
                 errors.append(f"{filename}: debe seguir el formato whokey-NNN.png")
                 continue
             
-            # Guardar o sobrescribir
-            filepath = qrs_path / filename
-            file.save(str(filepath))
-            uploaded += 1
+            pendientes[filename] = file
+    
+    guardados, errores_escritura = guardar_qrs(pendientes)
+    errors.extend(errores_escritura)
     
     return jsonify({
         'success': True,
-        'uploaded': uploaded,
+        'uploaded': len(guardados),
         'errors': errors,
-        'total_qrs': len(list(qrs_path.glob('whokey-*.png')))
+        'total_qrs': contador_qrs.total()
     })
 
 
+def nombre_qr_valido(filename):
+    """Verifica que el nombre siga el formato whokey-NNN.png"""
+    return filename.lower().startswith('whokey-') and filename.lower().endswith('.png')
+
+
+def guardar_qrs(pendientes):
+    """
+    Guarda un lote de QRs ya validados en la carpeta de QRs
+    
+    Args:
+        pendientes: Dict {nombre_archivo: origen} (FileStorage o bytes)
+        
+    Returns:
+        Tupla (guardados, errores) con listas de nombres y mensajes
+    """
+    asegurar_carpetas()
+    qrs_path = Path(app.config['QRS_FOLDER'])
+    
+    with candado_carpetas.escritura():
+        # Guardar en paralelo y de forma atómica (QRs idénticos se guardan una
+        # vez). Solo los nombres que no existían suman al total: se detectan al
+        # publicarlos, así dos subidas simultáneas del mismo QR no cuentan doble
+        almacen = qrs_path / CARPETA_OBJETOS
+        guardados, errores, creados = guardar_lote(list(pendientes.items()), qrs_path,
+                                                   almacen=almacen)
+        contador_qrs.sumar(creados)
+        
+        # Contenidos sobrescritos que quedaron sin referencias
+        if creados < len(guardados):
+            purgar_objetos_huerfanos(almacen)
+    
+    estado.actualizar()
+    return guardados, errores
+
+
 @app.route('/api/upload-logo-principal', methods=['POST'])
 def upload_logo_principal():
     """Subida del logo principal"""
@@ -116,10 +430,23 @@ def upload_logo_principal():
     if file.filename == '':
         return jsonify({'success': False, 'error': 'Archivo vacío'}), 400
     
-    if file and allowed_file(file.filename):
-        # Guardar siempre como logo.png
-        filepath = Path('logo.png')
-        file.save(str(filepath))
+    if file and allowed_file(file.filename, EXTENSIONES_LOGO):
+        # Guardar como logo.png, o logo.svg / logo.pdf si es vectorial
+        extension = file.filename.rsplit('.', 1)[1].lower()
+        filepath = Path('logo.pdf' if extension == 'pdf' else 'logo.svg' if extension == 'svg'
+                        else 'logo.png')
+        temporal = filepath.with_name(f".{filepath.stem}.nuevo{filepath.suffix}")
+        file.save(str(temporal))
+        error = _logo_vectorial_invalido(temporal)
+        if error:
+            temporal.unlink()
+            return jsonify({'success': False, 'error': error}), 400
+        os.replace(temporal, filepath)
+        # Un solo logo principal: se quitan las otras variantes
+        for nombre in LOGOS_PRINCIPALES:
+            if nombre != filepath.name and Path(nombre).exists():
+                Path(nombre).unlink()
+        estado.actualizar()
         
         return jsonify({
             'success': True,
@@ -144,45 +471,54 @@ def upload_logo_especial():
     if not ids_texto:
         return jsonify({'success': False, 'error': 'Debe especificar al menos un ID'}), 400
     
-    # Parsear IDs
-    ids = parsear_ids_texto(ids_texto)
+    # Parsear IDs (como rangos, sin expandirlos)
+    try:
+        ids = parsear_ids_texto(ids_texto)
+    except ErrorIdsTexto as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
     if not ids:
         return jsonify({'success': False, 'error': 'No se pudieron parsear los IDs'}), 400
     
-    if file and allowed_file(file.filename):
-        # Guardar archivo con nombre único
-        filename = secure_filename(file.filename)
-        timestamp = int(Path('logos_especiales_mapeo.json').stat().st_mtime if Path('logos_especiales_mapeo.json').exists() else 0)
-        unique_filename = f"logo_especial_{timestamp}_{filename}"
+    if file and allowed_file(file.filename, EXTENSIONES_LOGO):
+        # Guardar archivo con nombre derivado del contenido: el mismo logo
+        # subido varias veces se guarda una sola vez y se reutiliza
+        extension = '.' + file.filename.rsplit('.', 1)[1].lower()
         
-        logos_path = Path(app.config['LOGOS_FOLDER'])
-        filepath = logos_path / unique_filename
-        file.save(str(filepath))
-        
-        # Cargar mapeo existente
-        mapeo_file = Path('logos_especiales_mapeo.json')
-        mapeo = {}
-        if mapeo_file.exists():
-            try:
-                with open(mapeo_file, 'r') as f:
-                    mapeo = json.load(f)
-            except:
-                mapeo = {}
-        
-        # Actualizar mapeo
-        for id_num in ids:
-            mapeo[str(id_num)] = str(filepath)
-        
-        # Guardar mapeo
-        with open(mapeo_file, 'w') as f:
-            json.dump(mapeo, f, indent=2)
+        # Archivo y mapeo juntos, sin una limpieza en el medio
+        with candado_carpetas.escritura():
+            logos_path = Path(app.config['LOGOS_FOLDER'])
+            filepath, reutilizado = guardar_por_contenido(file, logos_path,
+                                                          prefijo='logo_especial_',
+                                                          extension=extension)
+            unique_filename = filepath.name
+            
+            error = _logo_vectorial_invalido(filepath)
+            if error:
+                if not reutilizado:
+                    filepath.unlink()
+                return jsonify({'success': False, 'error': error}), 400
+            
+            # Actualizar mapeo por rangos (el último logo asignado gana)
+            with mapeo_lock:
+                mapeo_file = app.config['LOGOS_MAPEO_FILE']
+                try:
+                    mapeo = MapeoLogosRangos.cargar(mapeo_file)
+                except Exception:
+                    mapeo = MapeoLogosRangos()
+                
+                for inicio, fin in ids.rangos:
+                    mapeo.asignar(inicio, fin, filepath)
+                
+                mapeo.guardar(mapeo_file)
+        estado.actualizar()
         
         return jsonify({
             'success': True,
             'message': f'Logo especial asignado a {len(ids)} ID(s)',
-            'ids': ids,
-            'filename': unique_filename
+            'ids': ids.rangos_texto(),
+            'filename': unique_filename,
+            'reutilizado': reutilizado
         })
     
     return jsonify({'success': False, 'error': 'Formato de archivo no permitido'}), 400
@@ -190,17 +526,22 @@ def upload_logo_especial():
 
 @app.route('/api/clear-logos-especiales', methods=['POST'])
 def clear_logos_especiales():
-    """Limpia todos los logos especiales"""
-    logos_path = Path(app.config['LOGOS_FOLDER'])
-    mapeo_file = Path('logos_especiales_mapeo.json')
+    """
+    Limpia todos los logos especiales (los archivos se borran en segundo plano)
     
-    # Eliminar archivos
-    for logo_file in logos_path.glob('*.png'):
-        logo_file.unlink()
+    Con renders activos o en cola responde 409: un render en curso podría
+    estar leyendo esos logos.
+    """
+    mapeo_file = Path(app.config['LOGOS_MAPEO_FILE'])
     
-    # Eliminar mapeo
-    if mapeo_file.exists():
-        mapeo_file.unlink()
+    try:
+        with planificador.sin_renders(limite_renders), candado_carpetas.limpieza(), mapeo_lock:
+            # Primero el mapeo: ninguna generación busca logos ya apartados
+            mapeo_file.unlink(missing_ok=True)
+            _vaciar_carpetas([app.config['LOGOS_FOLDER']])
+    except RendersEnCurso as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    estado.actualizar()
     
     return jsonify({
         'success': True,
@@ -213,10 +554,10 @@ def generar_pdf():
     """Genera el PDF con las planchas"""
     try:
         # Verificar que existan los archivos necesarios
-        logo_principal = Path('logo.png')
+        logo_principal = _ruta_logo_principal()
         qrs_path = Path(app.config['QRS_FOLDER'])
         
-        if not logo_principal.exists():
+        if logo_principal is None:
             return jsonify({
                 'success': False,
                 'error': 'Falta el logo principal. Por favor, súbelo primero.'
@@ -230,16 +571,18 @@ def generar_pdf():
             }), 400
         
         # Cargar mapeo de logos especiales
-        mapeo_file = Path('logos_especiales_mapeo.json')
-        logos_especiales = {}
-        if mapeo_file.exists():
-            try:
-                with open(mapeo_file, 'r') as f:
-                    mapeo_str = json.load(f)
-                    # Convertir keys de string a int
-                    logos_especiales = {int(k): v for k, v in mapeo_str.items()}
-            except Exception as e:
-                print(f"⚠️  Error al cargar mapeo de logos: {e}")
+        logos_especiales = MapeoLogosRangos()
+        try:
+            logos_especiales = MapeoLogosRangos.cargar(app.config['LOGOS_MAPEO_FILE'])
+        except Exception as e:
+            print(f"⚠️  Error al cargar mapeo de logos: {e}")
+        
+        # Opciones del trabajo (JSON opcional)
+        opciones = request.get_json(silent=True) or {}
+        try:
+            prioridad = _prioridad(opciones)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         # Generar PDF
         output_path = Path(app.config['OUTPUT_FOLDER']) / 'planchas_stickers.pdf'
@@ -247,13 +590,42 @@ def generar_pdf():
         generador = GeneradorPlanchasPDF(
             carpeta_qrs=str(qrs_path),
             logo_principal=str(logo_principal),
-            logos_especiales=logos_especiales
+            logos_especiales=logos_especiales,
+            reservar_huecos=bool(opciones.get('reservar_huecos'))
         )
         
-        archivo_pdf, estadisticas = generador.generar_pdf(
-            archivo_salida=str(output_path),
-            verbose=True
-        )
+        def progreso_pagina(completadas, total):
+            estado.publicar(generacion={'activa': True, 'paginas_completadas': completadas,
+                                        'total_paginas': total})
+        
+        # Por tramos con checkpoints: si el proceso se cae, se reanuda
+        estado.publicar(generacion={'activa': True, 'paginas_completadas': 0,
+                                    'total_paginas': None})
+        # Un turno del planificador por tramo: lo urgente entra entre tramos.
+        # El trabajo entero queda marcado en curso: ninguna limpieza aparta
+        # output/ o los checkpoints entre dos tramos
+        try:
+            with planificador.trabajo(limite_renders):
+                archivo_pdf, estadisticas = generador.generar_pdf_reanudable(
+                    archivo_salida=str(output_path),
+                    carpeta_checkpoints=app.config['CHECKPOINTS_FOLDER'],
+                    verbose=True,
+                    progreso_pagina=progreso_pagina,
+                    turno_tramo=planificador.turnos_por_tramo(prioridad, 'generar-pdf',
+                                                              limite_renders)
+                )
+        except ColaLlena as e:
+            estado.publicar(generacion={'activa': False, 'error': str(e)})
+            return _respuesta_cola_llena(e)
+        except Exception as e:
+            estado.publicar(generacion={'activa': False, 'error': str(e)})
+            raise
+        
+        _registrar_pdf(output_path, estadisticas['huella'])
+        estado.publicar(generacion={'activa': False,
+                                    'paginas_completadas': estadisticas['total_paginas'],
+                                    'total_paginas': estadisticas['total_paginas'],
+                                    'download_url': '/api/download-pdf'})
         
         return jsonify({
             'success': True,
@@ -269,10 +641,216 @@ def generar_pdf():
         }), 500
 
 
-@app.route('/api/download-pdf', methods=['GET'])
-def download_pdf():
-    """Descarga el PDF generado"""
-    pdf_path = Path(app.config['OUTPUT_FOLDER']) / 'planchas_stickers.pdf'
+@app.route('/api/reimprimir', methods=['POST'])
+def reimprimir():
+    """
+    Reimpresión parcial: solo las páginas o IDs indicados, en la misma
+    posición que en el PDF completo
+    
+    Body JSON: {"paginas": "3-5", "ids": "120-130, 140", "reservar_huecos": false}
+    (al menos uno de paginas o ids; reservar_huecos debe coincidir con el
+    trabajo original)
+    """
+    opciones = request.get_json(silent=True) or {}
+    paginas_texto = str(opciones.get('paginas') or '').strip()
+    ids_texto = str(opciones.get('ids') or '').strip()
+    
+    if not paginas_texto and not ids_texto:
+        return jsonify({
+            'success': False,
+            'error': 'Indica las páginas y/o los IDs a reimprimir'
+        }), 400
+    
+    try:
+        paginas = parsear_ids_texto(paginas_texto) if paginas_texto else None
+        ids = parsear_ids_texto(ids_texto) if ids_texto else None
+        # Una hoja trabada en la impresora es un pedido urgente
+        prioridad = _prioridad(opciones, defecto='urgente')
+    except (ErrorIdsTexto, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        logos_especiales = MapeoLogosRangos()
+        try:
+            logos_especiales = MapeoLogosRangos.cargar(app.config['LOGOS_MAPEO_FILE'])
+        except Exception as e:
+            print(f"⚠️  Error al cargar mapeo de logos: {e}")
+        
+        generador = GeneradorPlanchasPDF(
+            carpeta_qrs=app.config['QRS_FOLDER'],
+            logo_principal=str(_ruta_logo_principal() or 'logo.png'),
+            logos_especiales=logos_especiales,
+            reservar_huecos=bool(opciones.get('reservar_huecos'))
+        )
+        output_path = Path(app.config['OUTPUT_FOLDER']) / 'reimpresion.pdf'
+        
+        # Páginas de la reimpresión (para el límite de páginas en vuelo),
+        # contando las que tocan los IDs pedidos
+        generador.validar_archivos()
+        paginas_turno = generador.paginas_reimpresion(paginas, ids)
+        with planificador.turno(prioridad, paginas_turno, 'reimprimir', limite_renders):
+            _, estadisticas = generador.generar_pdf(
+                archivo_salida=str(output_path),
+                verbose=False,
+                paginas=paginas,
+                reimprimir_ids=ids
+            )
+        _registrar_pdf(output_path, estadisticas['huella'])
+    except ColaLlena as e:
+        return _respuesta_cola_llena(e)
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error al generar la reimpresión: {str(e)}'
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'message': 'Reimpresión generada exitosamente',
+        'estadisticas': estadisticas,
+        'download_url': '/api/download-reimpresion'
+    })
+
+
+@app.route('/api/exportar-paginas', methods=['GET'])
+def exportar_paginas():
+    """
+    ZIP con una página A3 por archivo (?formato=pdf|png|tiff), enviado en
+    streaming: cada hoja se agrega apenas está dibujada
+    """
+    formato = request.args.get('formato', 'pdf').lower()
+    if formato not in FORMATOS_EXPORTACION:
+        return jsonify({
+            'success': False,
+            'error': f"Formato no soportado: {formato} (usa {', '.join(FORMATOS_EXPORTACION)})"
+        }), 400
+    
+    logos_especiales = MapeoLogosRangos()
+    try:
+        logos_especiales = MapeoLogosRangos.cargar(app.config['LOGOS_MAPEO_FILE'])
+    except Exception as e:
+        print(f"⚠️  Error al cargar mapeo de logos: {e}")
+    
+    generador = GeneradorPlanchasPDF(
+        carpeta_qrs=app.config['QRS_FOLDER'],
+        logo_principal=str(_ruta_logo_principal() or 'logo.png'),
+        logos_especiales=logos_especiales,
+        reservar_huecos=request.args.get('reservar_huecos') in ('1', 'true')
+    )
+    
+    # Errores de entrada antes de empezar a enviar el ZIP
+    try:
+        prioridad = _prioridad(request.args)
+        generador.validar_archivos()
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # El turno se pide antes de responder (con la cola llena, 503 en vez de
+    # un ZIP cortado) y se suelta al cerrar la respuesta, aunque el cliente
+    # se desconecte antes de empezar a leerla
+    filas = len(generador.obtener_filas())
+    paginas_turno = (filas + GeneradorPlanchasPDF.FILAS_TOTALES_POR_HOJA - 1) \
+        // GeneradorPlanchasPDF.FILAS_TOTALES_POR_HOJA
+    turno = ExitStack()
+    try:
+        turno.enter_context(planificador.turno(prioridad, paginas_turno, 'exportar-paginas',
+                                               limite_renders))
+    except ColaLlena as e:
+        return _respuesta_cola_llena(e)
+    
+    carpeta = tempfile.mkdtemp(prefix='exportacion_', dir=app.config['OUTPUT_FOLDER'])
+    turno.callback(shutil.rmtree, carpeta, ignore_errors=True)
+    
+    def contenido():
+        paginas = generador.exportar_paginas(
+            carpeta, formato, workers=app.config['WORKERS_EXPORTACION']
+        )
+        yield from zip_en_streaming(ruta for _, ruta in paginas)
+    
+    respuesta = Response(contenido(), mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment; filename=planchas_paginas_{formato}.zip'
+    })
+    respuesta.call_on_close(turno.close)
+    return respuesta
+
+
+def _archivo_validador(pdf_path):
+    return pdf_path.with_name(f".{pdf_path.name}.json")
+
+
+def _archivo_gzip(pdf_path, etag):
+    return pdf_path.with_name(f".{pdf_path.name}.{etag}.gz")
+
+
+def _registrar_pdf(pdf_path, huella):
+    """
+    Guarda el ETag de un PDF recién generado: la huella del trabajo (el PDF
+    es reproducible, ver GeneradorPlanchasPDF.PDF_REPRODUCIBLE) más su
+    tamaño y la versión de reportlab. Si está activado, genera en segundo
+    plano la copia gzip.
+    """
+    from reportlab import Version
+    
+    pdf_path = Path(pdf_path)
+    st = pdf_path.stat()
+    etag = hashlib.sha256(f"{huella}:{st.st_size}:{Version}".encode('utf-8')).hexdigest()[:32]
+    validador = {'etag': etag, 'tamano': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    guardar_atomico(json.dumps(validador).encode('utf-8'), _archivo_validador(pdf_path),
+                    fsync=False)
+    
+    # Copias gzip de PDFs anteriores
+    for viejo in pdf_path.parent.glob(f".{pdf_path.name}.*.gz"):
+        if viejo != _archivo_gzip(pdf_path, etag):
+            viejo.unlink(missing_ok=True)
+    
+    if app.config['PRECOMPRIMIR_DESCARGAS']:
+        threading.Thread(target=_comprimir_pdf, args=(pdf_path, etag),
+                         name='gzip-descarga', daemon=True).start()
+
+
+def _comprimir_pdf(pdf_path, etag):
+    """Escribe la copia gzip (temporal + rename: nunca se envía a medias)"""
+    destino = _archivo_gzip(pdf_path, etag)
+    temporal = Path(f"{destino}.parcial")
+    try:
+        with open(pdf_path, 'rb') as origen, open(temporal, 'wb') as salida:
+            # mtime=0: mismo PDF, mismos bytes comprimidos
+            with gzip.GzipFile(fileobj=salida, mode='wb', compresslevel=1, mtime=0) as comprimido:
+                shutil.copyfileobj(origen, comprimido, 1024 * 1024)
+        os.replace(temporal, destino)
+    except OSError as e:
+        temporal.unlink(missing_ok=True)
+        print(f"⚠️  No se pudo comprimir {pdf_path}: {e}")
+
+
+def _etag_pdf(pdf_path):
+    """ETag registrado del PDF, o None si el archivo cambió desde entonces"""
+    try:
+        with open(_archivo_validador(pdf_path), 'r') as f:
+            validador = json.load(f)
+        st = pdf_path.stat()
+    except (OSError, ValueError):
+        return None
+    if (validador.get('tamano'), validador.get('mtime_ns')) != (st.st_size, st.st_mtime_ns):
+        return None
+    return validador.get('etag')
+
+
+def _enviar_pdf(nombre, nombre_descarga):
+    """
+    Respuesta de descarga para un PDF de la carpeta de salida
+    
+    Con ETag fuerte (304 con If-None-Match), rangos de bytes para retomar
+    descargas cortadas (Range / If-Range) y, si el cliente acepta gzip y ya
+    existe, la copia precomprimida.
+    """
+    # send_file resuelve las rutas relativas contra la carpeta de la app,
+    # no contra el directorio de trabajo donde se escribió el PDF
+    pdf_path = (Path(app.config['OUTPUT_FOLDER']) / nombre).resolve()
     
     if not pdf_path.exists():
         return jsonify({
@@ -280,42 +858,81 @@ def download_pdf():
             'error': 'No hay PDF generado. Genera uno primero.'
         }), 404
     
-    return send_file(
-        str(pdf_path),
+    archivo = pdf_path
+    etag = _etag_pdf(pdf_path)
+    comprimido = False
+    if etag and 'gzip' in request.accept_encodings:
+        copia = _archivo_gzip(pdf_path, etag)
+        if copia.exists():
+            archivo = copia
+            etag = f"{etag}-gz"
+            comprimido = True
+    
+    respuesta = send_file(
+        str(archivo),
         as_attachment=True,
-        download_name='planchas_stickers_whokey.pdf',
-        mimetype='application/pdf'
+        download_name=nombre_descarga,
+        mimetype='application/pdf',
+        conditional=True,
+        etag=etag or True,
+        last_modified=pdf_path.stat().st_mtime
     )
+    # El navegador puede guardarlo, pero debe revalidar (If-None-Match) antes de usarlo
+    respuesta.cache_control.no_cache = True
+    respuesta.vary.add('Accept-Encoding')
+    if comprimido:
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    return respuesta
+
+
+@app.route('/api/download-pdf', methods=['GET'])
+def download_pdf():
+    """Descarga el PDF generado"""
+    return _enviar_pdf('planchas_stickers.pdf', 'planchas_stickers_whokey.pdf')
+
+
+@app.route('/api/download-reimpresion', methods=['GET'])
+def download_reimpresion():
+    """Descarga la última reimpresión parcial"""
+    return _enviar_pdf('reimpresion.pdf', 'reimpresion_whokey.pdf')
 
 
 @app.route('/api/limpiar-todo', methods=['POST'])
 def limpiar_todo():
-    """Limpia todos los archivos subidos (útil para empezar de cero)"""
+    """
+    Limpia todos los archivos subidos (útil para empezar de cero)
+    
+    QRs (con su almacén de objetos), logos especiales y PDFs generados (con
+    validadores, copias gzip y checkpoints) se apartan con un rename por
+    carpeta; el borrado sigue en segundo plano y su avance se publica como
+    'limpieza' en el estado.
+    
+    Con renders activos, en cola o trabajos por tramos en curso (en
+    cualquier proceso, también entre dos tramos) responde 409: un render o
+    un trabajo reanudable podría estar escribiendo en output/. Las
+    subidas en curso terminan antes de apartar las carpetas y las nuevas
+    esperan a que estén creadas de nuevo.
+    """
     try:
-        # Limpiar QRs
-        qrs_path = Path(app.config['QRS_FOLDER'])
-        for qr_file in qrs_path.glob('*.png'):
-            qr_file.unlink()
-        
-        # Limpiar logos especiales
-        logos_path = Path(app.config['LOGOS_FOLDER'])
-        for logo_file in logos_path.glob('*.png'):
-            logo_file.unlink()
-        
-        # Limpiar mapeo
-        mapeo_file = Path('logos_especiales_mapeo.json')
-        if mapeo_file.exists():
-            mapeo_file.unlink()
-        
-        # Limpiar PDFs generados
-        output_path = Path(app.config['OUTPUT_FOLDER'])
-        for pdf_file in output_path.glob('*.pdf'):
-            pdf_file.unlink()
+        with planificador.sin_renders(limite_renders), candado_carpetas.limpieza(), mapeo_lock:
+            Path(app.config['LOGOS_MAPEO_FILE']).unlink(missing_ok=True)
+            carpetas = [app.config['QRS_FOLDER'], app.config['LOGOS_FOLDER'],
+                        app.config['OUTPUT_FOLDER']]
+            # Los checkpoints se van con output/ salvo que estén en otra carpeta
+            checkpoints = Path(app.config['CHECKPOINTS_FOLDER']).resolve()
+            if not checkpoints.is_relative_to(Path(app.config['OUTPUT_FOLDER']).resolve()):
+                carpetas.append(app.config['CHECKPOINTS_FOLDER'])
+            _vaciar_carpetas(carpetas)
+        contador_qrs.reiniciar()
+        estado.actualizar()
+        estado.publicar(generacion=None)
         
         return jsonify({
             'success': True,
             'message': 'Todos los archivos han sido eliminados'
         })
+    except RendersEnCurso as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
     except Exception as e:
         return jsonify({
             'success': False,
@@ -324,12 +941,22 @@ def limpiar_todo():
 
 
 if __name__ == '__main__':
+    # Servidor de desarrollo: solo local y sin depurador salvo que se pida
+    # (el depurador de Werkzeug ejecuta código; para producción, usar
+    # servidor_produccion.py)
+    host = os.environ.get('PLANCHAS_HOST', '127.0.0.1')
+    puerto = int(os.environ.get('PORT', 5000))
+    depurar = os.environ.get('PLANCHAS_DEBUG', '').lower() in ('1', 'true', 'si', 'sí')
+    
     print("=" * 70)
     print("🚀 GENERADOR DE PLANCHAS DE STICKERS - WEBAPP v3.0")
     print("=" * 70)
-    print("\n📍 Servidor iniciado en: http://localhost:5000")
+    print(f"\n📍 Servidor iniciado en: http://{'localhost' if host == '127.0.0.1' else host}:{puerto}")
     print("🌐 Abre tu navegador y visita la URL")
+    if depurar:
+        print("⚠️  Modo debug activo (PLANCHAS_DEBUG): no lo expongas fuera de esta máquina")
+    print("🏭 Para producción: python3 servidor_produccion.py")
     print("\n💡 Presiona Ctrl+C para detener el servidor\n")
     print("=" * 70)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=depurar, host=host, port=puerto)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo asíncrono (ASGI) del backend de la WebApp
+
+Sirve los mismos handlers Flask de app.py desde un bucle asyncio:
+- Cada request Flask corre en un pool de hilos, nunca en el bucle
+- La generación de PDF usa un pool propio, así un render largo no deja sin
+  hilos a /api/status ni a las subidas
+- /api/upload-qrs se procesa de forma nativa: el multipart se decodifica a
+  medida que llega y los QRs se escriben en disco por lotes mientras se
+  sigue recibiendo el resto del cuerpo
+- /api/eventos (Server-Sent Events) también es nativo: cada navegador
+  conectado espera en el bucle, sin ocupar un hilo del pool
+
+Uso:
+    pip install uvicorn
+    python app_asgi.py
+    # o bien: uvicorn app_asgi:asgi_app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import (Data, Epilogue, Field, File, MultipartDecoder,
+                                       NeedData)
+from werkzeug.utils import secure_filename
+
+from almacenamiento import TAMANO_LOTE_FSYNC
+from estado_servidor import INTERVALO_KEEPALIVE, REINTENTO_MS, formatear_evento
+import app as webapp
+
+
+# Hilos para requests Flask comunes (status, subidas de logos, descargas...)
+WORKERS_REQUESTS = 16
+
+# Hilos para las rutas de render: uno por turno activo más la cola completa,
+# para que los pedidos esperen en el planificador (por prioridad) y no en el
+# orden de llegada de este pool. Los renders simultáneos los limita el
+# planificador (RENDERS_SIMULTANEOS), no este pool.
+WORKERS_RENDER = webapp.app.config['RENDERS_SIMULTANEOS'] + webapp.app.config['COLA_RENDERS_MAXIMA']
+
+# Rutas que se ejecutan en el pool de render
+RUTAS_RENDER = {'/api/generar-pdf', '/api/reimprimir', '/api/exportar-paginas'}
+
+_pool_requests = ThreadPoolExecutor(max_workers=WORKERS_REQUESTS,
+                                    thread_name_prefix='asgi-request')
+_pool_render = ThreadPoolExecutor(max_workers=WORKERS_RENDER,
+                                  thread_name_prefix='asgi-render')
+
+
+# ---------------------------------------------------------------------------
+# Puente WSGI -> ASGI (handlers Flask en un pool de hilos)
+# ---------------------------------------------------------------------------
+
+async def _leer_cuerpo(receive):
+    """Lee el cuerpo completo del request en un archivo temporal"""
+    cuerpo = SpooledTemporaryFile(max_size=1024 * 1024)
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'http.disconnect':
+            break
+        cuerpo.write(mensaje.get('body', b''))
+        if not mensaje.get('more_body'):
+            break
+    cuerpo.seek(0)
+    return cuerpo
+
+
+def _construir_environ(scope, cuerpo):
+    """Traduce un scope HTTP de ASGI a un environ WSGI"""
+    servidor = scope.get('server') or ('localhost', 80)
+    cliente = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(servidor[0]),
+        'SERVER_PORT': str(servidor[1]),
+        'REMOTE_ADDR': cliente[0],
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': cuerpo,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+    for nombre, valor in scope.get('headers', []):
+        nombre = nombre.decode('latin-1').upper().replace('-', '_')
+        valor = valor.decode('latin-1')
+        if nombre == 'CONTENT_TYPE':
+            clave = 'CONTENT_TYPE'
+        elif nombre == 'CONTENT_LENGTH':
+            clave = 'CONTENT_LENGTH'
+        else:
+            clave = f'HTTP_{nombre}'
+        environ[clave] = f"{environ[clave]},{valor}" if clave in environ else valor
+
+    return environ
+
+
+async def _llamar_flask(scope, receive, send, pool):
+    """Ejecuta el handler Flask en un hilo del pool y envía su respuesta"""
+    cuerpo = await _leer_cuerpo(receive)
+    environ = _construir_environ(scope, cuerpo)
+    loop = asyncio.get_running_loop()
+
+    def enviar(mensaje):
+        asyncio.run_coroutine_threadsafe(send(mensaje), loop).result()
+
+    def ejecutar():
+        respuesta = {}
+
+        def start_response(status, headers, exc_info=None):
+            respuesta['status'] = int(status.split(' ', 1)[0])
+            respuesta['headers'] = [
+                (k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers
+            ]
+
+        iterable = webapp.app(environ, start_response)
+        try:
+            iniciada = False
+            for bloque in iterable:
+                if not bloque:
+                    continue
+                if not iniciada:
+                    enviar({'type': 'http.response.start', 'status': respuesta['status'],
+                            'headers': respuesta['headers']})
+                    iniciada = True
+                enviar({'type': 'http.response.body', 'body': bloque, 'more_body': True})
+            if not iniciada:
+                enviar({'type': 'http.response.start', 'status': respuesta['status'],
+                        'headers': respuesta['headers']})
+            enviar({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+            cuerpo.close()
+
+    await loop.run_in_executor(pool, ejecutar)
+
+
+# ---------------------------------------------------------------------------
+# Subida de QRs en streaming
+# ---------------------------------------------------------------------------
+
+async def _responder_json(send, codigo, datos):
+    cuerpo = json.dumps(datos).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': codigo,
+                'headers': [(b'content-type', b'application/json'),
+                            (b'content-length', str(len(cuerpo)).encode())]})
+    await send({'type': 'http.response.body', 'body': cuerpo})
+
+
+async def _subir_qrs(scope, receive, send):
+    """
+    /api/upload-qrs sin bufferizar el request: cada QR completo se agrega al
+    lote actual y cada lote se escribe en el pool mientras se sigue leyendo
+    """
+    headers = dict(scope.get('headers', []))
+    tipo, opciones = parse_options_header(headers.get(b'content-type', b'').decode('latin-1'))
+    if tipo != 'multipart/form-data' or 'boundary' not in opciones:
+        await _responder_json(send, 400, {'success': False, 'error': 'No se enviaron archivos'})
+        return
+
+    loop = asyncio.get_running_loop()
+    decoder = MultipartDecoder(opciones['boundary'].encode('latin-1'))
+    limite = webapp.app.config.get('MAX_CONTENT_LENGTH')
+    recibidos = 0
+
+    errors = []
+    guardados = []
+    lote = {}
+    escritura = None
+    archivo_actual = None
+    partes = []
+    hubo_archivos = False
+
+    async def enviar_lote(lote_listo):
+        # Un lote en vuelo a la vez: conserva el orden (gana el último nombre)
+        nonlocal escritura
+        if escritura is not None:
+            ok, errores = await escritura
+            guardados.extend(ok)
+            errors.extend(errores)
+        escritura = loop.run_in_executor(_pool_requests, webapp.guardar_qrs, lote_listo)
+
+    terminado = False
+    while not terminado:
+        mensaje = await receive()
+        if mensaje['type'] == 'http.disconnect':
+            return
+        bloque = mensaje.get('body', b'')
+        recibidos += len(bloque)
+        if limite and recibidos > limite:
+            await _responder_json(send, 413, {'success': False,
+                                              'error': 'El envío supera el tamaño máximo'})
+            return
+        decoder.receive_data(bloque)
+        if not mensaje.get('more_body'):
+            decoder.receive_data(None)
+
+        evento = decoder.next_event()
+        while not isinstance(evento, NeedData):
+            if isinstance(evento, File):
+                archivo_actual = evento if evento.name == 'files[]' else None
+                partes = []
+            elif isinstance(evento, Field):
+                archivo_actual = None
+            elif isinstance(evento, Data) and archivo_actual is not None:
+                partes.append(evento.data)
+                if not evento.more_data:
+                    hubo_archivos = True
+                    filename = secure_filename(archivo_actual.filename or '')
+                    if filename and webapp.nombre_qr_valido(filename):
+                        lote[filename] = b''.join(partes)
+                    elif filename:
+                        errors.append(f"{filename}: debe seguir el formato whokey-NNN.png")
+                    archivo_actual = None
+                    partes = []
+                    if len(lote) >= TAMANO_LOTE_FSYNC:
+                        await enviar_lote(lote)
+                        lote = {}
+            elif isinstance(evento, Epilogue):
+                terminado = True
+                break
+            evento = decoder.next_event()
+
+        if not mensaje.get('more_body'):
+            terminado = True
+
+    if not hubo_archivos:
+        await _responder_json(send, 400, {'success': False, 'error': 'No se enviaron archivos'})
+        return
+
+    if lote:
+        await enviar_lote(lote)
+    if escritura is not None:
+        ok, errores = await escritura
+        guardados.extend(ok)
+        errors.extend(errores)
+
+    total = await loop.run_in_executor(_pool_requests, webapp.contador_qrs.total)
+    await _responder_json(send, 200, {
+        'success': True,
+        'uploaded': len(guardados),
+        'errors': errors,
+        'total_qrs': total
+    })
+
+
+# ---------------------------------------------------------------------------
+# Eventos de estado (SSE)
+# ---------------------------------------------------------------------------
+
+async def _esperar_desconexion(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _eventos(scope, receive, send):
+    """
+    /api/eventos sin hilo por conexión: el aviso de cada cambio llega al
+    bucle con call_soon_threadsafe y se envía la última versión del estado
+    """
+    loop = asyncio.get_running_loop()
+    aviso = asyncio.Event()
+    cancelar = webapp.estado.suscribir(lambda: loop.call_soon_threadsafe(aviso.set))
+    desconexion = asyncio.ensure_future(_esperar_desconexion(receive))
+    espera = None
+
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'body': f"retry: {REINTENTO_MS}\n\n".encode(),
+                    'more_body': True})
+        await loop.run_in_executor(_pool_requests, webapp.estado.revisar)
+
+        version = None
+        while True:
+            # Limpiar el aviso antes de leer: un cambio posterior no se pierde
+            aviso.clear()
+            nueva, estado = webapp.estado.instantanea()
+            if nueva != version:
+                version = nueva
+                await send({'type': 'http.response.body',
+                            'body': formatear_evento(version, estado).encode('utf-8'),
+                            'more_body': True})
+
+            espera = asyncio.ensure_future(aviso.wait())
+            listos, _ = await asyncio.wait({desconexion, espera}, timeout=INTERVALO_KEEPALIVE,
+                                           return_when=asyncio.FIRST_COMPLETED)
+            if desconexion in listos:
+                break
+            if not listos:
+                espera.cancel()
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n',
+                            'more_body': True})
+                await loop.run_in_executor(_pool_requests, webapp.estado.revisar)
+
+        await send({'type': 'http.response.body', 'body': b''})
+    except OSError:
+        # Cliente desconectado mientras se enviaba
+        pass
+    finally:
+        cancelar()
+        desconexion.cancel()
+        if espera is not None:
+            espera.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Aplicación ASGI
+# ---------------------------------------------------------------------------
+
+async def asgi_app(scope, receive, send):
+    """Punto de entrada ASGI"""
+    if scope['type'] == 'lifespan':
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                _pool_requests.shutdown(wait=False)
+                _pool_render.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    if scope['path'] == '/api/upload-qrs' and scope['method'] == 'POST':
+        await _subir_qrs(scope, receive, send)
+    elif scope['path'] == '/api/eventos' and scope['method'] == 'GET':
+        await _eventos(scope, receive, send)
+    elif scope['path'] in RUTAS_RENDER:
+        await _llamar_flask(scope, receive, send, _pool_render)
+    else:
+        await _llamar_flask(scope, receive, send, _pool_requests)
+
+
+def main():
+    """Inicia el servidor ASGI con uvicorn"""
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ Para el modo asíncrono instala uvicorn: pip install uvicorn")
+        return 1
+
+    puerto = int(os.environ.get('PORT', 5000))
+    print("=" * 70)
+    print("🚀 GENERADOR DE PLANCHAS DE STICKERS - WEBAPP v3.0 (ASGI)")
+    print("=" * 70)
+    print(f"\n📍 Servidor iniciado en: http://localhost:{puerto}")
+    print("\n💡 Presiona Ctrl+C para detener el servidor\n")
+    print("=" * 70)
+
+    uvicorn.run(asgi_app, host='0.0.0.0', port=puerto)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché de logos decodificados compartida entre procesos de render
+
+drawImage de reportlab decodifica y recomprime cada logo una vez por PDF:
+con la generación por tramos y varios procesos, el logo principal y cada
+logo especial se decodifican una vez por tramo en cada proceso. Acá cada
+imagen se decodifica y normaliza una sola vez (píxeles RGB, gris o CMYK de
+8 bits comprimidos con Flate, más el canal alfa como máscara suave) en un
+archivo por hash de contenido. Cada proceso lo abre con mmap de solo
+lectura: las páginas las comparte el sistema operativo y los datos se
+copian solo al escribirlos en el PDF.
+
+- Archivo <sha256>.img: encabezado JSON y luego los datos de la imagen y
+  de la máscara
+- Se escribe con temporal + rename: un proceso nunca abre uno a medias
+- La carpeta es privada del usuario (0700): si es de otro usuario o la
+  pueden escribir otros, la caché no se usa (nadie puede cambiar los
+  logos que se imprimen). Una entrada ilegible cuenta como ausente.
+- Al superar el presupuesto se borran los menos usados (la fecha de
+  modificación se actualiza al abrirlos). Un archivo borrado sigue
+  disponible para quien ya lo tiene abierto.
+- Los JPEG quedan a cargo de drawImage, que los embebe sin decodificar
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from PIL import Image
+from reportlab.lib.boxstuff import aspectRatioFix
+from reportlab.lib.utils import _digester
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFImageXObject, PDFName, PDFStream
+
+from almacenamiento import guardar_atomico
+
+
+# Carpeta de la caché (compartida por los procesos del mismo usuario)
+CARPETA_CACHE_IMAGENES = (os.environ.get('PLANCHAS_CACHE_IMAGENES')
+                          or os.path.join(tempfile.gettempdir(),
+                                          f"planchas_imagenes-{getattr(os, 'getuid', lambda: 0)()}"))
+
+# Tamaño máximo de la carpeta antes de borrar las menos usadas
+PRESUPUESTO_CACHE_IMAGENES = int(os.environ.get('PLANCHAS_CACHE_IMAGENES_MB') or 256) * 1024 * 1024
+
+# Imágenes abiertas que recuerda cada proceso (las menos usadas se olvidan)
+MAXIMO_ABIERTAS = 64
+
+# Extensiones que drawImage embebe sin decodificar
+EXTENSIONES_DIRECTAS = ('.jpg', '.jpeg')
+
+MAGICO = b'PLIMG1\n'
+
+# Modo de Pillow -> espacio de color del PDF
+_ESPACIOS = {'RGB': 'DeviceRGB', 'L': 'DeviceGray', 'CMYK': 'DeviceCMYK'}
+
+
+class _ImagenCompartida(PDFImageXObject):
+    """XObject de imagen con datos Flate tomados de la caché (sin copiarlos antes de tiempo)"""
+
+    def __init__(self, name, ancho, alto, espacio, datos):
+        super().__init__(name)
+        self.width = ancho
+        self.height = alto
+        self.bitsPerComponent = 8
+        self.colorSpace = espacio
+        self._filters = ('FlateDecode',)
+        self.streamContent = datos
+        self.mask = None
+
+    def format(self, document):
+        stream = PDFStream(content=bytes(self.streamContent))
+        diccionario = stream.dictionary
+        diccionario["Type"] = PDFName("XObject")
+        diccionario["Subtype"] = PDFName("Image")
+        diccionario["Width"] = self.width
+        diccionario["Height"] = self.height
+        diccionario["BitsPerComponent"] = 8
+        diccionario["ColorSpace"] = PDFName(self.colorSpace)
+        diccionario["Filter"] = PDFArray([PDFName("FlateDecode")])
+        if getattr(self, 'smask', None):
+            diccionario["SMask"] = self.smask
+        return stream.format(document)
+
+
+class ImagenPreparada:
+    """Imagen de la caché abierta en este proceso (vistas sobre el mmap)"""
+
+    def __init__(self, clave, ancho, alto, espacio, datos, alfa):
+        self.clave = clave
+        self.ancho = ancho
+        self.alto = alto
+        self.espacio = espacio
+        self.datos = datos
+        self.alfa = alfa
+
+
+def preparar_imagen(ruta):
+    """
+    Decodifica y normaliza una imagen para el PDF
+
+    Returns:
+        Bytes de la entrada de caché (encabezado + datos + máscara)
+    """
+    with Image.open(ruta) as imagen:
+        imagen.load()
+        tiene_alfa = 'A' in imagen.getbands() or 'transparency' in imagen.info
+        if imagen.mode in ('1', 'L', 'LA'):
+            modo = 'L'
+        elif imagen.mode == 'CMYK':
+            modo = 'CMYK'
+        else:
+            modo = 'RGB'
+
+        alfa = None
+        if tiene_alfa:
+            alfa = imagen.convert('LA' if modo == 'L' else 'RGBA').getchannel('A')
+            if alfa.getextrema() == (255, 255):
+                alfa = None
+        pixeles = imagen.convert(modo)
+
+    datos = zlib.compress(pixeles.tobytes())
+    datos_alfa = zlib.compress(alfa.tobytes()) if alfa is not None else b''
+    encabezado = json.dumps({
+        'ancho': pixeles.width, 'alto': pixeles.height, 'espacio': _ESPACIOS[modo],
+        'datos': len(datos), 'alfa': len(datos_alfa)
+    }).encode('utf-8')
+    return MAGICO + struct.pack('<I', len(encabezado)) + encabezado + datos + datos_alfa
+
+
+class CacheImagenes:
+    """Caché de imágenes preparadas en disco, abiertas con mmap en cada proceso"""
+
+    def __init__(self, carpeta=CARPETA_CACHE_IMAGENES, presupuesto=PRESUPUESTO_CACHE_IMAGENES):
+        """
+        Args:
+            carpeta: Carpeta de los archivos .img
+            presupuesto: Bytes máximos de la carpeta (se borran los menos usados)
+        """
+        self.carpeta = Path(carpeta)
+        self.presupuesto = presupuesto
+        # (ruta, tamaño, mtime) -> ImagenPreparada, para no releer el archivo
+        self._abiertas = OrderedDict()
+        # None hasta revisar la carpeta; False si no es segura (caché desactivada)
+        self._carpeta_segura = None
+        self.preparadas = 0
+        self.reutilizadas = 0
+
+    def obtener(self, ruta):
+        """
+        Imagen preparada para una ruta: la abre de la caché o la prepara
+
+        Returns:
+            ImagenPreparada, o None si la imagen no usa la caché (JPEG, o
+            carpeta de caché no segura)
+        """
+        if str(ruta).lower().endswith(EXTENSIONES_DIRECTAS):
+            return None
+        st = os.stat(ruta)
+        firma = (str(ruta), st.st_ino, st.st_size, st.st_mtime_ns)
+        imagen = self._abiertas.get(firma)
+        if imagen is not None:
+            self._abiertas.move_to_end(firma)
+            return imagen
+        if not self._preparar_carpeta():
+            return None
+
+        with open(ruta, 'rb') as f:
+            clave = hashlib.sha256(f.read()).hexdigest()
+        archivo = self.carpeta / f"{clave}.img"
+        try:
+            imagen = self._abrir(clave, archivo)
+            os.utime(archivo)
+            self.reutilizadas += 1
+        except (OSError, ValueError):
+            guardar_atomico(preparar_imagen(ruta), archivo, fsync=False)
+            self._recortar(archivo)
+            imagen = self._abrir(clave, archivo)
+            self.preparadas += 1
+
+        self._abiertas[firma] = imagen
+        while len(self._abiertas) > MAXIMO_ABIERTAS:
+            # El mmap se libera cuando ningún PDF en curso usa sus datos
+            self._abiertas.popitem(last=False)
+        return imagen
+
+    def _preparar_carpeta(self):
+        """
+        Crea la carpeta privada (0700) y comprueba que sea del usuario y
+        que nadie más pueda escribirla
+
+        Returns:
+            True si la caché se puede usar
+        """
+        if self._carpeta_segura is None:
+            try:
+                self.carpeta.mkdir(mode=0o700, parents=True, exist_ok=True)
+                st = os.lstat(self.carpeta)
+                self._carpeta_segura = os.path.isdir(self.carpeta) and not os.path.islink(self.carpeta)
+                if hasattr(os, 'getuid'):
+                    self._carpeta_segura = (self._carpeta_segura and st.st_uid == os.getuid()
+                                            and not st.st_mode & 0o022)
+            except OSError:
+                self._carpeta_segura = False
+            if not self._carpeta_segura:
+                print(f"⚠️  Caché de imágenes desactivada: {self.carpeta} no es una carpeta "
+                      f"privada de este usuario")
+        return self._carpeta_segura
+
+    def _abrir(self, clave, archivo):
+        """
+        Abre una entrada de la caché
+
+        Raises:
+            OSError: Si no existe
+            ValueError: Si está incompleta o mal formada (se vuelve a preparar)
+        """
+        with open(archivo, 'rb') as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        vista = memoryview(mapa)
+        if vista[:len(MAGICO)] != MAGICO:
+            raise ValueError(f"Entrada de caché inválida: {archivo}")
+        try:
+            inicio = len(MAGICO) + 4
+            largo, = struct.unpack_from('<I', vista, len(MAGICO))
+            encabezado = json.loads(bytes(vista[inicio:inicio + largo]))
+            inicio += largo
+            fin_datos = inicio + int(encabezado['datos'])
+            fin_alfa = fin_datos + int(encabezado['alfa'])
+            ancho, alto = int(encabezado['ancho']), int(encabezado['alto'])
+            espacio = encabezado['espacio']
+        except (struct.error, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Entrada de caché inválida ({e}): {archivo}") from None
+        if espacio not in _ESPACIOS.values() or fin_alfa > len(vista):
+            raise ValueError(f"Entrada de caché inválida: {archivo}")
+        alfa = vista[fin_datos:fin_alfa] if fin_alfa > fin_datos else None
+        return ImagenPreparada(clave, ancho, alto, espacio, vista[inicio:fin_datos], alfa)
+
+    def _recortar(self, conservar=None):
+        """Borra las entradas menos usadas hasta volver al presupuesto"""
+        entradas = []
+        for archivo in self.carpeta.glob('*.img'):
+            try:
+                st = archivo.stat()
+            except OSError:
+                continue
+            entradas.append((st.st_mtime_ns, st.st_size, archivo))
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, archivo in sorted(entradas):
+            if total <= self.presupuesto:
+                break
+            if archivo == conservar:
+                continue
+            try:
+                archivo.unlink()
+            except OSError:
+                # Windows no borra un archivo abierto con mmap: queda para la próxima
+                continue
+            total -= tamano
+
+
+_cache = None
+
+
+def cache_compartida():
+    """Caché del proceso (los procesos creados por fork la heredan vacía o llena)"""
+    global _cache
+    if _cache is None:
+        _cache = CacheImagenes()
+    return _cache
+
+
+def _registrar(c, xobjeto):
+    nombre_registro = c._doc.getXObjectName(xobjeto.name)
+    c._setXObjects(xobjeto)
+    return c._doc.Reference(xobjeto, nombre_registro)
+
+
+def dibujar_compartida(c, ruta, x, y, ancho, alto, cache=None):
+    """
+    Dibuja una imagen centrada en la caja (como drawImage con
+    preserveAspectRatio y mask='auto'), tomándola de la caché. Cada imagen
+    se embebe una sola vez por PDF.
+
+    Args:
+        c: Canvas de reportlab
+        ruta: Ruta de la imagen
+        x, y, ancho, alto: Caja en puntos
+        cache: CacheImagenes (None = la del proceso)
+
+    Returns:
+        True si se dibujó; False si la imagen no usa la caché (usar drawImage)
+    """
+    imagen = (cache or cache_compartida()).obtener(ruta)
+    if imagen is None:
+        return False
+
+    nombre = _digester(f"{imagen.clave}-compartida")
+    nombre_registro = c._doc.getXObjectName(nombre)
+    xobjeto = c._doc.idToObject.get(nombre_registro)
+    if xobjeto is None:
+        xobjeto = _ImagenCompartida(nombre, imagen.ancho, imagen.alto, imagen.espacio,
+                                    imagen.datos)
+        if imagen.alfa is not None:
+            mascara = _ImagenCompartida(_digester(f"{imagen.clave}-alfa"), imagen.ancho,
+                                        imagen.alto, 'DeviceGray', imagen.alfa)
+            xobjeto.smask = _registrar(c, mascara)
+        _registrar(c, xobjeto)
+        c._doc.addForm(nombre, xobjeto)
+
+    x, y, ancho, alto, _ = aspectRatioFix(True, 'c', x, y, ancho, alto,
+                                          xobjeto.width, xobjeto.height)
+    c._currentPageHasImages = 1
+    c.saveState()
+    c.translate(x, y)
+    c.scale(ancho, alto)
+    c._code.append(f"/{nombre_registro} Do")
+    c.restoreState()
+    c._formsinuse.append(nombre)
+    return True
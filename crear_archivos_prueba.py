@@ -3,12 +3,38 @@
 """
 Script para generar archivos de prueba (logo y QRs de ejemplo)
 Útil para probar el generador de planchas sin tener los archivos reales
+
+Uso:
+    python crear_archivos_prueba.py                  # logo + 50 QRs
+    python crear_archivos_prueba.py --cantidad 100000 --rapido --bitonal
+    python crear_archivos_prueba.py --cantidad 50000 --zip qrs_prueba.zip
+    python crear_archivos_prueba.py --cantidad 100000 --manifiesto lote.json
+    python crear_archivos_prueba.py --desde-manifiesto lote.json --carpeta qrs
+
+El modo rápido reparte los QRs entre procesos, fija versión y máscara del
+QR (el cálculo de la mejor máscara es lo más costoso de qrcode) y dibuja
+cada módulo directamente al tamaño final, sin redimensionar.
 """
 
+import argparse
+import io
+import json
 import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
-import qrcode
+
+
+# Datos codificados en cada QR de prueba
+PLANTILLA_DATOS = "https://whokey.com/verify/{numero:03d}"
+
+# QRs por tarea del pool en el modo rápido
+QRS_POR_BLOQUE = 500
+
+# Identificador del formato de manifiesto
+FORMATO_MANIFIESTO = 'qrs-sinteticos'
 
 
 def crear_logo_prueba(ruta="logo.png", tamano=250):
@@ -61,11 +87,13 @@ def crear_qr_prueba(numero, carpeta="qrs", tamano=210):
         carpeta: Carpeta donde guardar el QR
         tamano: Tamaño en píxeles (210px = ~2.1cm a 254dpi)
     """
+    import qrcode
+    
     # Crear carpeta si no existe
-    Path(carpeta).mkdir(exist_ok=True)
+    Path(carpeta).mkdir(parents=True, exist_ok=True)
     
     # Generar QR con datos de prueba
-    datos = f"https://whokey.com/verify/{numero:03d}"
+    datos = PLANTILLA_DATOS.format(numero=numero)
     
     qr = qrcode.QRCode(
         version=1,
@@ -89,12 +117,212 @@ def crear_qr_prueba(numero, carpeta="qrs", tamano=210):
     return ruta
 
 
-def crear_archivos_prueba(cantidad_qrs=50):
+def _parametros_qr(numero_maximo, plantilla=PLANTILLA_DATOS):
+    """
+    Versión de QR que admite los datos más largos del lote (se calcula una
+    sola vez) y máscara fija para todo el lote
+    """
+    import qrcode
+    
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H, border=1)
+    qr.add_data(plantilla.format(numero=numero_maximo))
+    qr.make(fit=True)
+    return qr.version, 0
+
+
+def matriz_qr(datos, version, mascara):
+    """Matriz de módulos (filas de booleanos, True = negro) con borde de 1 módulo"""
+    import qrcode
+    
+    qr = qrcode.QRCode(version=version, error_correction=qrcode.constants.ERROR_CORRECT_H,
+                       border=1, mask_pattern=mascara)
+    qr.add_data(datos)
+    qr.make(fit=False)
+    return qr.get_matrix()
+
+
+def renderizar_matriz(matriz, tamano=210, bitonal=False):
+    """
+    Dibuja la matriz directamente a tamano x tamano píxeles: cada módulo
+    ocupa un bloque entero de píxeles, sin remuestreo ni suavizado
+    
+    Args:
+        matriz: Filas de booleanos (True = negro)
+        tamano: Lado de la imagen en píxeles
+        bitonal: Si True, imagen de 1 bit (PNG más chico)
+        
+    Returns:
+        Imagen PIL ('1' si bitonal, si no 'L')
+    """
+    n = len(matriz)
+    bordes = [i * tamano // n for i in range(n + 1)]
+    anchos = [bordes[i + 1] - bordes[i] for i in range(n)]
+    
+    filas = []
+    for fila, alto in zip(matriz, anchos):
+        linea = b''.join((b'\x00' if modulo else b'\xff') * ancho
+                         for modulo, ancho in zip(fila, anchos))
+        filas.append(linea * alto)
+    
+    img = Image.frombytes('L', (tamano, tamano), b''.join(filas))
+    return img.convert('1', dither=0) if bitonal else img
+
+
+def _png_qr(numero, version, mascara, tamano, bitonal, plantilla):
+    img = renderizar_matriz(matriz_qr(plantilla.format(numero=numero), version, mascara),
+                            tamano, bitonal)
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def _nombre_qr(numero):
+    return f"whokey-{numero:03d}.png"
+
+
+def _generar_bloque(desde, hasta, carpeta, version, mascara, tamano, bitonal, plantilla):
+    """
+    Tarea del pool: genera los QRs desde..hasta-1. Con carpeta los escribe
+    ahí y devuelve la cantidad; sin carpeta devuelve [(nombre, bytes_png)].
+    """
+    resultado = []
+    for numero in range(desde, hasta):
+        png = _png_qr(numero, version, mascara, tamano, bitonal, plantilla)
+        if carpeta is None:
+            resultado.append((_nombre_qr(numero), png))
+        else:
+            with open(os.path.join(carpeta, _nombre_qr(numero)), 'wb') as f:
+                f.write(png)
+    return resultado if carpeta is None else hasta - desde
+
+
+def generar_lote_rapido(cantidad, inicio=1, carpeta=None, tamano=210, bitonal=False,
+                        workers=None, plantilla=PLANTILLA_DATOS):
+    """
+    Genera un lote de QRs en paralelo, por bloques
+    
+    Args:
+        cantidad: Cantidad de QRs
+        inicio: Primer número del lote
+        carpeta: Carpeta donde escribir los PNG (None = no escribir y
+            entregar los bytes)
+        tamano: Lado de cada QR en píxeles
+        bitonal: Si True, PNG de 1 bit
+        workers: Procesos (None = todos los núcleos)
+        plantilla: Texto codificado, con {numero}
+        
+    Yields:
+        Con carpeta, la cantidad de QRs de cada bloque terminado; sin
+        carpeta, tuplas (nombre, bytes_png) en orden de número
+    """
+    if carpeta is not None:
+        Path(carpeta).mkdir(parents=True, exist_ok=True)
+        carpeta = str(carpeta)
+    
+    version, mascara = _parametros_qr(inicio + cantidad - 1, plantilla)
+    fin = inicio + cantidad
+    bloques = [(desde, min(desde + QRS_POR_BLOQUE, fin))
+               for desde in range(inicio, fin, QRS_POR_BLOQUE)]
+    workers = workers or os.cpu_count() or 1
+    
+    def tarea(bloque):
+        return (bloque[0], bloque[1], carpeta, version, mascara, tamano, bitonal, plantilla)
+    
+    if workers <= 1 or len(bloques) <= 1:
+        resultados = (_generar_bloque(*tarea(bloque)) for bloque in bloques)
+        for resultado in resultados:
+            if carpeta is None:
+                yield from resultado
+            else:
+                yield resultado
+        return
+    
+    with ProcessPoolExecutor(max_workers=min(workers, len(bloques))) as pool:
+        futuros = [pool.submit(_generar_bloque, *tarea(bloque)) for bloque in bloques]
+        try:
+            for futuro in futuros:
+                if carpeta is None:
+                    yield from futuro.result()
+                else:
+                    yield futuro.result()
+        finally:
+            for futuro in futuros:
+                futuro.cancel()
+
+
+def escribir_zip_lote(ruta_zip, cantidad, inicio=1, **opciones):
+    """
+    Escribe un lote de QRs directamente en un ZIP (sin archivos sueltos)
+    
+    Returns:
+        Cantidad de QRs escritos
+    """
+    total = 0
+    # Los PNG ya vienen comprimidos
+    with zipfile.ZipFile(ruta_zip, 'w', compression=zipfile.ZIP_STORED) as archivo_zip:
+        for nombre, png in generar_lote_rapido(cantidad, inicio, **opciones):
+            archivo_zip.writestr(nombre, png)
+            total += 1
+    return total
+
+
+def guardar_manifiesto(ruta, cantidad, inicio=1, tamano=210, bitonal=False,
+                       plantilla=PLANTILLA_DATOS):
+    """
+    Guarda la descripción de un lote sin generar ninguna imagen: los QRs se
+    producen bajo demanda con iterar_manifiesto o materializar_manifiesto
+    """
+    manifiesto = {
+        'formato': FORMATO_MANIFIESTO,
+        'version': 1,
+        'inicio': inicio,
+        'cantidad': cantidad,
+        'tamano': tamano,
+        'bitonal': bitonal,
+        'plantilla': plantilla
+    }
+    with open(ruta, 'w') as f:
+        json.dump(manifiesto, f, indent=2)
+    return manifiesto
+
+
+def _leer_manifiesto(ruta):
+    with open(ruta, 'r') as f:
+        manifiesto = json.load(f)
+    if manifiesto.get('formato') != FORMATO_MANIFIESTO:
+        raise ValueError(f"{ruta} no es un manifiesto de QRs de prueba")
+    return manifiesto
+
+
+def iterar_manifiesto(ruta, workers=None):
+    """Genera bajo demanda los (nombre, bytes_png) de un manifiesto, en orden"""
+    m = _leer_manifiesto(ruta)
+    yield from generar_lote_rapido(m['cantidad'], m['inicio'], tamano=m['tamano'],
+                                   bitonal=m['bitonal'], workers=workers,
+                                   plantilla=m['plantilla'])
+
+
+def materializar_manifiesto(ruta, carpeta="qrs", workers=None):
+    """
+    Escribe en carpeta los QRs descritos por un manifiesto
+    
+    Returns:
+        Cantidad de QRs escritos
+    """
+    m = _leer_manifiesto(ruta)
+    return sum(generar_lote_rapido(m['cantidad'], m['inicio'], carpeta, m['tamano'],
+                                   m['bitonal'], workers, m['plantilla']))
+
+
+def crear_archivos_prueba(cantidad_qrs=50, inicio=1, carpeta="qrs", tamano=210):
     """
     Crea todos los archivos de prueba necesarios
     
     Args:
         cantidad_qrs: Cantidad de QRs a generar
+        inicio: Primer número de QR
+        carpeta: Carpeta donde guardar los QRs
+        tamano: Lado del QR en píxeles
     """
     print("=" * 60)
     print("GENERADOR DE ARCHIVOS DE PRUEBA")
@@ -109,7 +337,7 @@ def crear_archivos_prueba(cantidad_qrs=50):
         # Crear QRs
         print(f"\n🔲 Generando {cantidad_qrs} códigos QR de prueba...")
         for i in range(1, cantidad_qrs + 1):
-            crear_qr_prueba(i)
+            crear_qr_prueba(inicio + i - 1, carpeta, tamano)
             if i % 10 == 0:
                 print(f"   ✓ {i} QRs generados...")
         
@@ -138,6 +366,64 @@ def crear_archivos_prueba(cantidad_qrs=50):
     return 0
 
 
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Genera archivos de prueba (logo y QRs)")
+    parser.add_argument('--cantidad', type=int, default=50, help="Cantidad de QRs")
+    parser.add_argument('--inicio', type=int, default=1, help="Primer número de QR")
+    parser.add_argument('--carpeta', default='qrs', help="Carpeta de destino de los QRs")
+    parser.add_argument('--tamano', type=int, default=210, help="Lado del QR en píxeles")
+    parser.add_argument('--rapido', action='store_true',
+                        help="Generación en paralelo, sin remuestreo")
+    parser.add_argument('--bitonal', action='store_true', help="PNG de 1 bit (modo rápido)")
+    parser.add_argument('--workers', type=int, help="Procesos del modo rápido (por defecto, todos)")
+    destino = parser.add_mutually_exclusive_group()
+    destino.add_argument('--zip', help="Escribir los QRs en este ZIP en lugar de archivos sueltos")
+    destino.add_argument('--manifiesto',
+                         help="Guardar solo la descripción del lote (sin generar imágenes)")
+    destino.add_argument('--desde-manifiesto', help="Generar los QRs de un manifiesto en --carpeta")
+    args = parser.parse_args()
+    
+    rapido = args.rapido or args.bitonal or args.zip or args.desde_manifiesto
+    if not (rapido or args.manifiesto):
+        # Generar 50 QRs de prueba (casi 2 páginas A3) por defecto
+        return crear_archivos_prueba(cantidad_qrs=args.cantidad, inicio=args.inicio,
+                                     carpeta=args.carpeta, tamano=args.tamano)
+    
+    opciones = {'tamano': args.tamano, 'bitonal': args.bitonal, 'workers': args.workers}
+    inicio = time.perf_counter()
+    try:
+        if args.manifiesto:
+            guardar_manifiesto(args.manifiesto, args.cantidad, args.inicio,
+                               args.tamano, args.bitonal)
+            print(f"✓ Manifiesto de {args.cantidad} QRs guardado: {args.manifiesto}")
+            return 0
+        
+        if not Path("logo.png").exists():
+            crear_logo_prueba()
+        
+        if args.desde_manifiesto:
+            total = materializar_manifiesto(args.desde_manifiesto, args.carpeta, args.workers)
+            destino = args.carpeta
+        elif args.zip:
+            total = escribir_zip_lote(args.zip, args.cantidad, args.inicio, **opciones)
+            destino = args.zip
+        else:
+            total = sum(generar_lote_rapido(args.cantidad, args.inicio, args.carpeta, **opciones))
+            destino = args.carpeta
+    
+    except ImportError as e:
+        print(f"\n❌ ERROR: Faltan librerías")
+        print(f"   {e}")
+        print("\nInstala las dependencias:")
+        print("  pip install Pillow qrcode[pil]")
+        return 1
+    
+    segundos = time.perf_counter() - inicio
+    print(f"✓ {total} QRs generados en {destino} ({segundos:.1f}s, "
+          f"{total / max(segundos, 1e-9):.0f} QRs/s)")
+    return 0
+
+
 if __name__ == "__main__":
-    # Generar 50 QRs de prueba (casi 2 páginas A3)
-    exit(crear_archivos_prueba(cantidad_qrs=50))
+    exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estado de la WebApp en memoria, con aviso a los suscriptores
+
+Cada navegador abierto se suscribe una vez (Server-Sent Events) y recibe el
+estado completo cada vez que cambia, en lugar de pedir /api/status después
+de cada acción. El estado se calcula una sola vez por cambio (no una vez
+por cliente) y los clientes lentos reciben solo la última versión.
+
+Con varios procesos (gunicorn) cada uno tiene su propio estado: los cambios
+hechos por otro proceso se detectan comparando una firma barata de disco
+(stat de carpetas y archivos) en cada keep-alive.
+"""
+
+import json
+import threading
+import time
+
+
+# Segundos entre comentarios keep-alive del flujo SSE
+INTERVALO_KEEPALIVE = 15
+
+# Milisegundos que espera el navegador antes de reconectar
+REINTENTO_MS = 3000
+
+
+def formatear_evento(version, estado):
+    """Evento SSE 'estado' con el estado completo en JSON"""
+    datos = json.dumps(estado, ensure_ascii=False)
+    return f"id: {version}\nevent: estado\ndata: {datos}\n\n"
+
+
+class EstadoServidor:
+    """
+    Estado publicado a los clientes: lo calculado desde disco más los campos
+    publicados por la app (p. ej. el progreso de una generación)
+    """
+
+    def __init__(self, calcular, firma=None):
+        """
+        Args:
+            calcular: Función (recontar) -> dict con el estado de disco;
+                recontar=True cuando la firma indica cambios externos
+            firma: Función opcional -> valor comparable que cambia cuando
+                cambian los archivos (detecta cambios de otros procesos)
+        """
+        self._calcular = calcular
+        self._firma = firma
+        self._firma_actual = None
+        self._base = None
+        self._extra = {}
+        self._version = 0
+        self._condicion = threading.Condition()
+        self._suscriptores = set()
+
+    def _estado(self):
+        return {**self._base, **self._extra}
+
+    def _publicar(self):
+        """
+        Incrementa la versión y despierta a los que esperan (se llama con la
+        condición tomada)
+
+        Returns:
+            Suscriptores a avisar una vez liberada la condición
+        """
+        self._version += 1
+        self._condicion.notify_all()
+        return list(self._suscriptores)
+
+    def _avisar(self, suscriptores):
+        for funcion in suscriptores:
+            funcion()
+
+    def actualizar(self, recontar=False):
+        """Recalcula el estado de disco y lo publica si cambió"""
+        firma = self._firma() if self._firma else None
+        base = self._calcular(recontar)
+        with self._condicion:
+            self._firma_actual = firma
+            if base == self._base:
+                return
+            self._base = base
+            suscriptores = self._publicar()
+        self._avisar(suscriptores)
+
+    def revisar(self):
+        """Recalcula solo si la firma de disco cambió (cambios de otro proceso)"""
+        if self._base is None:
+            self.actualizar()
+        elif self._firma and self._firma() != self._firma_actual:
+            self.actualizar(recontar=True)
+
+    def publicar(self, **campos):
+        """Publica campos propios de la app (se combinan con el estado de disco)"""
+        if self._base is None:
+            self.actualizar()
+        with self._condicion:
+            self._extra.update(campos)
+            suscriptores = self._publicar()
+        self._avisar(suscriptores)
+
+    def instantanea(self):
+        """
+        Returns:
+            Tupla (version, estado_dict)
+        """
+        if self._base is None:
+            self.actualizar()
+        with self._condicion:
+            return self._version, self._estado()
+
+    def esperar(self, version, timeout=INTERVALO_KEEPALIVE):
+        """
+        Espera hasta que la versión sea distinta de version (o timeout)
+
+        Returns:
+            Tupla (version, estado_dict) actual
+        """
+        if self._base is None:
+            self.actualizar()
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._version != version, timeout)
+            return self._version, self._estado()
+
+    def suscribir(self, funcion):
+        """
+        Registra una función sin argumentos que se llama en cada cambio
+        (desde el hilo que publica; debe ser rápida)
+
+        Returns:
+            Función que cancela la suscripción
+        """
+        with self._condicion:
+            self._suscriptores.add(funcion)
+
+        def cancelar():
+            with self._condicion:
+                self._suscriptores.discard(funcion)
+
+        return cancelar
+
+    def eventos_sse(self, intervalo_keepalive=INTERVALO_KEEPALIVE, duracion_maxima=None):
+        """
+        Flujo SSE para un cliente (un hilo por conexión, modo WSGI)
+
+        Args:
+            intervalo_keepalive: Segundos entre comentarios keep-alive
+            duracion_maxima: Segundos tras los que se cierra el flujo (el
+                navegador reconecta a los REINTENTO_MS y recibe el estado
+                completo); None = sin límite
+
+        Yields:
+            Texto del flujo: un evento por cada versión nueva y un
+            comentario keep-alive cuando no hay cambios
+        """
+        yield f"retry: {REINTENTO_MS}\n\n"
+        self.revisar()
+        version = None
+        fin = time.monotonic() + duracion_maxima if duracion_maxima else None
+        while fin is None or time.monotonic() < fin:
+            # La última espera no pasa de la duración máxima
+            espera = intervalo_keepalive if fin is None else min(intervalo_keepalive,
+                                                                 fin - time.monotonic())
+            nueva, estado = self.esperar(version, max(0, espera))
+            if nueva == version and fin is not None and time.monotonic() >= fin:
+                break
+            if nueva == version:
+                yield ": keepalive\n\n"
+                self.revisar()
+                continue
+            version = nueva
+            yield formatear_evento(version, estado)
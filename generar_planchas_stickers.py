@@ -1,319 +1,346 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Script para generación de planchas de stickers para llaveros
-Formato: A3 (29.7cm x 42cm) a 300 DPI
-Compatible con Adobe Illustrator para impresión profesional
-
-ESPECIFICACIONES:
-- Márgenes de seguridad: 1.5cm en todos los lados
-- ID fuera de los stickers (separado 0.8cm del primer círculo)
-- Troqueles en Magenta (RGB: 1,0,1) de 0.5pts
-- Logo: 2.5cm, QR: 2.1cm, Troquel: 2.6cm
-- 32 filas por página (2 columnas × 16 filas)
-
-Autor: Desarrollador Senior Python
-Fecha: 2026-01-30
-Versión: 2.0
+Generador de planchas de stickers por línea de comandos
+Usa el mismo motor que la WebApp (pdf_generator.GeneradorPlanchasPDF):
+A3, 28 filas por página, logos especiales por rango de IDs, generación por
+tramos reanudable y render en paralelo.
+
+Uso:
+    python generar_planchas_stickers.py
+    python generar_planchas_stickers.py --qrs qrs --logo logo.png \\
+        --mapeo logos_especiales_mapeo.json --salida output/planchas.pdf
+    python generar_planchas_stickers.py --ids "1-5000" --workers 8
+    python generar_planchas_stickers.py --paginas-por-archivo 100 --json
+    python generar_planchas_stickers.py --por-pagina png --salida /rip/hotfolder
+
+Si una ejecución se interrumpe, volver a lanzarla con los mismos argumentos
+retoma desde los tramos ya guardados en la carpeta de caché.
+
+Versión: 3.0
 """
 
+import argparse
+import json
 import os
-import re
+import shutil
+import sys
+import tempfile
+import time
 from pathlib import Path
-from reportlab.lib.pagesizes import A3
-from reportlab.lib.units import cm
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import Color, magenta
-
-
-class GeneradorPlanchasStickers:
-    """Clase para generar planchas de stickers en formato A3"""
-    
-    # Dimensiones de la página A3
-    ANCHO_PAGINA = 29.7 * cm
-    ALTO_PAGINA = 42 * cm
-    
-    # Especificaciones de stickers
-    TAMANO_LOGO = 2.5 * cm
-    TAMANO_QR = 2.1 * cm
-    DIAMETRO_TROQUEL = 2.6 * cm
-    GROSOR_LINEA_CORTE = 0.5
-    
-    # Color de línea de corte (Magenta)
-    COLOR_TROQUEL = Color(1, 0, 1)  # RGB: 1, 0, 1
-    
-    # Configuración de grilla
-    COLUMNAS = 2
-    FILAS_POR_COLUMNA = 16
-    FILAS_TOTALES_POR_HOJA = COLUMNAS * FILAS_POR_COLUMNA  # 32 filas
-    
-    # Márgenes y espaciado (actualizados para seguridad de impresión)
-    MARGEN_SUPERIOR = 1.5 * cm
-    MARGEN_INFERIOR = 1.5 * cm
-    MARGEN_IZQUIERDO = 1.5 * cm
-    MARGEN_DERECHO = 1.5 * cm
-    ESPACIO_ENTRE_ELEMENTOS = 0.3 * cm
-    ESPACIO_ENTRE_FILAS = 0.5 * cm
-    ANCHO_ZONA_ID = 1.5 * cm  # Espacio reservado para el número ID (fuera de stickers)
-    SEPARACION_ID_STICKER = 0.8 * cm  # Separación mínima entre ID y primer círculo
-    
-    def __init__(self, carpeta_qrs="qrs", archivo_logo="logo.png", 
+
+from pdf_generator import (GeneradorPlanchasPDF, RangosIds, parsear_ids_texto, ErrorIdsTexto,
+                           FORMATOS_EXPORTACION, DPI_EXPORTACION, CODIFICACIONES_QR,
+                           zip_en_streaming)
+from mapeo_logos import MapeoLogosRangos
+
+
+class GeneradorPlanchasStickers(GeneradorPlanchasPDF):
+    """
+    Interfaz de la versión 2.0 (carpeta, logo y salida en el constructor)
+    sobre el motor actual
+    """
+
+    def __init__(self, carpeta_qrs="qrs", archivo_logo="logo.png",
                  archivo_salida="planchas_stickers.pdf"):
         """
         Inicializa el generador de planchas
-        
+
         Args:
             carpeta_qrs: Ruta a la carpeta con los archivos QR
             archivo_logo: Ruta al archivo del logo
             archivo_salida: Nombre del archivo PDF de salida
         """
-        self.carpeta_qrs = Path(carpeta_qrs)
-        self.archivo_logo = Path(archivo_logo)
+        super().__init__(carpeta_qrs, archivo_logo)
+        self.archivo_logo = self.logo_principal
         self.archivo_salida = archivo_salida
-        self.qrs_ordenados = []
-        
-    def validar_archivos(self):
-        """Valida que existan los archivos necesarios"""
-        errores = []
-        
-        # Validar logo
-        if not self.archivo_logo.exists():
-            errores.append(f"❌ No se encontró el archivo del logo: {self.archivo_logo}")
-        
-        # Validar carpeta de QRs
-        if not self.carpeta_qrs.exists():
-            errores.append(f"❌ No se encontró la carpeta de QRs: {self.carpeta_qrs}")
-        else:
-            # Obtener y ordenar QRs
-            self.qrs_ordenados = self._obtener_qrs_ordenados()
-            if not self.qrs_ordenados:
-                errores.append(f"❌ No se encontraron archivos QR en: {self.carpeta_qrs}")
-        
-        if errores:
-            raise FileNotFoundError("\n".join(errores))
-        
-        print(f"✓ Logo encontrado: {self.archivo_logo}")
-        print(f"✓ Carpeta QRs encontrada: {self.carpeta_qrs}")
-        print(f"✓ Total de QRs encontrados: {len(self.qrs_ordenados)}")
-        
-    def _obtener_qrs_ordenados(self):
-        """
-        Obtiene y ordena los archivos QR por número (NNN)
-        
-        Returns:
-            Lista de tuplas (numero_id, ruta_archivo)
-        """
-        qrs = []
-        patron = re.compile(r'whokey-(\d+)\.png', re.IGNORECASE)
-        
-        for archivo in self.carpeta_qrs.glob("*.png"):
-            match = patron.match(archivo.name)
-            if match:
-                numero = int(match.group(1))
-                qrs.append((numero, archivo))
-        
-        # Ordenar por número
-        qrs.sort(key=lambda x: x[0])
-        return qrs
-    
-    def _dibujar_circulo_troquel(self, c, x_centro, y_centro):
-        """
-        Dibuja el círculo de troquel (línea de corte)
-        
-        Args:
-            c: Canvas de reportlab
-            x_centro: Coordenada X del centro
-            y_centro: Coordenada Y del centro
-        """
-        c.setStrokeColor(self.COLOR_TROQUEL)
-        c.setLineWidth(self.GROSOR_LINEA_CORTE)
-        c.circle(x_centro, y_centro, self.DIAMETRO_TROQUEL / 2, stroke=1, fill=0)
-    
-    def _dibujar_imagen_centrada(self, c, ruta_imagen, x_centro, y_centro, tamano):
-        """
-        Dibuja una imagen centrada en las coordenadas especificadas
-        
-        Args:
-            c: Canvas de reportlab
-            ruta_imagen: Ruta al archivo de imagen
-            x_centro: Coordenada X del centro
-            y_centro: Coordenada Y del centro
-            tamano: Tamaño de la imagen (ancho y alto)
-        """
-        x = x_centro - (tamano / 2)
-        y = y_centro - (tamano / 2)
-        
-        try:
-            c.drawImage(str(ruta_imagen), x, y, 
-                       width=tamano, height=tamano, 
-                       preserveAspectRatio=True, mask='auto')
-        except Exception as e:
-            print(f"⚠️  Error al cargar imagen {ruta_imagen}: {e}")
-    
-    def _dibujar_texto_id(self, c, numero_id, x, y):
-        """
-        Dibuja el número de ID a la izquierda de la fila (fuera de los stickers)
-        
-        Args:
-            c: Canvas de reportlab
-            numero_id: Número identificador
-            x: Coordenada X (posición del texto)
-            y: Coordenada Y (centro vertical de la fila)
-        """
-        c.setFont("Helvetica-Bold", 10)
-        c.setFillColorRGB(0, 0, 0)  # Negro
-        # Alinear verticalmente el texto con el centro de la fila
-        # drawString dibuja desde la baseline, ajustamos para centrar
-        c.drawString(x, y - 3, str(numero_id))
-    
-    def _calcular_posicion_fila(self, indice_fila_global):
-        """
-        Calcula la posición de una fila en la página
-        
-        Args:
-            indice_fila_global: Índice de fila (0-31)
-            
-        Returns:
-            Tupla (x_inicio, y_centro) para la fila
-        """
-        # Determinar columna (0 o 1)
-        columna = indice_fila_global // self.FILAS_POR_COLUMNA
-        # Fila dentro de la columna (0-15)
-        fila_en_columna = indice_fila_global % self.FILAS_POR_COLUMNA
-        
-        # Calcular ancho disponible por columna (descontando márgenes izquierdo y derecho)
-        ancho_disponible = self.ANCHO_PAGINA - self.MARGEN_IZQUIERDO - self.MARGEN_DERECHO
-        ancho_columna = ancho_disponible / self.COLUMNAS
-        
-        # Posición X inicial de la columna (incluye margen izquierdo + zona para ID)
-        x_columna = self.MARGEN_IZQUIERDO + (columna * ancho_columna)
-        
-        # Posición Y (desde arriba hacia abajo, con margen superior)
-        altura_fila = self.DIAMETRO_TROQUEL + self.ESPACIO_ENTRE_FILAS
-        y_centro = (self.ALTO_PAGINA - self.MARGEN_SUPERIOR - 
-                   (fila_en_columna * altura_fila) - (self.DIAMETRO_TROQUEL / 2))
-        
-        return x_columna, y_centro
-    
-    def _dibujar_fila_stickers(self, c, numero_id, ruta_qr, indice_fila):
-        """
-        Dibuja una fila completa de stickers
-        
-        Estructura: [ID] (espacio) [Logo] [Logo] [QR] [QR]
-        El ID está completamente fuera de los círculos de corte
-        
-        Args:
-            c: Canvas de reportlab
-            numero_id: Número identificador
-            ruta_qr: Ruta al archivo QR
-            indice_fila: Índice de la fila en la página (0-31)
-        """
-        x_inicio, y_centro = self._calcular_posicion_fila(indice_fila)
-        
-        # Dibujar número de ID a la izquierda (FUERA de los stickers)
-        x_id = x_inicio + 0.2 * cm  # Pequeño margen desde el borde de la columna
-        self._dibujar_texto_id(c, numero_id, x_id, y_centro)
-        
-        # Posición X donde comienzan los stickers (después del ID + separación)
-        x_actual = x_inicio + self.ANCHO_ZONA_ID + self.SEPARACION_ID_STICKER
-        
-        # 1. Primer Logo con troquel
-        self._dibujar_circulo_troquel(c, x_actual, y_centro)
-        self._dibujar_imagen_centrada(c, self.archivo_logo, x_actual, y_centro, 
-                                     self.TAMANO_LOGO)
-        x_actual += self.DIAMETRO_TROQUEL + self.ESPACIO_ENTRE_ELEMENTOS
-        
-        # 2. Segundo Logo con troquel
-        self._dibujar_circulo_troquel(c, x_actual, y_centro)
-        self._dibujar_imagen_centrada(c, self.archivo_logo, x_actual, y_centro, 
-                                     self.TAMANO_LOGO)
-        x_actual += self.DIAMETRO_TROQUEL + self.ESPACIO_ENTRE_ELEMENTOS
-        
-        # 3. Primer QR con troquel
-        self._dibujar_circulo_troquel(c, x_actual, y_centro)
-        self._dibujar_imagen_centrada(c, ruta_qr, x_actual, y_centro, 
-                                     self.TAMANO_QR)
-        x_actual += self.DIAMETRO_TROQUEL + self.ESPACIO_ENTRE_ELEMENTOS
-        
-        # 4. Segundo QR (mismo) con troquel
-        self._dibujar_circulo_troquel(c, x_actual, y_centro)
-        self._dibujar_imagen_centrada(c, ruta_qr, x_actual, y_centro, 
-                                     self.TAMANO_QR)
-    
-    def generar_pdf(self):
-        """Genera el archivo PDF con todas las planchas necesarias"""
-        self.validar_archivos()
-        
-        # Crear canvas
-        c = canvas.Canvas(self.archivo_salida, pagesize=A3)
-        c.setTitle("Planchas de Stickers - Llaveros WhoKey")
-        c.setAuthor("Sistema Automatizado")
-        
-        total_qrs = len(self.qrs_ordenados)
-        total_paginas = (total_qrs + self.FILAS_TOTALES_POR_HOJA - 1) // self.FILAS_TOTALES_POR_HOJA
-        
-        print(f"\n📄 Generando PDF con {total_paginas} página(s) A3...")
-        print(f"   Total de filas: {total_qrs}")
-        print(f"   Filas por página: {self.FILAS_TOTALES_POR_HOJA}")
-        
-        # Procesar cada QR
-        for idx, (numero_id, ruta_qr) in enumerate(self.qrs_ordenados):
-            # Índice de fila en la página actual (0-31)
-            indice_fila_en_pagina = idx % self.FILAS_TOTALES_POR_HOJA
-            
-            # Si es la primera fila de una nueva página (y no es la primera página)
-            if idx > 0 and indice_fila_en_pagina == 0:
-                c.showPage()  # Nueva página
-                pagina_actual = (idx // self.FILAS_TOTALES_POR_HOJA) + 1
-                print(f"   ✓ Página {pagina_actual} completada")
-            
-            # Dibujar la fila
-            self._dibujar_fila_stickers(c, numero_id, ruta_qr, indice_fila_en_pagina)
-        
-        # Guardar PDF
-        c.save()
-        print(f"\n✅ PDF generado exitosamente: {self.archivo_salida}")
-        print(f"   Tamaño: A3 (29.7cm x 42cm)")
-        print(f"   Total de páginas: {total_paginas}")
-        print(f"   Total de stickers de logo: {total_qrs * 2}")
-        print(f"   Total de stickers de QR: {total_qrs * 2}")
-
-
-def main():
-    """Función principal"""
-    print("=" * 60)
-    print("GENERADOR DE PLANCHAS DE STICKERS - WHOKEY")
-    print("=" * 60)
-    print()
-    
+
+    def generar_pdf(self, archivo_salida=None, verbose=True, ids=None):
+        """Genera el PDF en archivo_salida (por defecto, el del constructor)"""
+        return super().generar_pdf(archivo_salida or self.archivo_salida, verbose, ids)
+
+
+def _ids_de_parte(ids, inicio, fin):
+    """IDs de una parte de la salida: [inicio, fin] restringido a ids"""
+    if ids is None:
+        return RangosIds([(inicio, fin)])
+    return RangosIds([(max(a, inicio), min(b, fin))
+                      for a, b in ids.rangos if a <= fin and b >= inicio])
+
+
+def planificar_salidas(generador, archivo_salida, ids=None, paginas_por_archivo=None):
+    """
+    Divide el trabajo en archivos de salida de hasta paginas_por_archivo
+    páginas cada uno (planchas_001.pdf, planchas_002.pdf, ...)
+
+    Args:
+        generador: GeneradorPlanchasPDF con los archivos ya validados
+        archivo_salida: Ruta del PDF (o base de los nombres si se divide)
+        ids: RangosIds con los IDs a incluir (None = todos los QRs)
+        paginas_por_archivo: Páginas por archivo (None = un solo archivo)
+
+    Returns:
+        Lista de tuplas (ruta_pdf, RangosIds o None)
+    """
+    if not paginas_por_archivo:
+        return [(str(archivo_salida), ids)]
+
+    qrs = generador.obtener_filas(ids)
+    filas_por_archivo = paginas_por_archivo * generador.FILAS_TOTALES_POR_HOJA
+    salida = Path(archivo_salida)
+    partes = range(0, len(qrs), filas_por_archivo)
+    digitos = max(3, len(str(len(partes))))
+
+    salidas = []
+    for n, desde in enumerate(partes, start=1):
+        tramo = qrs[desde:desde + filas_por_archivo]
+        ruta = salida.with_name(f"{salida.stem}_{n:0{digitos}d}{salida.suffix or '.pdf'}")
+        salidas.append((str(ruta), _ids_de_parte(ids, tramo[0][0], tramo[-1][0])))
+    return salidas
+
+
+def _emitir_json(evento, **datos):
+    print(json.dumps(dict(evento=evento, **datos), ensure_ascii=False), flush=True)
+
+
+def _reimprimir(generador, args, ids, advertencias):
+    """Reimpresión parcial (--paginas / --reimprimir) en un solo PDF"""
+    verbose = not (args.silencioso or args.json)
+    for advertencia in advertencias:
+        if args.json:
+            _emitir_json('advertencia', mensaje=advertencia)
+        elif verbose:
+            print(f"⚠️  {advertencia}")
+
+    Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+    resultado = generador.generar_pdf(
+        args.salida,
+        verbose=verbose,
+        ids=ids,
+        paginas=parsear_ids_texto(args.paginas) if args.paginas else None,
+        reimprimir_ids=parsear_ids_texto(args.reimprimir) if args.reimprimir else None
+    )
+    if args.json:
+        _emitir_json('archivo', archivo=args.salida, estadisticas=resultado[1])
+    return resultado
+
+
+def _exportar_por_pagina(generador, args, ids):
+    """
+    Una página por archivo (--por-pagina) en una carpeta (hot folder del RIP)
+    o, si --salida termina en .zip, en un ZIP escrito a medida que avanzan
+    """
+    verbose = not (args.silencioso or args.json)
+    workers = args.workers or os.cpu_count() or 1
+    a_zip = args.salida.lower().endswith('.zip')
+    carpeta = tempfile.mkdtemp(prefix='exportacion_') if a_zip else args.salida
+    paginas = []
+
+    def avanzar():
+        for pagina, ruta in generador.exportar_paginas(carpeta, args.por_pagina, ids,
+                                                        workers, args.dpi):
+            paginas.append(pagina)
+            if args.json:
+                _emitir_json('pagina', pagina=pagina, archivo=ruta.name if a_zip else str(ruta))
+            elif verbose:
+                print(f"   ✓ {ruta.name}")
+            yield ruta
+
+    if verbose:
+        print(f"🗂️  Exportando una página por archivo ({args.por_pagina}) en {args.salida}")
     try:
-        # Crear instancia del generador
-        generador = GeneradorPlanchasStickers(
-            carpeta_qrs="qrs",
-            archivo_logo="logo.png",
-            archivo_salida="planchas_stickers.pdf"
+        if a_zip:
+            Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+            with open(args.salida, 'wb') as destino:
+                for bloque in zip_en_streaming(avanzar()):
+                    destino.write(bloque)
+        else:
+            for _ in avanzar():
+                pass
+    finally:
+        if a_zip:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    estadisticas = {'total_paginas': len(paginas), 'formato': args.por_pagina}
+    if args.json:
+        _emitir_json('archivo', archivo=args.salida, estadisticas=estadisticas)
+    return args.salida, estadisticas
+
+
+def ejecutar(args):
+    """
+    Ejecuta un trabajo con las opciones de la línea de comandos
+
+    Returns:
+        Lista de tuplas (ruta_pdf, estadisticas_dict)
+    """
+    verbose = not (args.silencioso or args.json)
+    ids = parsear_ids_texto(args.ids) if args.ids else None
+    mapeo = MapeoLogosRangos.cargar(args.mapeo) if args.mapeo else None
+    workers = args.workers or os.cpu_count() or 1
+
+    codificacion_qr = None if args.codificacion_qr == 'rgb' else args.codificacion_qr
+    generador = GeneradorPlanchasPDF(args.qrs, args.logo, mapeo, args.reservar_huecos,
+                                     codificacion_qr)
+    advertencias = generador.validar_archivos()
+
+    if args.paginas or args.reimprimir:
+        return [_reimprimir(generador, args, ids, advertencias)]
+
+    if args.por_pagina:
+        return [_exportar_por_pagina(generador, args, ids)]
+
+    salidas = planificar_salidas(generador, args.salida, ids, args.paginas_por_archivo)
+
+    if args.json:
+        _emitir_json('inicio', archivos=len(salidas), workers=workers,
+                     total_qrs=len(generador.qrs_ordenados))
+    elif verbose:
+        print(f"📂 QRs: {args.qrs} ({len(generador.qrs_ordenados)} archivos)")
+        if ids is not None:
+            print(f"   IDs: {ids.texto()}")
+        print(f"⚙️  Workers: {workers} | Archivos de salida: {len(salidas)}\n")
+
+    for advertencia in advertencias:
+        if args.json:
+            _emitir_json('advertencia', mensaje=advertencia)
+        elif verbose:
+            print(f"⚠️  {advertencia}")
+
+    resultados = []
+    for n, (ruta, ids_parte) in enumerate(salidas, start=1):
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+
+        progreso = None
+        if args.json:
+            def progreso(datos, ruta=ruta):
+                _emitir_json('tramo', archivo=ruta, **datos)
+        elif verbose and len(salidas) > 1:
+            print(f"📦 Archivo {n}/{len(salidas)}: {ruta}")
+
+        resultado = generador.generar_pdf_reanudable(
+            ruta,
+            carpeta_checkpoints=args.cache,
+            paginas_por_chunk=args.paginas_por_tramo,
+            verbose=verbose,
+            ids=ids_parte,
+            workers=workers,
+            progreso=progreso
         )
-        
-        # Generar el PDF
-        generador.generar_pdf()
-        
-        print("\n" + "=" * 60)
-        print("PROCESO COMPLETADO CON ÉXITO")
+        resultados.append(resultado)
+
+        if args.json:
+            _emitir_json('archivo', archivo=ruta, estadisticas=resultado[1])
+
+    return resultados
+
+
+def main(argv=None):
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description="Generador de planchas de stickers (A3) por línea de comandos"
+    )
+    parser.add_argument('--qrs', default='qrs', help="Carpeta con los QRs whokey-NNN.png")
+    parser.add_argument('--ids', help='IDs a incluir, por ejemplo "1-500, 800, 900-950"')
+    parser.add_argument('--logo', default='logo.png', help="Logo por defecto")
+    parser.add_argument('--mapeo', help="JSON de logos especiales por rango de IDs")
+    parser.add_argument('--salida', default='planchas_stickers.pdf', help="PDF de salida")
+    parser.add_argument('--reservar-huecos', action='store_true',
+                        help="Dejar en blanco las filas de IDs faltantes (páginas = bloques fijos de IDs)")
+    parser.add_argument('--codificacion-qr', choices=list(CODIFICACIONES_QR) + ['rgb'],
+                        default=CODIFICACIONES_QR[0],
+                        help="Imagen de los QR en el PDF: 1 bit Flate, 1 bit CCITT G4 o RGB")
+    parser.add_argument('--paginas', help='Reimprimir solo estas páginas del trabajo, p. ej. "3, 20-21"')
+    parser.add_argument('--reimprimir', help="Reimprimir solo estos IDs, en su posición original")
+    parser.add_argument('--por-pagina', choices=list(FORMATOS_EXPORTACION),
+                        help="Un archivo por página en la carpeta --salida (o ZIP si termina en .zip)")
+    parser.add_argument('--dpi', type=int, default=DPI_EXPORTACION,
+                        help="Resolución de PNG/TIFF con --por-pagina")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos de render en paralelo (0 = todos los núcleos)")
+    parser.add_argument('--paginas-por-archivo', type=int,
+                        help="Dividir la salida en archivos de N páginas")
+    parser.add_argument('--paginas-por-tramo', type=int,
+                        default=GeneradorPlanchasPDF.PAGINAS_POR_CHUNK,
+                        help="Páginas por tramo (unidad de reanudación y de paralelismo)")
+    parser.add_argument('--cache', default='.checkpoints',
+                        help="Carpeta de tramos guardados para reanudar")
+    parser.add_argument('--perfil', help="Guardar un perfil cProfile en este archivo")
+    salida = parser.add_mutually_exclusive_group()
+    salida.add_argument('--silencioso', action='store_true', help="Sin mensajes")
+    salida.add_argument('--json', action='store_true',
+                        help="Progreso como líneas JSON en stdout")
+    args = parser.parse_args(argv)
+
+    verbose = not (args.silencioso or args.json)
+    if verbose:
+        print("=" * 60)
+        print("GENERADOR DE PLANCHAS DE STICKERS - WHOKEY")
         print("=" * 60)
-        
+        print()
+
+    perfil = None
+    if args.perfil:
+        import cProfile
+        perfil = cProfile.Profile()
+        perfil.enable()
+
+    inicio = time.perf_counter()
+    try:
+        resultados = ejecutar(args)
+
+    except ErrorIdsTexto as e:
+        if args.json:
+            _emitir_json('error', error=str(e))
+        elif not args.silencioso:
+            print(f"\n❌ ERROR: IDs inválidos: {e}")
+        return 2
+
     except FileNotFoundError as e:
-        print(f"\n❌ ERROR: Archivos faltantes\n{e}")
-        print("\nVerifica que:")
-        print("  - El archivo 'logo.png' esté en la carpeta actual")
-        print("  - La carpeta 'qrs' exista y contenga archivos whokey-NNN.png")
+        if args.json:
+            _emitir_json('error', error=str(e))
+        elif not args.silencioso:
+            print(f"\n❌ ERROR: Archivos faltantes\n{e}")
+            print("\nVerifica que:")
+            print(f"  - El archivo '{args.logo}' exista")
+            print(f"  - La carpeta '{args.qrs}' exista y contenga archivos whokey-NNN.png")
         return 1
-        
+
+    except KeyboardInterrupt:
+        if not args.silencioso:
+            print("\n⏸️  Interrumpido: los tramos terminados quedaron en "
+                  f"'{args.cache}'; vuelve a ejecutar para reanudar", file=sys.stderr)
+        return 130
+
     except Exception as e:
-        print(f"\n❌ ERROR INESPERADO: {e}")
-        import traceback
-        traceback.print_exc()
+        if args.json:
+            _emitir_json('error', error=str(e))
+        elif not args.silencioso:
+            print(f"\n❌ ERROR INESPERADO: {e}")
+            import traceback
+            traceback.print_exc()
         return 1
-    
+
+    finally:
+        if perfil is not None:
+            perfil.disable()
+            perfil.dump_stats(args.perfil)
+
+    segundos = time.perf_counter() - inicio
+    paginas = sum(estadisticas['total_paginas'] for _, estadisticas in resultados)
+
+    if args.json:
+        _emitir_json('fin', archivos=[ruta for ruta, _ in resultados],
+                     total_paginas=paginas, segundos=round(segundos, 3))
+    elif verbose:
+        if perfil is not None:
+            import pstats
+            print(f"\n🔬 Perfil guardado en {args.perfil} (20 funciones más costosas):")
+            pstats.Stats(args.perfil).sort_stats('cumulative').print_stats(20)
+        print("\n" + "=" * 60)
+        print(f"PROCESO COMPLETADO CON ÉXITO ({paginas} páginas en {segundos:.1f}s)")
+        print("=" * 60)
+
     return 0
 
 
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Imágenes de 1 bit para los QR del PDF
+
+drawImage de reportlab embebe cada QR como RGB de 8 bits comprimido con
+Flate (y en ASCII85), más una máscara si el PNG tiene alfa. Un QR es blanco
+y negro puro: acá se embebe como imagen DeviceGray de 1 bit, opaca y sin
+máscara, comprimida con Flate o con CCITT Group 4. Con módulos alineados a
+píxeles (filas repetidas) Flate de 1 bit suele quedar más chico que G4.
+Los QR con color (no grises) se dejan a drawImage.
+"""
+
+import io
+import os
+import zlib
+from functools import lru_cache
+
+from PIL import Image, ImageChops
+from reportlab.lib.boxstuff import aspectRatioFix
+from reportlab.lib.utils import _digester
+from reportlab.pdfbase.pdfdoc import (PDFArray, PDFDictionary, PDFImageXObject, PDFName,
+                                      PDFStream)
+
+
+# Diferencia máxima entre canales para considerar gris un píxel RGB
+TOLERANCIA_GRIS = 8
+
+
+class _ImagenBitonal(PDFImageXObject):
+    """XObject de imagen DeviceGray de 1 bit con datos ya comprimidos"""
+
+    def __init__(self, name, ancho, alto, filtro, datos, parametros=None):
+        super().__init__(name)
+        self.width = ancho
+        self.height = alto
+        self.bitsPerComponent = 1
+        self.colorSpace = 'DeviceGray'
+        self._filters = (filtro,)
+        self.streamContent = datos
+        self.parametros = parametros
+        self.mask = None
+
+    def format(self, document):
+        stream = PDFStream(content=self.streamContent)
+        diccionario = stream.dictionary
+        diccionario["Type"] = PDFName("XObject")
+        diccionario["Subtype"] = PDFName("Image")
+        diccionario["Width"] = self.width
+        diccionario["Height"] = self.height
+        diccionario["BitsPerComponent"] = 1
+        diccionario["ColorSpace"] = PDFName("DeviceGray")
+        diccionario["Filter"] = PDFArray([PDFName(self._filters[0])])
+        if self.parametros:
+            # Con Filter como arreglo, DecodeParms también va en un arreglo
+            diccionario["DecodeParms"] = PDFArray([PDFDictionary(self.parametros)])
+        return stream.format(document)
+
+
+def _es_gris(imagen):
+    """True si una imagen RGB no tiene color (R, G y B casi iguales)"""
+    r, g, b = imagen.split()
+    return all(ImageChops.difference(r, canal).getextrema()[1] <= TOLERANCIA_GRIS
+               for canal in (g, b))
+
+
+def codificar_bitonal(ruta, codificacion='flate'):
+    """
+    Decodifica un QR y lo codifica en 1 bit (umbral al 50%, alfa sobre blanco)
+
+    El resultado se memoriza por (ruta, inodo, tamaño, mtime): un QR
+    reemplazado con el mismo nombre (p. ej. tras limpiar-todo y un lote
+    nuevo) se vuelve a codificar.
+
+    Args:
+        ruta: Ruta de la imagen
+        codificacion: 'flate' o 'g4' (sin libtiff, Flate)
+
+    Returns:
+        Tupla (ancho, alto, filtro, datos, parametros), o None si la imagen
+        tiene color y no se puede reducir a blanco y negro
+    """
+    st = os.stat(ruta)
+    return _codificar_bitonal(str(ruta), st.st_ino, st.st_size, st.st_mtime_ns, codificacion)
+
+
+@lru_cache(maxsize=64)
+def _codificar_bitonal(ruta, inodo, tamano, mtime_ns, codificacion):
+    with Image.open(ruta) as imagen:
+        if imagen.mode == '1':
+            bitonal = imagen.copy()
+        else:
+            if imagen.mode != 'L':
+                fondo = Image.new('RGBA', imagen.size, 'white')
+                fondo.alpha_composite(imagen.convert('RGBA'))
+                rgb = fondo.convert('RGB')
+                if not _es_gris(rgb):
+                    return None
+                imagen = rgb.convert('L')
+            bitonal = imagen.point(lambda v: 255 if v >= 128 else 0).convert('1')
+
+    ancho, alto = bitonal.size
+    if codificacion == 'g4':
+        codificada = _codificar_g4(bitonal)
+        if codificada is not None:
+            # En G4 las corridas "blancas" son los bits 0 (negro en la imagen)
+            return ancho, alto, 'CCITTFaxDecode', codificada, {
+                'K': -1, 'Columns': ancho, 'Rows': alto, 'BlackIs1': 'true'}
+
+    # Modo '1' de PIL: 1 = blanco, igual que DeviceGray de 1 bit
+    return ancho, alto, 'FlateDecode', zlib.compress(bitonal.tobytes(), 9), None
+
+
+def _codificar_g4(bitonal):
+    """Datos CCITT G4 de la imagen (una sola tira TIFF), o None sin libtiff"""
+    buffer = io.BytesIO()
+    try:
+        bitonal.save(buffer, 'TIFF', compression='group4', strip_size=1 << 30)
+    except (OSError, ValueError):
+        return None
+
+    with Image.open(buffer) as tiff:
+        desplazamientos = tiff.tag_v2.get(273)
+        longitudes = tiff.tag_v2.get(279)
+    if not desplazamientos or len(desplazamientos) != 1:
+        return None
+    datos = buffer.getvalue()
+    return datos[desplazamientos[0]:desplazamientos[0] + longitudes[0]]
+
+
+def dibujar_bitonal(c, ruta, x, y, ancho, alto, codificacion='flate'):
+    """
+    Dibuja un QR de 1 bit centrado en la caja (como drawImage con
+    preserveAspectRatio). Igual que drawImage, cada archivo se embebe una
+    sola vez por PDF y las demás apariciones reutilizan el mismo XObject.
+
+    Args:
+        c: Canvas de reportlab
+        ruta: Ruta del QR
+        x, y, ancho, alto: Caja en puntos
+        codificacion: 'flate' o 'g4' (sin libtiff, Flate)
+
+    Returns:
+        True si se dibujó; False si la imagen tiene color (usar drawImage)
+    """
+    nombre = _digester(f"{ruta}bitonal-{codificacion}")
+    nombre_registro = c._doc.getXObjectName(nombre)
+    imagen = c._doc.idToObject.get(nombre_registro)
+    if imagen is None:
+        codificada = codificar_bitonal(str(ruta), codificacion)
+        if codificada is None:
+            return False
+        imagen = _ImagenBitonal(nombre, *codificada)
+        c._setXObjects(imagen)
+        c._doc.Reference(imagen, nombre_registro)
+        c._doc.addForm(nombre, imagen)
+
+    x, y, ancho, alto, _ = aspectRatioFix(True, 'c', x, y, ancho, alto,
+                                          imagen.width, imagen.height)
+    c._currentPageHasImages = 1
+    c.saveState()
+    c.translate(x, y)
+    c.scale(ancho, alto)
+    c._code.append(f"/{nombre_registro} Do")
+    c.restoreState()
+    c._formsinuse.append(nombre)
+    return True
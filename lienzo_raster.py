@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lienzo raster (Pillow) con la interfaz de reportlab que usa el motor
+
+Implementa solo las operaciones que dibuja GeneradorPlanchasPDF (círculos de
+troquel, imágenes centradas y el texto del ID), en coordenadas de puntos
+con origen abajo a la izquierda como reportlab. Así las mismas funciones de
+dibujo generan una página PNG/TIFF a la resolución pedida, con la misma
+ubicación que en el PDF.
+"""
+
+import os
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+# Resolución por defecto para RIPs
+DPI_RASTER = 300
+
+# Formatos raster soportados: formato -> (formato Pillow, opciones de guardado)
+FORMATOS_RASTER = {
+    'png': ('PNG', {'compress_level': 3}),
+    'tiff': ('TIFF', {'compression': 'tiff_lzw'}),
+}
+
+# Fuentes TrueType equivalentes a Helvetica-Bold, en orden de preferencia
+FUENTES_NEGRITA = ['DejaVuSans-Bold.ttf', 'Arial Bold.ttf', 'arialbd.ttf',
+                   'LiberationSans-Bold.ttf']
+
+
+def _imagen_escalada(ruta, ancho, alto):
+    """
+    Imagen decodificada y escalada para caber en ancho x alto píxeles
+
+    Memorizada por (ruta, inodo, tamaño, mtime): un archivo reemplazado con
+    el mismo nombre (un lote nuevo de QRs) no reutiliza la imagen anterior.
+    """
+    st = os.stat(ruta)
+    return _escalar(ruta, st.st_ino, st.st_size, st.st_mtime_ns, ancho, alto)
+
+
+@lru_cache(maxsize=256)
+def _escalar(ruta, inodo, tamano_archivo, mtime_ns, ancho, alto):
+    if ruta.lower().endswith(('.svg', '.pdf')):
+        from logos_vectoriales import rasterizar_logo_vectorial
+        
+        return rasterizar_logo_vectorial(ruta, ancho, alto)
+    with Image.open(ruta) as imagen:
+        imagen = imagen.convert('RGBA')
+    escala = min(ancho / imagen.width, alto / imagen.height)
+    tamano = (max(1, round(imagen.width * escala)), max(1, round(imagen.height * escala)))
+    return imagen.resize(tamano, Image.LANCZOS)
+
+
+@lru_cache(maxsize=16)
+def _fuente(tamano_px):
+    for nombre in FUENTES_NEGRITA:
+        try:
+            return ImageFont.truetype(nombre, tamano_px)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=tamano_px)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def _color(rgb):
+    return tuple(round(c * 255) for c in rgb)
+
+
+class LienzoRaster:
+    """Página raster con el subconjunto de reportlab.pdfgen.canvas.Canvas usado por el motor"""
+
+    def __init__(self, archivo, pagesize, formato='png', dpi=DPI_RASTER):
+        """
+        Args:
+            archivo: Ruta del archivo de imagen a escribir en save()
+            pagesize: Tupla (ancho, alto) en puntos
+            formato: 'png' o 'tiff'
+            dpi: Resolución de salida
+        """
+        if formato not in FORMATOS_RASTER:
+            raise ValueError(f"Formato raster no soportado: {formato}")
+
+        self.archivo = archivo
+        self.formato = formato
+        self.dpi = dpi
+        self.escala = dpi / 72.0
+        self.ancho_px = round(pagesize[0] * self.escala)
+        self.alto_px = round(pagesize[1] * self.escala)
+        self.imagen = Image.new('RGB', (self.ancho_px, self.alto_px), 'white')
+        self.dibujo = ImageDraw.Draw(self.imagen)
+
+        self._trazo = (0, 0, 0)
+        self._relleno = (0, 0, 0)
+        self._grosor = 1
+        self._fuente = _fuente(round(10 * self.escala))
+
+    def _px(self, x, y):
+        """Puntos (origen abajo a la izquierda) -> píxeles (origen arriba)"""
+        return x * self.escala, self.alto_px - y * self.escala
+
+    # Metadatos: sin equivalente en una imagen
+    def setTitle(self, titulo):
+        pass
+
+    def setAuthor(self, autor):
+        pass
+
+    def setStrokeColorRGB(self, r, g, b):
+        self._trazo = _color((r, g, b))
+
+    def setFillColorRGB(self, r, g, b):
+        self._relleno = _color((r, g, b))
+
+    def setLineWidth(self, grosor):
+        self._grosor = max(1, round(grosor * self.escala))
+
+    def setFont(self, nombre, tamano):
+        self._fuente = _fuente(round(tamano * self.escala))
+
+    def circle(self, x, y, radio, stroke=1, fill=0):
+        cx, cy = self._px(x, y)
+        r = radio * self.escala
+        self.dibujo.ellipse(
+            [cx - r, cy - r, cx + r, cy + r],
+            outline=self._trazo if stroke else None,
+            fill=self._relleno if fill else None,
+            width=self._grosor
+        )
+
+    def drawString(self, x, y, texto):
+        self.dibujo.text(self._px(x, y), texto, font=self._fuente,
+                         fill=self._relleno, anchor='ls')
+
+    def drawImage(self, ruta, x, y, width, height, preserveAspectRatio=True, mask='auto'):
+        ancho = round(width * self.escala)
+        alto = round(height * self.escala)
+        imagen = _imagen_escalada(str(ruta), ancho, alto)
+
+        # Centrada en la caja, como reportlab con preserveAspectRatio
+        izquierda, arriba = self._px(x, y + height)
+        destino = (round(izquierda + (ancho - imagen.width) / 2),
+                   round(arriba + (alto - imagen.height) / 2))
+        self.imagen.paste(imagen, destino, imagen)
+
+    def showPage(self):
+        raise ValueError("LienzoRaster genera una sola página por archivo")
+
+    def save(self):
+        formato, opciones = FORMATOS_RASTER[self.formato]
+        self.imagen.save(self.archivo, formato, dpi=(self.dpi, self.dpi), **opciones)
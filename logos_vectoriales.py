@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Logos vectoriales (SVG o PDF de una página) como formularios del PDF
+
+Un logo vectorial se convierte una sola vez por PDF en un form XObject y
+cada sticker lo dibuja por referencia, escalado a TAMANO_LOGO: el PDF no
+lleva píxeles del logo y se ve nítido a cualquier resolución de impresión.
+
+- PDF: el contenido y los recursos de la página (fuentes, imágenes,
+  patrones...) se copian al documento de reportlab con pypdf, sin
+  re-codificar los streams
+- SVG: svglib lo convierte en un Drawing de reportlab (dependencia
+  opcional: pip install svglib). Sin svglib, si está PyMuPDF, el SVG se
+  rasteriza a DPI_SVG_RASTERIZADO y el trabajo lo advierte
+- Exportación PNG/TIFF (LienzoRaster): se rasteriza con PyMuPDF
+  (opcional: pip install pymupdf)
+"""
+
+import io
+import os
+import zlib
+from functools import lru_cache
+
+from reportlab.lib.utils import _digester
+from reportlab.pdfbase.pdfdoc import (PDFArray, PDFDictionary, PDFName, PDFObjectReference,
+                                      PDFStream)
+
+
+# Extensiones de logo que se dibujan como vectores
+EXTENSIONES_VECTORIALES = ('.svg', '.pdf')
+
+# Colores, línea y guiones por defecto de una página PDF
+ESTADO_INICIAL = '0 G 0 g 1 w 0 J 0 j 10 M [] 0 d'
+
+# Resolución de un SVG rasterizado con PyMuPDF cuando falta svglib
+DPI_SVG_RASTERIZADO = 600
+
+
+def es_vectorial(ruta):
+    """True si la ruta es un logo SVG o PDF"""
+    return str(ruta).lower().endswith(EXTENSIONES_VECTORIALES)
+
+
+@lru_cache(maxsize=None)
+def _hay_modulo(nombre):
+    """True si el módulo opcional está instalado (sin importarlo)"""
+    from importlib.util import find_spec
+
+    return find_spec(nombre) is not None
+
+
+def se_rasteriza(ruta):
+    """True si el logo es un SVG que se rasteriza porque falta svglib (y está PyMuPDF)"""
+    return (str(ruta).lower().endswith('.svg') and not _hay_modulo('svglib')
+            and _hay_modulo('pymupdf'))
+
+
+def advertencia_logo_vectorial(ruta):
+    """
+    Advertencia para las estadísticas si el logo no se dibuja como vector
+
+    Returns:
+        Texto de la advertencia, o None si el logo se dibuja como vector
+    """
+    if not str(ruta).lower().endswith('.svg') or _hay_modulo('svglib'):
+        return None
+    if _hay_modulo('pymupdf'):
+        return (f"Logo {ruta} rasterizado a {DPI_SVG_RASTERIZADO} dpi: instala svglib "
+                f"para dibujarlo como vector")
+    return f"Logo {ruta} sin dibujar: los SVG necesitan svglib (o pymupdf)"
+
+
+def _firma(ruta):
+    """(ruta, tamaño, mtime): un logo reemplazado en la misma ruta no usa la versión vieja"""
+    st = os.stat(ruta)
+    return str(ruta), st.st_size, st.st_mtime_ns
+
+
+@lru_cache(maxsize=32)
+def _pagina_pdf(ruta, tamano, mtime_ns):
+    from pypdf import PdfReader, PdfWriter
+
+    lector = PdfReader(ruta)
+    if lector.is_encrypted:
+        raise ValueError(f"El PDF del logo está protegido: {ruta}")
+    if len(lector.pages) != 1:
+        raise ValueError(f"El PDF del logo debe tener una sola página (tiene {len(lector.pages)}): {ruta}")
+    # En un writer: pypdf solo reescribe el contenido de páginas con documento propio
+    pagina = PdfWriter(clone_from=lector).pages[0]
+    # /Rotate pasa al contenido: la caja queda en la orientación visible
+    if pagina.rotation:
+        pagina.transfer_rotation_to_content()
+    return pagina
+
+
+@lru_cache(maxsize=32)
+def _dibujo_svg(ruta, tamano, mtime_ns):
+    try:
+        from svglib.svglib import svg2rlg
+    except ImportError:
+        raise ValueError("Para logos SVG instala svglib (o pymupdf, que los rasteriza): "
+                         "pip install svglib") from None
+
+    dibujo = svg2rlg(ruta)
+    if dibujo is None or not dibujo.width or not dibujo.height:
+        raise ValueError(f"No se pudo leer el SVG del logo: {ruta}")
+    return dibujo
+
+
+def validar_logo_vectorial(ruta):
+    """
+    Abre un logo vectorial para comprobar que se puede dibujar
+
+    Returns:
+        Tupla (ancho, alto) en puntos
+
+    Raises:
+        ValueError: Si el archivo no es un SVG/PDF de una página utilizable
+    """
+    try:
+        x0, y0, x1, y1 = _caja(_firma(ruta))
+        return x1 - x0, y1 - y0
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Logo vectorial inválido ({type(e).__name__}: {e}): {ruta}") from None
+
+
+def _crudo(objeto):
+    """Valor simple de pypdf (nombre, número, cadena...) en sintaxis PDF"""
+    salida = io.BytesIO()
+    objeto.write_to_stream(salida)
+    return salida.getvalue()
+
+
+def _copiar(objeto, documento, prefijo, copiados):
+    """
+    Copia un objeto de pypdf al documento de reportlab
+
+    Los objetos indirectos (y todos los streams) se registran una sola vez
+    con nombre prefijo.N; los streams conservan sus datos codificados.
+    """
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+    if isinstance(objeto, IndirectObject):
+        clave = (objeto.idnum, objeto.generation)
+        if clave in copiados:
+            return copiados[clave]
+        resuelto = objeto.get_object()
+        if not isinstance(resuelto, (DictionaryObject, ArrayObject)):
+            return _copiar(resuelto, documento, prefijo, copiados)
+        nombre = f"{prefijo}.{len(copiados)}"
+        # Registrado antes de copiar el contenido: las referencias circulares terminan acá
+        copiados[clave] = PDFObjectReference(nombre)
+        documento.Reference(_copiar(resuelto, documento, prefijo, copiados), nombre)
+        return copiados[clave]
+
+    if isinstance(objeto, StreamObject):
+        diccionario = PDFDictionary({
+            str(k)[1:]: _copiar(v, documento, prefijo, copiados)
+            for k, v in objeto.items() if k != '/Length'
+        })
+        # Con /Filter en el diccionario reportlab no vuelve a comprimir
+        return PDFStream(dictionary=diccionario, content=objeto._data)
+    if isinstance(objeto, DictionaryObject):
+        # /Parent llevaría a copiar el árbol de páginas del PDF original
+        return PDFDictionary({str(k)[1:]: _copiar(v, documento, prefijo, copiados)
+                              for k, v in objeto.items() if k != '/Parent'})
+    if isinstance(objeto, ArrayObject):
+        return PDFArray([_copiar(v, documento, prefijo, copiados) for v in objeto])
+    return _crudo(objeto)
+
+
+@lru_cache(maxsize=32)
+def _caja_rasterizada(ruta, tamano, mtime_ns):
+    import pymupdf
+
+    with pymupdf.open(ruta) as documento:
+        rect = documento[0].rect
+    if not rect.width or not rect.height:
+        raise ValueError(f"No se pudo leer el SVG del logo: {ruta}")
+    return [0.0, 0.0, float(rect.width), float(rect.height)]
+
+
+@lru_cache(maxsize=32)
+def _imagen_rasterizada(ruta, tamano, mtime_ns, ancho, alto):
+    """ImageReader del SVG rasterizado para una caja de ancho x alto puntos"""
+    from reportlab.lib.utils import ImageReader
+
+    escala = DPI_SVG_RASTERIZADO / 72
+    return ImageReader(rasterizar_logo_vectorial(ruta, max(1, round(ancho * escala)),
+                                                 max(1, round(alto * escala))))
+
+
+def _caja(firma):
+    """Caja (x0, y0, x1, y1) del logo en puntos"""
+    if firma[0].lower().endswith('.pdf'):
+        return [float(v) for v in _pagina_pdf(*firma).cropbox]
+    if se_rasteriza(firma[0]):
+        return _caja_rasterizada(*firma)
+    dibujo = _dibujo_svg(*firma)
+    return [0.0, 0.0, float(dibujo.width), float(dibujo.height)]
+
+
+def _formulario_pdf(c, firma, nombre):
+    """Registra la página del PDF como form XObject"""
+    pagina = _pagina_pdf(*firma)
+    contenido = pagina.get_contents()
+    datos = contenido.get_data() if contenido is not None else b''
+    recursos = pagina.get('/Resources')
+
+    documento = c._doc
+    nombre_registro = documento.getXObjectName(nombre)
+    diccionario = PDFDictionary({
+        'Type': PDFName('XObject'),
+        'Subtype': PDFName('Form'),
+        'FormType': 1,
+        'BBox': PDFArray(_caja(firma)),
+        'Resources': (_copiar(recursos, documento, nombre_registro, {})
+                      if recursos is not None else PDFDictionary({})),
+        'Filter': PDFName('FlateDecode')
+    })
+    formulario = PDFStream(dictionary=diccionario, content=zlib.compress(datos))
+    documento.Reference(formulario, nombre_registro)
+
+
+def _formulario_svg(c, firma, nombre):
+    """Dibuja el SVG una vez dentro de un form XObject"""
+    from reportlab.graphics import renderPDF
+
+    dibujo = _dibujo_svg(*firma)
+    c.beginForm(nombre, 0, 0, dibujo.width, dibujo.height)
+    renderPDF.draw(dibujo, c, 0, 0)
+    c.endForm()
+
+
+def dibujar_logo_vectorial(c, ruta, x, y, ancho, alto):
+    """
+    Dibuja un logo vectorial centrado en la caja, conservando su proporción
+    (como drawImage con preserveAspectRatio). El form se crea la primera
+    vez que aparece en el PDF y después se reutiliza. Un SVG sin svglib
+    se dibuja rasterizado (ver se_rasteriza).
+
+    Args:
+        c: Canvas de reportlab
+        ruta: Ruta del SVG o PDF
+        x, y, ancho, alto: Caja en puntos
+    """
+    firma = _firma(ruta)
+    if se_rasteriza(firma[0]):
+        c.drawImage(_imagen_rasterizada(*firma, ancho, alto), x, y, width=ancho, height=alto,
+                    preserveAspectRatio=True, mask='auto')
+        return
+    nombre = _digester(f"{firma}-vectorial")
+    if c._doc.getXObjectName(nombre) not in c._doc.idToObject:
+        if firma[0].lower().endswith('.pdf'):
+            _formulario_pdf(c, firma, nombre)
+        else:
+            _formulario_svg(c, firma, nombre)
+
+    x0, y0, x1, y1 = _caja(firma)
+    escala = min(ancho / (x1 - x0), alto / (y1 - y0))
+    c.saveState()
+    c.transform(escala, 0, 0, escala,
+                x + (ancho - (x1 - x0) * escala) / 2 - x0 * escala,
+                y + (alto - (y1 - y0) * escala) / 2 - y0 * escala)
+    # El form hereda el estado gráfico de quien lo dibuja (p. ej. el magenta
+    # del troquel): se vuelve a los valores iniciales de una página
+    c._code.append(ESTADO_INICIAL)
+    c.doForm(nombre)
+    c.restoreState()
+
+
+def rasterizar_logo_vectorial(ruta, ancho, alto):
+    """
+    Imagen RGBA del logo que cabe en ancho x alto píxeles (para LienzoRaster)
+
+    Raises:
+        ImportError: Si PyMuPDF no está instalado
+    """
+    try:
+        import pymupdf
+    except ImportError:
+        raise ImportError("Para exportar PNG/TIFF con logos SVG/PDF instala PyMuPDF: "
+                          "pip install pymupdf") from None
+    from PIL import Image
+
+    with pymupdf.open(str(ruta)) as documento:
+        pagina = documento[0]
+        escala = min(ancho / pagina.rect.width, alto / pagina.rect.height)
+        mapa = pagina.get_pixmap(matrix=pymupdf.Matrix(escala, escala), alpha=True)
+        return Image.frombytes('RGBA', (mapa.width, mapa.height), mapa.samples)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mapeo de logos especiales por rangos de IDs
+Intervalos ordenados y sin solapamiento, búsqueda por bisección
+"""
+
+import json
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from almacenamiento import guardar_atomico
+
+
+# Versión del formato en disco (la v1 era un dict {"id": ruta} por ID)
+VERSION_FORMATO = 2
+
+
+class MapeoLogosRangos:
+    """
+    Asignación ID -> logo guardada como intervalos [inicio, fin] ordenados
+
+    Asignar un rango nuevo recorta o parte los intervalos que pisa (gana la
+    última asignación) y fusiona los vecinos contiguos con el mismo logo.
+    Consultar cuesta O(log rangos). Asignar ubica el tramo afectado en
+    O(log rangos), pero reemplazarlo en las listas desplaza los intervalos
+    siguientes: O(rangos) en el peor caso. Guardar es O(rangos). Ninguna
+    operación depende de la cantidad de IDs.
+    """
+
+    def __init__(self):
+        self._inicios = []
+        self._fines = []
+        self._rutas = []
+
+    @classmethod
+    def desde_dict(cls, mapeo):
+        """
+        Crea un mapeo a partir de un dict {id_numero: ruta_logo}
+        (agrupa los IDs consecutivos con el mismo logo en un solo rango)
+        """
+        if isinstance(mapeo, cls):
+            return mapeo
+
+        resultado = cls()
+        for numero_id, ruta in sorted((int(k), str(v)) for k, v in mapeo.items()):
+            resultado.asignar(numero_id, numero_id, ruta)
+        return resultado
+
+    @classmethod
+    def cargar(cls, archivo):
+        """
+        Carga el mapeo desde disco (acepta también el formato v1 por ID)
+
+        Returns:
+            MapeoLogosRangos (vacío si el archivo no existe)
+        """
+        archivo = Path(archivo)
+        if not archivo.exists():
+            return cls()
+
+        with open(archivo, 'r') as f:
+            datos = json.load(f)
+
+        if isinstance(datos, dict) and 'rangos' in datos:
+            resultado = cls()
+            for inicio, fin, ruta in datos['rangos']:
+                resultado.asignar(int(inicio), int(fin), ruta)
+            return resultado
+
+        # Formato v1: {"1": "ruta", "2": "ruta", ...}
+        return cls.desde_dict(datos)
+
+    def guardar(self, archivo):
+        """Guarda el mapeo en disco de forma atómica (JSON compacto)"""
+        datos = {
+            'version': VERSION_FORMATO,
+            'rangos': [list(rango) for rango in self.rangos()]
+        }
+        contenido = json.dumps(datos, separators=(',', ':')).encode('utf-8')
+        guardar_atomico(contenido, archivo)
+
+    def asignar(self, inicio, fin, ruta):
+        """
+        Asigna un logo a todos los IDs de [inicio, fin] (ambos incluidos)
+
+        Args:
+            inicio: Primer ID del rango
+            fin: Último ID del rango
+            ruta: Ruta del logo a usar en el rango
+        """
+        if inicio > fin:
+            raise ValueError(f"Rango inválido: {inicio}-{fin}")
+        ruta = str(ruta)
+
+        # Intervalos que se solapan con [inicio, fin]: índices i..j-1
+        i = bisect_left(self._fines, inicio)
+        j = bisect_right(self._inicios, fin)
+
+        nuevos = []
+        if i < j and self._inicios[i] < inicio:
+            nuevos.append((self._inicios[i], inicio - 1, self._rutas[i]))
+        nuevos.append((inicio, fin, ruta))
+        if i < j and self._fines[j - 1] > fin:
+            nuevos.append((fin + 1, self._fines[j - 1], self._rutas[j - 1]))
+
+        # Incluir los vecinos para fusionar intervalos contiguos del mismo logo
+        desde = max(i - 1, 0)
+        hasta = min(j + 1, len(self._inicios))
+        segmento = (
+            [self._intervalo(k) for k in range(desde, i)]
+            + nuevos
+            + [self._intervalo(k) for k in range(j, hasta)]
+        )
+
+        fusionado = []
+        for intervalo in segmento:
+            if (fusionado and fusionado[-1][2] == intervalo[2]
+                    and fusionado[-1][1] + 1 == intervalo[0]):
+                fusionado[-1] = (fusionado[-1][0], intervalo[1], intervalo[2])
+            else:
+                fusionado.append(intervalo)
+
+        self._inicios[desde:hasta] = [s for s, _, _ in fusionado]
+        self._fines[desde:hasta] = [e for _, e, _ in fusionado]
+        self._rutas[desde:hasta] = [r for _, _, r in fusionado]
+
+    def _intervalo(self, k):
+        return (self._inicios[k], self._fines[k], self._rutas[k])
+
+    def get(self, numero_id, defecto=None):
+        """Devuelve la ruta del logo asignado a un ID (o defecto)"""
+        k = bisect_right(self._inicios, numero_id) - 1
+        if k >= 0 and numero_id <= self._fines[k]:
+            return self._rutas[k]
+        return defecto
+
+    def __getitem__(self, numero_id):
+        ruta = self.get(numero_id)
+        if ruta is None:
+            raise KeyError(numero_id)
+        return ruta
+
+    def __contains__(self, numero_id):
+        return self.get(numero_id) is not None
+
+    def __len__(self):
+        """Cantidad total de IDs con logo especial"""
+        return sum(fin - inicio + 1 for inicio, fin in zip(self._inicios, self._fines))
+
+    def __bool__(self):
+        return bool(self._inicios)
+
+    def rangos(self):
+        """Lista de tuplas (inicio, fin, ruta) ordenadas por inicio"""
+        return list(zip(self._inicios, self._fines, self._rutas))
+
+    def rutas(self):
+        """Conjunto de rutas de logos distintas referenciadas"""
+        return set(self._rutas)
+
+    def rangos_texto(self):
+        """Rangos en formato de texto ("1-50", "77") para mostrar en la UI"""
+        return [
+            str(inicio) if inicio == fin else f"{inicio}-{fin}"
+            for inicio, fin in zip(self._inicios, self._fines)
+        ]
+
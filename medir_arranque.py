@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de tiempo de arranque (importación en frío)
+
+Mide, en procesos Python nuevos, cuánto tarda importar cada módulo del
+proyecto y verifica que las dependencias pesadas (reportlab, PIL) no se
+carguen hasta que realmente se genera un PDF.
+
+Uso:
+    python medir_arranque.py
+    python medir_arranque.py --repeticiones 20 --json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+# Módulos a medir (importación en frío)
+MODULOS = ['pdf_generator', 'mapeo_logos', 'almacenamiento', 'app',
+           'renderizado_distribuido']
+
+# Comandos de consola a medir (ruta del script, argumentos)
+COMANDOS = [('renderizado_distribuido.py', ['--help']),
+            ('generar_planchas_stickers.py', ['--help'])]
+
+# Módulos pesados que no deberían cargarse al importar
+PESADOS = ['reportlab.pdfgen.canvas', 'PIL.Image']
+
+CARPETA = Path(__file__).resolve().parent
+
+
+def _medir(argumentos, repeticiones):
+    """Mediana (ms) del tiempo de ejecución de un proceso Python nuevo"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable] + argumentos, cwd=CARPETA,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def _pesados_cargados(modulo):
+    """Lista de módulos pesados presentes en sys.modules tras importar"""
+    codigo = (f"import sys, json, {modulo}; "
+              f"print(json.dumps([m for m in {PESADOS!r} if m in sys.modules]))")
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=CARPETA,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(salida)
+
+
+def medir(repeticiones=10):
+    """
+    Ejecuta el benchmark completo
+
+    Returns:
+        Dict con la línea base del intérprete y los resultados por módulo
+    """
+    base = _medir(['-c', 'pass'], repeticiones)
+    resultados = {'interprete_ms': round(base, 1), 'modulos': {}, 'comandos': {}}
+
+    for modulo in MODULOS:
+        total = _medir(['-c', f'import {modulo}'], repeticiones)
+        resultados['modulos'][modulo] = {
+            'importacion_ms': round(total - base, 1),
+            'pesados_cargados': _pesados_cargados(modulo)
+        }
+
+    for script, argumentos in COMANDOS:
+        total = _medir([script] + argumentos, repeticiones)
+        resultados['comandos'][' '.join([script] + argumentos)] = {
+            'ejecucion_ms': round(total - base, 1)
+        }
+
+    return resultados
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark de tiempo de arranque")
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help="Salida en JSON")
+    args = parser.parse_args()
+
+    resultados = medir(args.repeticiones)
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+    else:
+        print("=" * 70)
+        print("⏱️  TIEMPO DE ARRANQUE (mediana, descontando el intérprete)")
+        print("=" * 70)
+        print(f"   Intérprete solo: {resultados['interprete_ms']} ms\n")
+        for modulo, datos in resultados['modulos'].items():
+            aviso = ''
+            if datos['pesados_cargados']:
+                aviso = f"  ⚠️  carga {', '.join(datos['pesados_cargados'])}"
+            print(f"   import {modulo:28} {datos['importacion_ms']:8.1f} ms{aviso}")
+        for comando, datos in resultados['comandos'].items():
+            print(f"   {comando:35} {datos['ejecucion_ms']:8.1f} ms")
+        print("=" * 70)
+
+    hay_pesados = any(d['pesados_cargados'] for d in resultados['modulos'].values())
+    return 1 if hay_pesados else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -6,13 +6,33 @@ Versión: 3.0 - WebApp Compatible
 Fecha: 2026-01-30
 """
 
+import hashlib
+import io
+import json
 import os
 import re
+import shutil
+import uuid
+import zipfile
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
 from pathlib import Path
-from reportlab.lib.pagesizes import A3
-from reportlab.lib.units import cm
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import Color
+
+from almacenamiento import guardar_atomico
+from mapeo_logos import MapeoLogosRangos
+
+# reportlab se importa recién al dibujar (ver _dibujar_filas): importar este
+# módulo para consultar estado, parsear IDs o mostrar --help no lo carga.
+# Mismo valor que reportlab.lib.units.cm
+cm = 72.0 / 2.54
+
+# Exportación de una página por archivo: formato -> extensión
+FORMATOS_EXPORTACION = {'pdf': '.pdf', 'png': '.png', 'tiff': '.tif'}
+DPI_EXPORTACION = 300
+
+# Codificaciones de 1 bit para los QR del PDF (ver imagen_bitonal)
+CODIFICACIONES_QR = ('flate', 'g4')
 
 
 class GeneradorPlanchasPDF:
@@ -29,7 +49,7 @@ class GeneradorPlanchasPDF:
     GROSOR_LINEA_CORTE = 0.5
     
     # Color de línea de corte (Magenta)
-    COLOR_TROQUEL = Color(1, 0, 1)
+    COLOR_TROQUEL = (1, 0, 1)
     
     # Configuración de grilla (CORREGIDA: 14 filas por columna)
     COLUMNAS = 2
@@ -46,20 +66,47 @@ class GeneradorPlanchasPDF:
     ANCHO_ZONA_ID = 1.5 * cm
     SEPARACION_ID_STICKER = 0.8 * cm
     
+    # Páginas por tramo en la generación reanudable (checkpoints)
+    PAGINAS_POR_CHUNK = 20
+    
+    # PDF reproducible (fechas e ID fijos): las mismas entradas dan los mismos
+    # bytes, así la huella del trabajo sirve de ETag fuerte para descargas
+    PDF_REPRODUCIBLE = True
+    
+    # Logos decodificados una sola vez para todos los tramos y procesos
+    # (ver cache_imagenes); False = drawImage en cada PDF
+    CACHE_LOGOS = True
+    
     def __init__(self, carpeta_qrs="qrs", logo_principal="logo.png", 
-                 logos_especiales=None):
+                 logos_especiales=None, reservar_huecos=False, codificacion_qr='flate'):
         """
         Inicializa el generador de planchas
         
         Args:
             carpeta_qrs: Ruta a la carpeta con los archivos QR
             logo_principal: Ruta al logo por defecto
-            logos_especiales: Dict {id_numero: ruta_logo} para logos personalizados
+            logos_especiales: MapeoLogosRangos o dict {id_numero: ruta_logo}
+                para logos personalizados
+            reservar_huecos: Si True, cada página corresponde a un bloque
+                fijo de 28 IDs (1-28, 29-56, ...) y los IDs faltantes quedan
+                como filas en blanco
+            codificacion_qr: Cómo embeber los QR en el PDF: 'flate' (1 bit,
+                Flate), 'g4' (1 bit, CCITT Group 4) o None (drawImage, RGB
+                de 8 bits). Los QR con color siempre usan drawImage.
         """
         self.carpeta_qrs = Path(carpeta_qrs)
         self.logo_principal = Path(logo_principal)
-        self.logos_especiales = logos_especiales or {}
+        self.logos_especiales = MapeoLogosRangos.desde_dict(logos_especiales or {})
+        self.reservar_huecos = reservar_huecos
+        self.codificacion_qr = codificacion_qr
         self.qrs_ordenados = []
+        # Rangos (inicio, fin) de IDs faltantes y {numero: [ruta_usada, ignoradas...]}
+        self.huecos = []
+        self.duplicados = {}
+        # Ruta de QR -> primera ruta con el mismo contenido (hardlinks)
+        self.qrs_canonicos = {}
+        # Ruta de logo especial -> Path validado (None si no existe)
+        self._logos_resueltos = {}
         
     def validar_archivos(self):
         """Valida que existan los archivos necesarios"""
@@ -70,18 +117,39 @@ class GeneradorPlanchasPDF:
         if not self.logo_principal.exists():
             errores.append(f"No se encontró el logo principal: {self.logo_principal}")
         
-        # Validar logos especiales
-        for id_num, ruta_logo in self.logos_especiales.items():
-            if not Path(ruta_logo).exists():
-                advertencias.append(f"Logo especial para ID {id_num} no encontrado: {ruta_logo}")
+        # Validar logos especiales: un stat por archivo distinto, el resultado
+        # queda memorizado para resolver el logo de cada fila sin tocar disco
+        faltantes = {}
+        self._logos_resueltos = {}
+        for inicio, fin, ruta_logo in self.logos_especiales.rangos():
+            if self._logo_especial_valido(ruta_logo) is None:
+                ids = str(inicio) if inicio == fin else f"{inicio}-{fin}"
+                faltantes.setdefault(ruta_logo, []).append(ids)
+        
+        for ruta_logo, ids in faltantes.items():
+            advertencias.append(f"Logo especial para ID {', '.join(ids)} no encontrado: {ruta_logo}")
+        
+        # Logos SVG que no se van a dibujar como vectores (falta svglib)
+        svgs = [ruta for ruta in [self.logo_principal, *self._logos_resueltos.values()]
+                if ruta and ruta.suffix.lower() == '.svg' and ruta.exists()]
+        if svgs:
+            from logos_vectoriales import advertencia_logo_vectorial
+            
+            for ruta in dict.fromkeys(svgs):
+                advertencia = advertencia_logo_vectorial(ruta)
+                if advertencia:
+                    advertencias.append(advertencia)
         
         # Validar carpeta de QRs
         if not self.carpeta_qrs.exists():
             errores.append(f"No se encontró la carpeta de QRs: {self.carpeta_qrs}")
         else:
-            self.qrs_ordenados = self._obtener_qrs_ordenados()
+            self.qrs_ordenados, self.huecos, self.duplicados = analizar_secuencia(
+                self._obtener_qrs_ordenados()
+            )
             if not self.qrs_ordenados:
                 errores.append(f"No se encontraron archivos QR en: {self.carpeta_qrs}")
+            advertencias.extend(self._advertencias_secuencia())
         
         if errores:
             raise FileNotFoundError("\n".join(errores))
@@ -98,15 +166,50 @@ class GeneradorPlanchasPDF:
         qrs = []
         patron = re.compile(r'whokey-(\d+)\.png', re.IGNORECASE)
         
-        for archivo in self.carpeta_qrs.glob("*.png"):
-            match = patron.match(archivo.name)
-            if match:
-                numero = int(match.group(1))
-                qrs.append((numero, archivo))
+        # Los QRs deduplicados al subirlos son hardlinks al mismo contenido:
+        # se dibujan con una única ruta para que el PDF embeba la imagen una vez
+        # (DirEntry.inode() no requiere stat en POSIX)
+        por_inodo = {}
+        self.qrs_canonicos = {}
         
-        qrs.sort(key=lambda x: x[0])
+        with os.scandir(self.carpeta_qrs) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith('.png'):
+                    continue
+                match = patron.match(entrada.name)
+                if match:
+                    numero = int(match.group(1))
+                    archivo = self.carpeta_qrs / entrada.name
+                    qrs.append((numero, archivo))
+                    
+                    canonico = por_inodo.setdefault(entrada.inode(), archivo)
+                    if canonico != archivo:
+                        self.qrs_canonicos[archivo] = canonico
+        
+        qrs.sort(key=lambda x: (x[0], x[1].name))
         return qrs
     
+    def _advertencias_secuencia(self, maximo=10):
+        """Advertencias de huecos y duplicados de la última validación"""
+        advertencias = []
+        
+        if self.huecos:
+            faltantes = sum(fin - inicio + 1 for inicio, fin in self.huecos)
+            rangos = [str(inicio) if inicio == fin else f"{inicio}-{fin}"
+                      for inicio, fin in self.huecos[:maximo]]
+            resto = f" y {len(self.huecos) - maximo} rango(s) más" if len(self.huecos) > maximo else ""
+            accion = "se dejan en blanco" if self.reservar_huecos else "se omiten"
+            advertencias.append(f"{faltantes} ID(s) faltantes ({accion}): "
+                                f"{', '.join(rangos)}{resto}")
+        
+        for numero_id, rutas in list(self.duplicados.items())[:maximo]:
+            advertencias.append(f"ID {numero_id} repetido: se usa {rutas[0].name}, se ignora "
+                                f"{', '.join(ruta.name for ruta in rutas[1:])}")
+        if len(self.duplicados) > maximo:
+            advertencias.append(f"... y {len(self.duplicados) - maximo} ID(s) repetidos más")
+        
+        return advertencias
+    
     def _obtener_logo_para_id(self, numero_id):
         """
         Obtiene la ruta del logo correspondiente a un ID
@@ -117,31 +220,100 @@ class GeneradorPlanchasPDF:
         Returns:
             Path del logo a usar (especial o principal)
         """
-        if numero_id in self.logos_especiales:
-            ruta_especial = Path(self.logos_especiales[numero_id])
-            if ruta_especial.exists():
+        ruta = self.logos_especiales.get(numero_id)
+        if ruta is not None:
+            ruta_especial = self._logo_especial_valido(ruta)
+            if ruta_especial is not None:
                 return ruta_especial
         
         return self.logo_principal
     
+    def _logo_especial_valido(self, ruta):
+        """Path de un logo especial si existe (un solo stat por archivo)"""
+        if ruta not in self._logos_resueltos:
+            ruta_especial = Path(ruta)
+            self._logos_resueltos[ruta] = ruta_especial if ruta_especial.exists() else None
+        return self._logos_resueltos[ruta]
+    
+    def _resolver_logos(self, qrs):
+        """
+        Resuelve una sola vez el logo de cada fila del trabajo
+        
+        Recorre los QRs ordenados y los rangos del mapeo en paralelo
+        (O(filas + rangos)), reutilizando la validación de validar_archivos.
+        
+        Args:
+            qrs: Lista ordenada de tuplas (numero_id, ruta_qr)
+            
+        Returns:
+            Lista con el Path del logo para cada fila
+        """
+        rangos = self.logos_especiales.rangos()
+        logos = []
+        k = 0
+        
+        for numero_id, _ in qrs:
+            while k < len(rangos) and rangos[k][1] < numero_id:
+                k += 1
+            ruta_especial = None
+            if k < len(rangos) and rangos[k][0] <= numero_id:
+                ruta_especial = self._logo_especial_valido(rangos[k][2])
+            logos.append(ruta_especial or self.logo_principal)
+        
+        return logos
+    
     def _dibujar_circulo_troquel(self, c, x_centro, y_centro):
         """Dibuja el círculo de troquel (línea de corte)"""
-        c.setStrokeColor(self.COLOR_TROQUEL)
+        c.setStrokeColorRGB(*self.COLOR_TROQUEL)
         c.setLineWidth(self.GROSOR_LINEA_CORTE)
         c.circle(x_centro, y_centro, self.DIAMETRO_TROQUEL / 2, stroke=1, fill=0)
     
-    def _dibujar_imagen_centrada(self, c, ruta_imagen, x_centro, y_centro, tamano):
-        """Dibuja una imagen centrada en las coordenadas especificadas"""
+    def _dibujar_imagen_centrada(self, c, ruta_imagen, x_centro, y_centro, tamano,
+                                 compartida=False):
+        """
+        Dibuja una imagen centrada en las coordenadas especificadas
+        
+        Con compartida=True (logos) y un lienzo PDF, la imagen sale de la
+        caché compartida entre procesos en lugar de decodificarse de nuevo.
+        Los logos SVG/PDF se dibujan como vectores (ver logos_vectoriales).
+        """
         x = x_centro - (tamano / 2)
         y = y_centro - (tamano / 2)
         
         try:
+            if hasattr(c, '_doc') and str(ruta_imagen).lower().endswith(('.svg', '.pdf')):
+                from logos_vectoriales import dibujar_logo_vectorial
+                
+                dibujar_logo_vectorial(c, ruta_imagen, x, y, tamano, tamano)
+                return
+            if compartida and self.CACHE_LOGOS and hasattr(c, '_doc'):
+                from cache_imagenes import dibujar_compartida
+                
+                if dibujar_compartida(c, ruta_imagen, x, y, tamano, tamano):
+                    return
             c.drawImage(str(ruta_imagen), x, y, 
                        width=tamano, height=tamano, 
                        preserveAspectRatio=True, mask='auto')
         except Exception as e:
             print(f"⚠️  Error al cargar imagen {ruta_imagen}: {e}")
     
+    def _dibujar_qr_centrado(self, c, ruta_qr, x_centro, y_centro):
+        """Dibuja un QR centrado, en 1 bit si el lienzo es un PDF de reportlab"""
+        # LienzoRaster no tiene documento PDF: dibuja el QR como cualquier imagen
+        if self.codificacion_qr and hasattr(c, '_doc'):
+            from imagen_bitonal import dibujar_bitonal
+            
+            mitad = self.TAMANO_QR / 2
+            try:
+                if dibujar_bitonal(c, ruta_qr, x_centro - mitad, y_centro - mitad,
+                                   self.TAMANO_QR, self.TAMANO_QR, self.codificacion_qr):
+                    return
+            except Exception as e:
+                print(f"⚠️  Error al cargar imagen {ruta_qr}: {e}")
+                return
+        
+        self._dibujar_imagen_centrada(c, ruta_qr, x_centro, y_centro, self.TAMANO_QR)
+    
     def _dibujar_texto_id(self, c, numero_id, x, y):
         """Dibuja el número de ID a la izquierda de la fila (fuera de stickers)"""
         c.setFont("Helvetica-Bold", 10)
@@ -177,7 +349,7 @@ class GeneradorPlanchasPDF:
         
         return x_columna, y_centro
     
-    def _dibujar_fila_stickers(self, c, numero_id, ruta_qr, indice_fila):
+    def _dibujar_fila_stickers(self, c, numero_id, ruta_qr, indice_fila, ruta_logo=None):
         """
         Dibuja una fila completa de stickers con logo dinámico
         
@@ -188,6 +360,7 @@ class GeneradorPlanchasPDF:
             numero_id: Número identificador
             ruta_qr: Ruta al archivo QR
             indice_fila: Índice de la fila en la página (0-27)
+            ruta_logo: Logo ya resuelto para la fila (si es None se busca)
         """
         x_inicio, y_centro = self._calcular_posicion_fila(indice_fila)
         
@@ -196,7 +369,8 @@ class GeneradorPlanchasPDF:
         self._dibujar_texto_id(c, numero_id, x_id, y_centro)
         
         # Obtener logo para este ID (dinámico)
-        ruta_logo = self._obtener_logo_para_id(numero_id)
+        if ruta_logo is None:
+            ruta_logo = self._obtener_logo_para_id(numero_id)
         
         # Posición X donde comienzan los stickers
         x_actual = x_inicio + self.ANCHO_ZONA_ID + self.SEPARACION_ID_STICKER
@@ -204,122 +378,898 @@ class GeneradorPlanchasPDF:
         # 1. Primer Logo con troquel
         self._dibujar_circulo_troquel(c, x_actual, y_centro)
         self._dibujar_imagen_centrada(c, ruta_logo, x_actual, y_centro, 
-                                     self.TAMANO_LOGO)
+                                     self.TAMANO_LOGO, compartida=True)
         x_actual += self.DIAMETRO_TROQUEL + self.ESPACIO_ENTRE_ELEMENTOS
         
         # 2. Segundo Logo con troquel
         self._dibujar_circulo_troquel(c, x_actual, y_centro)
         self._dibujar_imagen_centrada(c, ruta_logo, x_actual, y_centro, 
-                                     self.TAMANO_LOGO)
+                                     self.TAMANO_LOGO, compartida=True)
         x_actual += self.DIAMETRO_TROQUEL + self.ESPACIO_ENTRE_ELEMENTOS
         
+        # QR idéntico a otro ya embebido: reutilizar la misma imagen
+        ruta_qr = self.qrs_canonicos.get(ruta_qr, ruta_qr)
+        
         # 3. Primer QR con troquel
         self._dibujar_circulo_troquel(c, x_actual, y_centro)
-        self._dibujar_imagen_centrada(c, ruta_qr, x_actual, y_centro, 
-                                     self.TAMANO_QR)
+        self._dibujar_qr_centrado(c, ruta_qr, x_actual, y_centro)
         x_actual += self.DIAMETRO_TROQUEL + self.ESPACIO_ENTRE_ELEMENTOS
         
         # 4. Segundo QR (mismo) con troquel
         self._dibujar_circulo_troquel(c, x_actual, y_centro)
-        self._dibujar_imagen_centrada(c, ruta_qr, x_actual, y_centro, 
-                                     self.TAMANO_QR)
+        self._dibujar_qr_centrado(c, ruta_qr, x_actual, y_centro)
     
-    def generar_pdf(self, archivo_salida="planchas_stickers.pdf", verbose=True):
+    def obtener_filas(self, ids=None):
         """
-        Genera el archivo PDF con todas las planchas necesarias
+        Filas del trabajo en orden de dibujo
+        
+        Con reservar_huecos, cada página empieza en un bloque fijo de IDs y
+        los IDs faltantes (o excluidos por ids) ocupan su fila con ruta None.
+        Las páginas sin ningún QR no se generan.
         
         Args:
-            archivo_salida: Nombre del archivo PDF de salida
-            verbose: Si True, muestra mensajes en consola
+            ids: RangosIds con los IDs a incluir (None = todos los QRs)
             
         Returns:
-            Tuple (ruta_pdf, estadisticas_dict)
+            Lista de tuplas (numero_id, ruta_qr o None)
         """
-        advertencias = self.validar_archivos()
+        qrs = self.qrs_ordenados
+        if ids is not None:
+            qrs = [(numero_id, ruta) for numero_id, ruta in qrs if numero_id in ids]
+            if not qrs:
+                raise ValueError(f"Ningún QR coincide con los IDs indicados: {ids.texto()}")
+        if not self.reservar_huecos:
+            return qrs
+        
+        filas = []
+        siguiente = None
+        for numero_id, ruta in qrs:
+            if siguiente is None or numero_id >= self._inicio_bloque(siguiente) + self.FILAS_TOTALES_POR_HOJA:
+                # Nuevo bloque: completar la página anterior y saltar a la nueva
+                while filas and len(filas) % self.FILAS_TOTALES_POR_HOJA:
+                    filas.append((siguiente, None))
+                    siguiente += 1
+                siguiente = self._inicio_bloque(numero_id)
+            while siguiente < numero_id:
+                filas.append((siguiente, None))
+                siguiente += 1
+            filas.append((numero_id, ruta))
+            siguiente = numero_id + 1
+        return filas
+    
+    def _inicio_bloque(self, numero_id):
+        """Primer ID del bloque de página fijo al que pertenece un ID"""
+        return (numero_id - 1) // self.FILAS_TOTALES_POR_HOJA * self.FILAS_TOTALES_POR_HOJA + 1
+    
+    def _dibujar_filas(self, archivo_salida, qrs, logos_por_fila, verbose=False,
+                       pagina_inicial=1, lienzo=None, al_completar_pagina=None):
+        """
+        Dibuja una secuencia de filas en un PDF nuevo (28 filas por página)
         
-        # Crear canvas
-        c = canvas.Canvas(archivo_salida, pagesize=A3)
+        Args:
+            archivo_salida: Ruta del PDF a escribir
+            qrs: Lista ordenada de tuplas (numero_id, ruta_qr)
+            logos_por_fila: Logo resuelto para cada fila de qrs
+            verbose: Si True, informa cada página completada
+            pagina_inicial: Número de la primera página (para los mensajes)
+            lienzo: Canvas ya creado con la interfaz de reportlab (p. ej.
+                LienzoRaster); None = PDF en archivo_salida
+            al_completar_pagina: Función opcional sin argumentos, llamada
+                cada vez que se termina de dibujar una página
+        """
+        if lienzo is None:
+            from reportlab.pdfgen import canvas
+            
+            # Crear canvas (A3)
+            c = canvas.Canvas(str(archivo_salida),
+                              pagesize=(self.ANCHO_PAGINA, self.ALTO_PAGINA),
+                              invariant=int(self.PDF_REPRODUCIBLE))
+        else:
+            c = lienzo
         c.setTitle("Planchas de Stickers - WhoKey")
         c.setAuthor("Sistema Automatizado v3.0")
         
-        total_qrs = len(self.qrs_ordenados)
-        total_paginas = (total_qrs + self.FILAS_TOTALES_POR_HOJA - 1) // self.FILAS_TOTALES_POR_HOJA
-        
-        if verbose:
-            print(f"📄 Generando PDF con {total_paginas} página(s) A3...")
-            print(f"   Total de filas: {total_qrs}")
-            print(f"   Filas por página: {self.FILAS_TOTALES_POR_HOJA} (14 por columna)")
-        
-        # Procesar cada QR
-        for idx, (numero_id, ruta_qr) in enumerate(self.qrs_ordenados):
+        # Procesar cada QR (ruta None = hueco reservado, fila en blanco)
+        for idx, (numero_id, ruta_qr) in enumerate(qrs):
             # Índice de fila en la página actual (0-27)
             indice_fila_en_pagina = idx % self.FILAS_TOTALES_POR_HOJA
             
             # Si es la primera fila de una nueva página (y no es la primera página)
             if idx > 0 and indice_fila_en_pagina == 0:
                 c.showPage()
+                if al_completar_pagina:
+                    al_completar_pagina()
                 if verbose:
-                    pagina_actual = (idx // self.FILAS_TOTALES_POR_HOJA)
+                    pagina_actual = pagina_inicial - 1 + (idx // self.FILAS_TOTALES_POR_HOJA)
                     print(f"   ✓ Página {pagina_actual} completada")
             
             # Dibujar la fila
-            self._dibujar_fila_stickers(c, numero_id, ruta_qr, indice_fila_en_pagina)
+            if ruta_qr is not None:
+                self._dibujar_fila_stickers(c, numero_id, ruta_qr, indice_fila_en_pagina,
+                                            logos_por_fila[idx])
         
         # Guardar PDF
         c.save()
-        
-        # Estadísticas
-        estadisticas = {
+        if al_completar_pagina and qrs:
+            al_completar_pagina()
+    
+    def _estadisticas(self, total_qrs, total_paginas, advertencias, filas_en_blanco=0):
+        """Diccionario de estadísticas de un trabajo"""
+        return {
             'total_paginas': total_paginas,
             'total_filas': total_qrs,
             'total_logos': total_qrs * 2,
             'total_qrs': total_qrs * 2,
             'filas_por_pagina': self.FILAS_TOTALES_POR_HOJA,
             'logos_especiales': len(self.logos_especiales),
+            'ids_faltantes': sum(fin - inicio + 1 for inicio, fin in self.huecos),
+            'ids_repetidos': len(self.duplicados),
+            'filas_en_blanco': filas_en_blanco,
             'advertencias': advertencias
         }
+    
+    def _mostrar_resumen(self, archivo_salida, total_qrs, total_paginas):
+        """Muestra en consola el resumen de un PDF generado"""
+        print(f"\n✅ PDF generado exitosamente: {archivo_salida}")
+        print(f"   Tamaño: A3 (29.7cm x 42cm)")
+        print(f"   Total de páginas: {total_paginas}")
+        print(f"   Total de stickers: {total_qrs * 4}")
+        if self.logos_especiales:
+            print(f"   Logos especiales: {len(self.logos_especiales)} IDs personalizados")
+    
+    def _seleccionar_reimpresion(self, filas, paginas=None, reimprimir_ids=None):
+        """
+        Filas de una reimpresión parcial, con la misma ubicación que en el
+        trabajo completo: solo las páginas que contienen alguna fila elegida,
+        y dentro de ellas las filas no elegidas quedan en blanco
+        
+        Args:
+            filas: Filas del trabajo completo (ver obtener_filas)
+            paginas: RangosIds con los números de página a incluir
+            reimprimir_ids: RangosIds con los IDs a incluir
+            
+        Returns:
+            Tuple (filas_a_dibujar, numeros_de_pagina_originales)
+        """
+        por_hoja = self.FILAS_TOTALES_POR_HOJA
+        seleccion = []
+        paginas_originales = []
+        
+        for desde in range(0, len(filas), por_hoja):
+            pagina = desde // por_hoja + 1
+            if paginas is not None and pagina not in paginas:
+                continue
+            hoja = filas[desde:desde + por_hoja]
+            if reimprimir_ids is not None:
+                hoja = [(numero_id, ruta if numero_id in reimprimir_ids else None)
+                        for numero_id, ruta in hoja]
+            # Solo la última hoja puede estar incompleta: las elegidas se
+            # concatenan y cada una sigue empezando en página nueva
+            if any(ruta is not None for _, ruta in hoja):
+                seleccion.extend(hoja)
+                paginas_originales.append(pagina)
+        
+        if not paginas_originales:
+            raise ValueError("La selección de páginas/IDs no incluye ningún QR del trabajo")
+        return seleccion, paginas_originales
+    
+    def paginas_reimpresion(self, paginas=None, reimprimir_ids=None, ids=None):
+        """
+        Cantidad de páginas que dibuja generar_pdf con esa selección
+        (requiere validar_archivos)
+        
+        Raises:
+            ValueError: Si la selección no incluye ningún QR del trabajo
+        """
+        filas = self.obtener_filas(ids)
+        if paginas is None and reimprimir_ids is None:
+            return (len(filas) + self.FILAS_TOTALES_POR_HOJA - 1) // self.FILAS_TOTALES_POR_HOJA
+        return len(self._seleccionar_reimpresion(filas, paginas, reimprimir_ids)[1])
+    
+    def generar_pdf(self, archivo_salida="planchas_stickers.pdf", verbose=True,
+                    ids=None, paginas=None, reimprimir_ids=None):
+        """
+        Genera el archivo PDF con todas las planchas necesarias
+        
+        Con paginas o reimprimir_ids genera una reimpresión parcial: solo se
+        dibujan esas páginas o filas, en la misma posición que tienen en el
+        trabajo completo.
+        
+        Args:
+            archivo_salida: Nombre del archivo PDF de salida
+            verbose: Si True, muestra mensajes en consola
+            ids: RangosIds con los IDs a incluir (None = todos los QRs)
+            paginas: RangosIds con las páginas del trabajo a generar
+            reimprimir_ids: RangosIds con los IDs a dibujar; el resto de
+                cada página queda en blanco
+            
+        Returns:
+            Tuple (ruta_pdf, estadisticas_dict)
+        """
+        advertencias = self.validar_archivos()
+        qrs = self.obtener_filas(ids)
+        
+        paginas_originales = None
+        if paginas is not None or reimprimir_ids is not None:
+            paginas_trabajo = (len(qrs) + self.FILAS_TOTALES_POR_HOJA - 1) // self.FILAS_TOTALES_POR_HOJA
+            qrs, paginas_originales = self._seleccionar_reimpresion(qrs, paginas, reimprimir_ids)
+        
+        total_qrs = sum(1 for _, ruta in qrs if ruta is not None)
+        total_paginas = (len(qrs) + self.FILAS_TOTALES_POR_HOJA - 1) // self.FILAS_TOTALES_POR_HOJA
         
         if verbose:
-            print(f"\n✅ PDF generado exitosamente: {archivo_salida}")
-            print(f"   Tamaño: A3 (29.7cm x 42cm)")
-            print(f"   Total de páginas: {total_paginas}")
-            print(f"   Total de stickers: {total_qrs * 4}")
-            if self.logos_especiales:
-                print(f"   Logos especiales: {len(self.logos_especiales)} IDs personalizados")
+            print(f"📄 Generando PDF con {total_paginas} página(s) A3...")
+            print(f"   Total de filas: {total_qrs}")
+            print(f"   Filas por página: {self.FILAS_TOTALES_POR_HOJA} (14 por columna)")
+            if paginas_originales is not None:
+                print(f"   Reimpresión de {len(paginas_originales)} de {paginas_trabajo} "
+                      f"página(s) del trabajo")
+        
+        # Logo de cada fila resuelto de antemano (sin stat por fila)
+        logos_por_fila = self._resolver_logos(qrs)
+        
+        self._dibujar_filas(archivo_salida, qrs, logos_por_fila, verbose)
+        
+        # Estadísticas
+        estadisticas = self._estadisticas(total_qrs, total_paginas, advertencias,
+                                          len(qrs) - total_qrs)
+        estadisticas['huella'] = self._huella_trabajo(qrs, None)
+        if paginas_originales is not None:
+            estadisticas['paginas_trabajo'] = paginas_trabajo
+            estadisticas['paginas_reimpresas'] = RangosIds(
+                (pagina, pagina) for pagina in paginas_originales
+            ).rangos_texto()
+        
+        if verbose:
+            self._mostrar_resumen(archivo_salida, total_qrs, total_paginas)
         
         return archivo_salida, estadisticas
+    
+    def exportar_paginas(self, carpeta, formato='pdf', ids=None, workers=1,
+                         dpi=DPI_EXPORTACION, prefijo='plancha'):
+        """
+        Exporta cada página A3 como un archivo propio (PDF, PNG o TIFF) y los
+        entrega en orden de página a medida que se terminan, para que un RIP
+        pueda empezar con la primera hoja mientras se dibujan las demás
+        
+        Cada archivo aparece en la carpeta ya completo (se escribe con un
+        nombre oculto y se renombra al terminar).
+        
+        Args:
+            carpeta: Carpeta de destino (p. ej. hot folder del RIP)
+            formato: 'pdf', 'png' o 'tiff'
+            ids: RangosIds con los IDs a incluir (None = todos los QRs)
+            workers: Procesos que dibujan páginas en paralelo
+            dpi: Resolución de PNG/TIFF
+            prefijo: Prefijo de los nombres (plancha_0001.pdf, ...)
+            
+        Yields:
+            Tuple (numero_pagina, ruta_archivo)
+        """
+        if formato not in FORMATOS_EXPORTACION:
+            raise ValueError(f"Formato no soportado: {formato} "
+                             f"(usa {', '.join(FORMATOS_EXPORTACION)})")
+        
+        self.validar_archivos()
+        filas = self.obtener_filas(ids)
+        logos_por_fila = self._resolver_logos(filas)
+        
+        carpeta = Path(carpeta)
+        carpeta.mkdir(parents=True, exist_ok=True)
+        por_hoja = self.FILAS_TOTALES_POR_HOJA
+        total_paginas = (len(filas) + por_hoja - 1) // por_hoja
+        digitos = max(4, len(str(total_paginas)))
+        extension = FORMATOS_EXPORTACION[formato]
+        
+        def nombres(pagina):
+            nombre = f"{prefijo}_{pagina:0{digitos}d}{extension}"
+            return carpeta / f".{nombre}.tmp", carpeta / nombre
+        
+        def publicar(pagina):
+            temporal, final = nombres(pagina)
+            os.replace(temporal, final)
+            return pagina, final
+        
+        if workers <= 1 or total_paginas <= 1:
+            _iniciar_proceso_render(self, filas, logos_por_fila)
+            for pagina in range(1, total_paginas + 1):
+                desde = (pagina - 1) * por_hoja
+                _exportar_pagina_en_proceso(str(nombres(pagina)[0]), desde,
+                                            desde + por_hoja, formato, dpi)
+                yield publicar(pagina)
+            return
+        
+        pool = ProcessPoolExecutor(max_workers=min(workers, total_paginas),
+                                   initializer=_iniciar_proceso_render,
+                                   initargs=(self, filas, logos_por_fila))
+        futuros = []
+        try:
+            for pagina in range(1, total_paginas + 1):
+                desde = (pagina - 1) * por_hoja
+                futuros.append(pool.submit(_exportar_pagina_en_proceso,
+                                           str(nombres(pagina)[0]), desde,
+                                           desde + por_hoja, formato, dpi))
+            # En orden: la hoja 1 se entrega apenas está, sin esperar al resto
+            for pagina, futuro in enumerate(futuros, start=1):
+                futuro.result()
+                yield publicar(pagina)
+        finally:
+            # Si el consumidor se detiene (p. ej. cliente desconectado), no
+            # seguir dibujando ni dejar temporales
+            pool.shutdown(wait=True, cancel_futures=True)
+            for pagina in range(1, total_paginas + 1):
+                temporal = nombres(pagina)[0]
+                if temporal.exists():
+                    temporal.unlink()
+    
+    def _huella_trabajo(self, qrs, paginas_por_chunk):
+        """
+        Huella (SHA-256) de las entradas de un trabajo: QRs, logos, mapeo y
+        layout. Si cualquiera cambia, la huella cambia y no se reanuda.
+        """
+        def firma(ruta):
+            if ruta is None:
+                return [None, None, None]
+            try:
+                st = os.stat(ruta)
+                return [str(ruta), st.st_size, st.st_mtime_ns]
+            except OSError:
+                return [str(ruta), None, None]
+        
+        datos = {
+            'layout': [self.COLUMNAS, self.FILAS_POR_COLUMNA, self.TAMANO_LOGO,
+                       self.TAMANO_QR, self.DIAMETRO_TROQUEL],
+            'paginas_por_chunk': paginas_por_chunk,
+            'codificacion_qr': self.codificacion_qr,
+            'logo_principal': firma(self.logo_principal),
+            'logos_especiales': [[inicio, fin] + firma(ruta)
+                                 for inicio, fin, ruta in self.logos_especiales.rangos()],
+            'qrs': [[numero_id] + firma(ruta) for numero_id, ruta in qrs]
+        }
+        contenido = json.dumps(datos, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(contenido).hexdigest()
+    
+    def generar_pdf_reanudable(self, archivo_salida="planchas_stickers.pdf",
+                               carpeta_checkpoints=".checkpoints",
+                               paginas_por_chunk=None, verbose=True, ids=None,
+                               workers=1, progreso=None, progreso_pagina=None,
+                               turno_tramo=None):
+        """
+        Genera el PDF por tramos de páginas guardando cada tramo terminado en
+        disco. Si el proceso se interrumpe, una nueva llamada con las mismas
+        entradas retoma desde el último tramo completado.
+        
+        Args:
+            archivo_salida: Nombre del archivo PDF de salida
+            carpeta_checkpoints: Carpeta donde se guardan tramos y manifiesto
+            paginas_por_chunk: Páginas por tramo (None = PAGINAS_POR_CHUNK)
+            verbose: Si True, muestra mensajes en consola
+            ids: RangosIds con los IDs a incluir (None = todos los QRs)
+            workers: Procesos que dibujan tramos en paralelo (1 = en este proceso)
+            progreso: Función opcional que recibe un dict por cada tramo guardado
+            progreso_pagina: Función opcional (paginas_completadas,
+                total_paginas), llamada por cada página dibujada (con
+                workers > 1, al guardarse cada tramo)
+            turno_tramo: Función opcional (paginas) -> context manager que
+                se toma antes de dibujar cada tramo y se suelta al guardarlo
+                (planificador de renders); con workers > 1, uno solo para
+                todos los tramos pendientes
+            
+        Returns:
+            Tuple (ruta_pdf, estadisticas_dict)
+        """
+        paginas_por_chunk = paginas_por_chunk or self.PAGINAS_POR_CHUNK
+        advertencias = self.validar_archivos()
+        qrs = self.obtener_filas(ids)
+        
+        # Manifiesto del trabajo, identificado por la huella de sus entradas
+        huella = self._huella_trabajo(qrs, paginas_por_chunk)
+        carpeta = Path(carpeta_checkpoints) / huella[:16]
+        
+        # Un solo trabajo por huella a la vez (doble clic, dos renders
+        # simultáneos u otro proceso): el segundo espera al primero y, si
+        # este ya dejó el mismo PDF en archivo_salida, lo reutiliza
+        candado = _tomar_carpeta_trabajo(carpeta)
+        try:
+            _podar_checkpoints(carpeta)
+            estadisticas = _resultado_previo(carpeta, huella, archivo_salida)
+            if estadisticas is not None:
+                if verbose:
+                    print(f"♻️  Mismo trabajo ya generado: {archivo_salida}")
+                if progreso_pagina:
+                    progreso_pagina(estadisticas['total_paginas'], estadisticas['total_paginas'])
+                return archivo_salida, estadisticas
+            return self._generar_tramos(
+                archivo_salida, carpeta, huella, qrs, advertencias, paginas_por_chunk,
+                verbose, workers, progreso, progreso_pagina, turno_tramo
+            )
+        finally:
+            if candado is not None:
+                os.close(candado)
+    
+    def _generar_tramos(self, archivo_salida, carpeta, huella, qrs, advertencias,
+                        paginas_por_chunk, verbose, workers, progreso, progreso_pagina,
+                        turno_tramo):
+        """Cuerpo de generar_pdf_reanudable, con el candado de la carpeta tomado"""
+        total_qrs = sum(1 for _, ruta in qrs if ruta is not None)
+        total_filas = len(qrs)
+        total_paginas = (total_filas + self.FILAS_TOTALES_POR_HOJA - 1) // self.FILAS_TOTALES_POR_HOJA
+        archivo_manifiesto = carpeta / 'manifiesto.json'
+        
+        completados = set()
+        if archivo_manifiesto.exists():
+            try:
+                with open(archivo_manifiesto, 'r') as f:
+                    manifiesto = json.load(f)
+                if manifiesto.get('huella') == huella:
+                    completados = set(manifiesto.get('completados', []))
+            except (OSError, ValueError):
+                completados = set()
+        
+        filas_por_chunk = paginas_por_chunk * self.FILAS_TOTALES_POR_HOJA
+        inicios = list(range(0, total_filas, filas_por_chunk))
+        reanudados = sum(1 for n in range(len(inicios))
+                         if n in completados and (carpeta / f"chunk_{n:05d}.pdf").exists())
+        
+        if verbose:
+            print(f"📄 Generando PDF con {total_paginas} página(s) A3 "
+                  f"en {len(inicios)} tramo(s) de {paginas_por_chunk} páginas...")
+            if reanudados:
+                print(f"   ↻ Reanudando: {reanudados} tramo(s) ya completados")
+        
+        logos_por_fila = self._resolver_logos(qrs)
+        partes = [carpeta / f"chunk_{n:05d}.pdf" for n in range(len(inicios))]
+        # Temporales propios de este trabajo (nunca los de otro proceso)
+        sufijo = f"{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        temporales = [carpeta / f".chunk_{n:05d}.{sufijo}.pdf.tmp" for n in range(len(inicios))]
+        pendientes = [n for n in range(len(inicios))
+                      if not (n in completados and partes[n].exists())]
+        
+        paginas_completadas = 0
+        
+        def paginas_terminadas(cantidad):
+            nonlocal paginas_completadas
+            paginas_completadas += cantidad
+            if progreso_pagina:
+                progreso_pagina(paginas_completadas, total_paginas)
+        
+        def paginas_del_tramo(n):
+            return min(paginas_por_chunk,
+                       total_paginas - inicios[n] // self.FILAS_TOTALES_POR_HOJA)
+        
+        # Tramos ya guardados por una ejecución anterior
+        if len(pendientes) < len(inicios):
+            paginas_terminadas(sum(paginas_del_tramo(n) for n in range(len(inicios))
+                                   if n not in pendientes))
+        
+        def tramo_terminado(n):
+            desde = inicios[n]
+            ultima = min(desde + filas_por_chunk, total_filas)
+            os.replace(temporales[n], partes[n])
+            
+            completados.add(n)
+            manifiesto = {
+                'huella': huella,
+                'total_paginas': total_paginas,
+                'paginas_por_chunk': paginas_por_chunk,
+                'completados': sorted(completados)
+            }
+            guardar_atomico(json.dumps(manifiesto).encode('utf-8'), archivo_manifiesto)
+            
+            pagina_desde = desde // self.FILAS_TOTALES_POR_HOJA + 1
+            pagina_hasta = (ultima - 1) // self.FILAS_TOTALES_POR_HOJA + 1
+            if verbose:
+                print(f"   💾 Tramo {n + 1}/{len(inicios)} guardado "
+                      f"(páginas {pagina_desde}-{pagina_hasta})")
+            if progreso:
+                progreso({'tramo': n + 1, 'tramos': len(inicios),
+                          'completados': len(completados),
+                          'pagina_desde': pagina_desde, 'pagina_hasta': pagina_hasta,
+                          'total_paginas': total_paginas})
+        
+        if turno_tramo is None:
+            def turno_tramo(paginas):
+                return nullcontext()
+        
+        if workers > 1 and len(pendientes) > 1:
+            # Cada proceso recibe el generador y las filas una sola vez (al
+            # crearse) y después solo los límites de cada tramo
+            with turno_tramo(sum(paginas_del_tramo(n) for n in pendientes)), \
+                    ProcessPoolExecutor(max_workers=min(workers, len(pendientes)),
+                                        initializer=_iniciar_proceso_render,
+                                        initargs=(self, qrs, logos_por_fila)) as pool:
+                futuros = {
+                    pool.submit(_dibujar_tramo_en_proceso,
+                                str(temporales[n]),
+                                inicios[n], inicios[n] + filas_por_chunk): n
+                    for n in pendientes
+                }
+                for futuro in as_completed(futuros):
+                    futuro.result()
+                    tramo_terminado(futuros[futuro])
+                    paginas_terminadas(paginas_del_tramo(futuros[futuro]))
+        else:
+            for n in pendientes:
+                desde = inicios[n]
+                hasta = desde + filas_por_chunk
+                with turno_tramo(paginas_del_tramo(n)):
+                    self._dibujar_filas(temporales[n], qrs[desde:hasta],
+                                        logos_por_fila[desde:hasta], verbose,
+                                        pagina_inicial=desde // self.FILAS_TOTALES_POR_HOJA + 1,
+                                        al_completar_pagina=lambda: paginas_terminadas(1))
+                tramo_terminado(n)
+        
+        # Unir los tramos (un solo tramo se mueve sin reescribirlo)
+        if len(partes) == 1:
+            shutil.move(str(partes[0]), archivo_salida)
+        else:
+            unir_pdfs(partes, archivo_salida)
+        
+        estadisticas = self._estadisticas(total_qrs, total_paginas, advertencias,
+                                          total_filas - total_qrs)
+        estadisticas['tramos_reanudados'] = reanudados
+        estadisticas['huella'] = huella
+        
+        # Quedan solo el candado y el resultado (para quien esperaba este trabajo)
+        for parte in partes:
+            parte.unlink(missing_ok=True)
+        archivo_manifiesto.unlink(missing_ok=True)
+        _guardar_resultado(carpeta, huella, archivo_salida, estadisticas)
+        
+        if verbose:
+            self._mostrar_resumen(archivo_salida, total_qrs, total_paginas)
+        
+        return archivo_salida, estadisticas
+
+
+def analizar_secuencia(qrs_ordenados):
+    """
+    Recorre una sola vez la lista ordenada de QRs buscando huecos y números
+    repetidos (p. ej. whokey-7.png y whokey-007.png)
+    
+    Args:
+        qrs_ordenados: Lista de tuplas (numero_id, ruta) ordenada por número
+        
+    Returns:
+        Tuple (qrs_unicos, huecos, duplicados): la lista sin repetidos (queda
+        el primero de cada número), los rangos (inicio, fin) faltantes entre
+        el primer y el último ID, y {numero: [ruta_usada, ignoradas...]}
+    """
+    unicos = []
+    huecos = []
+    duplicados = {}
+    
+    for numero_id, ruta in qrs_ordenados:
+        if unicos:
+            anterior, ruta_anterior = unicos[-1]
+            if numero_id == anterior:
+                duplicados.setdefault(numero_id, [ruta_anterior]).append(ruta)
+                continue
+            if numero_id > anterior + 1:
+                huecos.append((anterior + 1, numero_id - 1))
+        unicos.append((numero_id, ruta))
+    
+    return unicos, huecos, duplicados
+
+
+# Estado de cada proceso del pool de generar_pdf_reanudable(workers > 1)
+_render_en_proceso = None
+
+
+def _iniciar_proceso_render(generador, qrs, logos_por_fila):
+    global _render_en_proceso
+    _render_en_proceso = (generador, qrs, logos_por_fila)
+
+
+def _dibujar_tramo_en_proceso(archivo, desde, hasta):
+    generador, qrs, logos_por_fila = _render_en_proceso
+    generador._dibujar_filas(archivo, qrs[desde:hasta], logos_por_fila[desde:hasta])
+
+
+def _exportar_pagina_en_proceso(archivo, desde, hasta, formato, dpi):
+    generador, qrs, logos_por_fila = _render_en_proceso
+    lienzo = None
+    if formato != 'pdf':
+        from lienzo_raster import LienzoRaster
+        lienzo = LienzoRaster(archivo, (generador.ANCHO_PAGINA, generador.ALTO_PAGINA),
+                              formato, dpi)
+    generador._dibujar_filas(archivo, qrs[desde:hasta], logos_por_fila[desde:hasta],
+                             lienzo=lienzo)
+
+
+class _SalidaZip(io.RawIOBase):
+    """Destino de zipfile que acumula lo escrito para enviarlo por partes"""
+    
+    def __init__(self):
+        self.partes = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+    
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def zip_en_streaming(archivos, eliminar=True, tamano_bloque=1024 * 1024):
+    """
+    Arma un ZIP a medida que llegan los archivos, sin tenerlo entero en
+    memoria ni en disco (apto para una respuesta HTTP en streaming)
+    
+    Args:
+        archivos: Iterable de rutas (p. ej. las de exportar_paginas)
+        eliminar: Si True, borra cada archivo una vez agregado
+        tamano_bloque: Bytes leídos por vez de cada archivo
+        
+    Yields:
+        Bloques de bytes del ZIP
+    """
+    salida = _SalidaZip()
+    # PDF, PNG y TIFF ya vienen comprimidos: se guardan sin recomprimir
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as archivo_zip:
+        for ruta in archivos:
+            ruta = Path(ruta)
+            info = zipfile.ZipInfo.from_file(ruta, ruta.name)
+            with open(ruta, 'rb') as origen, archivo_zip.open(info, 'w') as destino:
+                while True:
+                    bloque = origen.read(tamano_bloque)
+                    if not bloque:
+                        break
+                    destino.write(bloque)
+                    datos = salida.vaciar()
+                    if datos:
+                        yield datos
+            if eliminar:
+                ruta.unlink()
+            datos = salida.vaciar()
+            if datos:
+                yield datos
+    yield salida.vaciar()
+
+
+class ErrorIdsTexto(ValueError):
+    """Texto de IDs con partes mal formadas"""
+    
+    def __init__(self, partes_invalidas):
+        self.partes_invalidas = partes_invalidas
+        super().__init__(f"IDs mal formados: {', '.join(partes_invalidas)}")
+
+
+class RangosIds:
+    """
+    Conjunto de IDs representado como rangos ordenados, fusionados y sin
+    solapamiento. No materializa los IDs: len() es O(1), la pertenencia
+    O(log rangos) y la iteración es perezosa.
+    """
+    
+    def __init__(self, rangos=()):
+        """
+        Args:
+            rangos: Iterable de tuplas (inicio, fin), en cualquier orden
+        """
+        self.rangos = []
+        for inicio, fin in sorted(rangos):
+            if self.rangos and inicio <= self.rangos[-1][1] + 1:
+                if fin > self.rangos[-1][1]:
+                    self.rangos[-1] = (self.rangos[-1][0], fin)
+            else:
+                self.rangos.append((inicio, fin))
+        
+        self._inicios = [inicio for inicio, _ in self.rangos]
+        self._total = sum(fin - inicio + 1 for inicio, fin in self.rangos)
+    
+    def __len__(self):
+        return self._total
+    
+    def __bool__(self):
+        return self._total > 0
+    
+    def __iter__(self):
+        for inicio, fin in self.rangos:
+            yield from range(inicio, fin + 1)
+    
+    def __contains__(self, numero_id):
+        k = bisect_right(self._inicios, numero_id) - 1
+        return k >= 0 and numero_id <= self.rangos[k][1]
+    
+    def __eq__(self, otro):
+        if isinstance(otro, RangosIds):
+            return self.rangos == otro.rangos
+        return NotImplemented
+    
+    def __repr__(self):
+        return f"RangosIds({self.texto()!r})"
+    
+    def rangos_texto(self):
+        """Rangos en formato de texto: ["1-5", "10", "20-25"]"""
+        return [
+            str(inicio) if inicio == fin else f"{inicio}-{fin}"
+            for inicio, fin in self.rangos
+        ]
+    
+    def texto(self):
+        """Representación normalizada: "1-5, 10, 20-25" """
+        return ', '.join(self.rangos_texto())
 
 
 def parsear_ids_texto(texto):
     """
-    Convierte un texto con IDs en una lista de números
+    Convierte un texto con IDs en rangos normalizados
     Soporta: "1, 5, 10" o "1-5, 10, 20-25"
     
     Args:
         texto: String con IDs separados por comas y/o rangos
         
     Returns:
-        Lista de números enteros
+        RangosIds (vacío si el texto está vacío)
+        
+    Raises:
+        ErrorIdsTexto: Si alguna parte no es un número o un rango válido
     """
     if not texto or not texto.strip():
-        return []
+        return RangosIds()
     
-    ids = set()
+    rangos = []
+    invalidas = []
     partes = texto.replace(' ', '').split(',')
     
     for parte in partes:
+        if not parte:
+            continue
+        
         if '-' in parte:
             # Es un rango
             try:
                 inicio, fin = parte.split('-')
-                ids.update(range(int(inicio), int(fin) + 1))
+                inicio, fin = int(inicio), int(fin)
             except ValueError:
+                invalidas.append(parte)
                 continue
+            if inicio > fin:
+                invalidas.append(parte)
+                continue
+            rangos.append((inicio, fin))
         else:
             # Es un número individual
             try:
-                ids.add(int(parte))
+                numero = int(parte)
             except ValueError:
+                invalidas.append(parte)
                 continue
+            rangos.append((numero, numero))
+    
+    if invalidas:
+        raise ErrorIdsTexto(invalidas)
+    
+    return RangosIds(rangos)
+
+
+def _tomar_carpeta_trabajo(carpeta):
+    """
+    Crea la carpeta de checkpoints de un trabajo y toma su candado exclusivo
+    (flock sobre carpeta/.lock), esperando si otro hilo o proceso lo tiene
+
+    Si el dueño anterior borró la carpeta mientras se esperaba, el candado
+    tomado es de un archivo que ya no existe: se vuelve a intentar.
+
+    Returns:
+        Descriptor del candado (None donde no hay fcntl)
+    """
+    try:
+        import fcntl
+    except ImportError:
+        carpeta.mkdir(parents=True, exist_ok=True)
+        return None
+    
+    candado = carpeta / '.lock'
+    while True:
+        carpeta.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(candado, os.O_RDWR | os.O_CREAT, 0o644)
+        except FileNotFoundError:
+            continue
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            st = os.stat(candado)
+            propio = os.fstat(fd)
+            if (st.st_dev, st.st_ino) == (propio.st_dev, propio.st_ino):
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+def _podar_checkpoints(carpeta):
+    """
+    Borra las carpetas de otros trabajos que ya nadie usa (candado libre):
+    tramos de trabajos cuyas entradas cambiaron y resultados anteriores
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return
+    
+    for otra in carpeta.parent.iterdir():
+        if otra == carpeta or not otra.is_dir():
+            continue
+        try:
+            fd = os.open(otra / '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            continue
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        try:
+            shutil.rmtree(otra, ignore_errors=True)
+        finally:
+            os.close(fd)
+
+
+def _firma_salida(archivo_salida):
+    try:
+        st = os.stat(archivo_salida)
+    except OSError:
+        return None
+    return [str(Path(archivo_salida).resolve()), st.st_size, st.st_mtime_ns]
+
+
+def _guardar_resultado(carpeta, huella, archivo_salida, estadisticas):
+    resultado = {'huella': huella, 'salida': _firma_salida(archivo_salida),
+                 'estadisticas': estadisticas}
+    guardar_atomico(json.dumps(resultado).encode('utf-8'), carpeta / 'resultado.json',
+                    fsync=False)
+
+
+def _resultado_previo(carpeta, huella, archivo_salida):
+    """
+    Estadísticas del trabajo idéntico que terminó antes, si su PDF sigue
+    intacto en archivo_salida; None si hay que generarlo
+    """
+    try:
+        with open(carpeta / 'resultado.json', 'r') as f:
+            resultado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    salida = _firma_salida(archivo_salida)
+    if resultado.get('huella') != huella or salida is None or resultado.get('salida') != salida:
+        return None
+    return dict(resultado['estadisticas'], reutilizado=True)
+
+
+def unir_pdfs(partes, archivo_salida):
+    """
+    Une varios PDFs parciales, en orden, en un único archivo
+    
+    Args:
+        partes: Lista de rutas de PDFs en el orden final
+        archivo_salida: Ruta del PDF resultante
+        
+    Returns:
+        Cantidad de páginas del PDF resultante
+    """
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        raise RuntimeError("Para unir PDFs parciales instala pypdf: pip install pypdf")
+    
+    writer = PdfWriter()
+    for parte in partes:
+        writer.append(str(parte))
+    
+    # Cada parte embebe sus propios logos: dejar una sola copia de cada uno
+    writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+    
+    # Escribir en un temporal y renombrar: nunca queda un PDF a medio unir
+    temporal = Path(f"{archivo_salida}.{os.getpid()}.{uuid.uuid4().hex[:8]}.parcial")
+    with open(temporal, 'wb') as f:
+        writer.write(f)
+    os.replace(temporal, archivo_salida)
     
-    return sorted(list(ids))
+    return len(writer.pages)
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Planchas combinadas: varios pedidos chicos en las mismas hojas A3
+
+Cada pedido es una carpeta de trabajo como la de la WebApp (qrs/, logo.png
+o logo.svg/logo.pdf y opcionalmente logos_especiales_mapeo.json con sus
+logos especiales). En lugar de generar un PDF por pedido, con la última
+hoja casi vacía, los pedidos se acomodan juntos:
+
+- Cada bloque de pedido empieza con una fila de encabezado (nombre del
+  pedido, cantidad e IDs) y una línea de separación; esa fila no tiene
+  stickers ni troquel
+- Un pedido que entra en una hoja no se parte entre hojas. Los pedidos
+  más grandes empiezan en hoja nueva y en cada hoja siguiente repiten el
+  encabezado ("continúa")
+- Los bloques se acomodan de mayor a menor en la primera hoja con lugar
+- Un manifiesto JSON indica qué hoja y qué filas corresponden a cada pedido
+
+Uso:
+    python planchas_combinadas.py pedidos/acme pedidos/bar --salida output/combinada.pdf
+    python planchas_combinadas.py "ACME-1042=pedidos/acme" pedidos/bar \\
+        --manifiesto output/combinada.json
+
+Las filas del manifiesto se numeran 1-28 por hoja: 1-14 columna izquierda y
+15-28 columna derecha, de arriba hacia abajo.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from almacenamiento import guardar_atomico
+from pdf_generator import GeneradorPlanchasPDF, RangosIds, CODIFICACIONES_QR, cm
+from mapeo_logos import MapeoLogosRangos
+
+
+# Identificador y versión del formato del manifiesto
+FORMATO_MANIFIESTO = 'plancha-combinada'
+VERSION_MANIFIESTO = 1
+
+# Archivos de una carpeta de pedido (los mismos nombres que usa la WebApp)
+CARPETA_QRS = 'qrs'
+ARCHIVOS_LOGO = ('logo.png', 'logo.svg', 'logo.pdf')
+ARCHIVO_MAPEO = 'logos_especiales_mapeo.json'
+
+# Color de encabezados y separadores (gris: nunca el magenta del troquel)
+COLOR_SEPARADOR = (0.45, 0.45, 0.45)
+
+
+class PedidoPlancha:
+    """Un pedido a combinar: su generador y sus filas ya resueltas"""
+
+    def __init__(self, nombre, generador):
+        """
+        Args:
+            nombre: Nombre del pedido (se imprime en el encabezado)
+            generador: GeneradorPlanchasPDF con los QRs y logos del pedido
+        """
+        self.nombre = nombre
+        self.generador = generador
+        self.advertencias = generador.validar_archivos()
+        self.filas = generador.obtener_filas()
+        self.logos = generador._resolver_logos(self.filas)
+
+    def ids_texto(self, desde=0, hasta=None):
+        """IDs de las filas [desde, hasta) en formato de rangos ("1-30, 35")"""
+        filas = self.filas[desde:hasta]
+        return RangosIds((numero_id, numero_id) for numero_id, _ in filas).texto()
+
+
+def cargar_pedido(carpeta, nombre=None, codificacion_qr='flate'):
+    """
+    Carga un pedido desde su carpeta de trabajo
+
+    Las rutas relativas del mapeo de logos especiales se toman respecto de
+    la carpeta del pedido (la WebApp guarda 'logos_especiales/...').
+
+    Args:
+        carpeta: Carpeta con qrs/, logo.png (o .svg/.pdf) y logos_especiales_mapeo.json
+        nombre: Nombre del pedido (por defecto, el de la carpeta)
+        codificacion_qr: Como en GeneradorPlanchasPDF
+
+    Returns:
+        PedidoPlancha
+
+    Raises:
+        FileNotFoundError: Si falta el logo, la carpeta de QRs o los QRs
+    """
+    carpeta = Path(carpeta)
+    logo = next((carpeta / nombre_logo for nombre_logo in ARCHIVOS_LOGO
+                 if (carpeta / nombre_logo).exists()), carpeta / ARCHIVOS_LOGO[0])
+    mapeo = MapeoLogosRangos()
+    for inicio, fin, ruta in MapeoLogosRangos.cargar(carpeta / ARCHIVO_MAPEO).rangos():
+        ruta = Path(ruta)
+        mapeo.asignar(inicio, fin, str(ruta if ruta.is_absolute() else carpeta / ruta))
+
+    generador = GeneradorPlanchasPDF(
+        carpeta_qrs=carpeta / CARPETA_QRS,
+        logo_principal=logo,
+        logos_especiales=mapeo,
+        codificacion_qr=codificacion_qr
+    )
+    return PedidoPlancha(nombre or carpeta.resolve().name, generador)
+
+
+def _bloques_pedido(indice, total_filas, filas_por_pagina):
+    """
+    Bloques de un pedido: (indice_pedido, desde, hasta, continua), cada uno
+    con su fila de encabezado más hasta filas_por_pagina - 1 filas
+    """
+    capacidad = filas_por_pagina - 1
+    return [(indice, desde, min(desde + capacidad, total_filas), desde > 0)
+            for desde in range(0, total_filas, capacidad)]
+
+
+def _fila_encabezado(fila_libre, filas_por_columna):
+    """
+    Fila donde va el encabezado de un bloque que empieza en fila_libre
+
+    Un encabezado en la última fila de una columna quedaría separado de sus
+    filas (que siguen arriba en la otra columna): se baja a la columna siguiente
+    """
+    if fila_libre % filas_por_columna == filas_por_columna - 1:
+        return fila_libre + 1
+    return fila_libre
+
+
+def empaquetar_pedidos(pedidos, filas_por_pagina=GeneradorPlanchasPDF.FILAS_TOTALES_POR_HOJA,
+                       filas_por_columna=GeneradorPlanchasPDF.FILAS_POR_COLUMNA):
+    """
+    Reparte los bloques de los pedidos en hojas
+
+    Los pedidos que no entran en una hoja ocupan hojas propias (en el orden
+    recibido) y solo su último bloque deja lugar libre. Después, los pedidos
+    que entran en una hoja se ubican de mayor a menor en la primera hoja con
+    lugar suficiente (first-fit decreasing), sin partirlos. El encabezado de
+    un bloque nunca queda solo al pie de una columna (ver _fila_encabezado).
+
+    Args:
+        pedidos: Lista de PedidoPlancha
+        filas_por_pagina: Filas por hoja (encabezados incluidos)
+        filas_por_columna: Filas de cada columna de la hoja
+
+    Returns:
+        Lista de hojas; cada hoja es una lista de bloques
+        (indice_pedido, desde, hasta, continua), con desde/hasta índices en
+        las filas del pedido y continua=True si el pedido viene de otra hoja
+    """
+    hojas = []
+    usadas = []
+    chicos = []
+
+    for indice, pedido in enumerate(pedidos):
+        if len(pedido.filas) + 1 <= filas_por_pagina:
+            chicos.append(indice)
+            continue
+        for bloque in _bloques_pedido(indice, len(pedido.filas), filas_por_pagina):
+            hojas.append([bloque])
+            usadas.append(1 + bloque[2] - bloque[1])
+
+    def fin_bloque(hoja, filas):
+        return _fila_encabezado(usadas[hoja], filas_por_columna) + filas
+
+    # sorted es estable: a igual tamaño se respeta el orden recibido
+    for indice in sorted(chicos, key=lambda i: len(pedidos[i].filas), reverse=True):
+        filas = len(pedidos[indice].filas) + 1
+        destino = next((h for h in range(len(hojas))
+                        if fin_bloque(h, filas) <= filas_por_pagina), None)
+        if destino is None:
+            hojas.append([])
+            usadas.append(0)
+            destino = len(hojas) - 1
+        hojas[destino].append((indice, 0, len(pedidos[indice].filas), False))
+        usadas[destino] = fin_bloque(destino, filas)
+
+    return hojas
+
+
+def _dibujar_encabezado(generador, c, pedido, indice_fila, desde, hasta, continua):
+    """Fila de encabezado de un bloque: separador, nombre, cantidad e IDs"""
+    x_inicio, y_centro = generador._calcular_posicion_fila(indice_fila)
+    ancho_columna = ((generador.ANCHO_PAGINA - generador.MARGEN_IZQUIERDO
+                      - generador.MARGEN_DERECHO) / generador.COLUMNAS)
+    y_linea = y_centro + generador.DIAMETRO_TROQUEL / 2
+
+    c.saveState()
+    c.setStrokeColorRGB(*COLOR_SEPARADOR)
+    c.setLineWidth(1)
+    c.setDash(4, 2)
+    c.line(x_inicio, y_linea, x_inicio + ancho_columna - 0.3 * cm, y_linea)
+    c.restoreState()
+
+    titulo = f"{pedido.nombre} (continúa)" if continua else pedido.nombre
+    c.setFillColorRGB(0, 0, 0)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(x_inicio + 0.2 * cm, y_centro + 0.1 * cm, titulo)
+    c.setFillColorRGB(*COLOR_SEPARADOR)
+    c.setFont("Helvetica", 8)
+    c.drawString(x_inicio + 0.2 * cm, y_centro - 0.4 * cm,
+                 f"{hasta - desde} de {len(pedido.filas)} QR · IDs {pedido.ids_texto(desde, hasta)}")
+
+
+def generar_plancha_combinada(pedidos, archivo_salida="planchas_combinadas.pdf",
+                              archivo_manifiesto=None, verbose=True):
+    """
+    Genera un PDF con varios pedidos acomodados en hojas compartidas
+
+    Args:
+        pedidos: Lista de PedidoPlancha (ver cargar_pedido)
+        archivo_salida: PDF de salida
+        archivo_manifiesto: JSON con hoja y filas de cada pedido (por
+            defecto, el PDF con extensión .json)
+        verbose: Si True, muestra mensajes en consola
+
+    Returns:
+        Tuple (ruta_pdf, manifiesto_dict)
+    """
+    from reportlab.pdfgen import canvas
+
+    if not pedidos:
+        raise ValueError("No hay pedidos para combinar")
+
+    base = pedidos[0].generador
+    filas_por_pagina = base.FILAS_TOTALES_POR_HOJA
+    hojas = empaquetar_pedidos(pedidos, filas_por_pagina, base.FILAS_POR_COLUMNA)
+    archivo_manifiesto = archivo_manifiesto or Path(archivo_salida).with_suffix('.json')
+
+    if verbose:
+        print(f"📄 Combinando {len(pedidos)} pedido(s) en {len(hojas)} página(s) A3...")
+
+    c = canvas.Canvas(str(archivo_salida), pagesize=(base.ANCHO_PAGINA, base.ALTO_PAGINA),
+                      invariant=int(base.PDF_REPRODUCIBLE))
+    c.setTitle("Planchas combinadas - WhoKey")
+    c.setAuthor("Sistema Automatizado v3.0")
+
+    resumen_pedidos = [{'nombre': pedido.nombre,
+                        'carpeta': str(pedido.generador.carpeta_qrs.parent),
+                        'total_qrs': len(pedido.filas),
+                        'ids': pedido.ids_texto(),
+                        'advertencias': pedido.advertencias,
+                        'bloques': []} for pedido in pedidos]
+    resumen_hojas = []
+
+    for numero_hoja, bloques in enumerate(hojas, start=1):
+        indice_fila = 0
+        filas_hoja = []
+        for indice_pedido, desde, hasta, continua in bloques:
+            pedido = pedidos[indice_pedido]
+            indice_fila = _fila_encabezado(indice_fila, base.FILAS_POR_COLUMNA)
+            _dibujar_encabezado(base, c, pedido, indice_fila, desde, hasta, continua)
+            for k in range(desde, hasta):
+                numero_id, ruta_qr = pedido.filas[k]
+                pedido.generador._dibujar_fila_stickers(
+                    c, numero_id, ruta_qr, indice_fila + 1 + k - desde, pedido.logos[k])
+
+            bloque = {
+                'pagina': numero_hoja,
+                'fila_encabezado': indice_fila + 1,
+                'filas': f"{indice_fila + 2}-{indice_fila + 1 + hasta - desde}",
+                'ids': pedido.ids_texto(desde, hasta),
+                'continua': continua
+            }
+            resumen_pedidos[indice_pedido]['bloques'].append(bloque)
+            filas_hoja.append({'pedido': pedido.nombre, **bloque})
+            indice_fila += 1 + hasta - desde
+
+        resumen_hojas.append({'pagina': numero_hoja, 'filas_usadas': indice_fila,
+                              'bloques': filas_hoja})
+        c.showPage()
+        if verbose:
+            print(f"   ✓ Página {numero_hoja} completada "
+                  f"({indice_fila}/{filas_por_pagina} filas, {len(bloques)} bloque(s))")
+    c.save()
+
+    for resumen in resumen_pedidos:
+        resumen['paginas'] = sorted({bloque['pagina'] for bloque in resumen['bloques']})
+
+    # Hojas que usaría cada pedido generado por separado
+    paginas_separadas = sum(
+        (len(pedido.filas) + filas_por_pagina - 1) // filas_por_pagina for pedido in pedidos
+    )
+    manifiesto = {
+        'formato': FORMATO_MANIFIESTO,
+        'version': VERSION_MANIFIESTO,
+        'pdf': Path(archivo_salida).name,
+        'filas_por_pagina': filas_por_pagina,
+        'total_paginas': len(hojas),
+        'paginas_por_separado': paginas_separadas,
+        'total_qrs': sum(len(pedido.filas) for pedido in pedidos),
+        'pedidos': resumen_pedidos,
+        'paginas': resumen_hojas
+    }
+    guardar_atomico(json.dumps(manifiesto, indent=2, ensure_ascii=False).encode('utf-8'),
+                    archivo_manifiesto)
+
+    if verbose:
+        print(f"\n✅ PDF generado exitosamente: {archivo_salida}")
+        print(f"   Páginas: {len(hojas)} (por separado serían {paginas_separadas})")
+        print(f"   Manifiesto: {archivo_manifiesto}")
+
+    return archivo_salida, manifiesto
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description="Combina varios pedidos chicos en las mismas planchas A3"
+    )
+    parser.add_argument('pedidos', nargs='+',
+                        help="Carpetas de pedido (qrs/, logo.png); NOMBRE=carpeta para "
+                             "imprimir otro nombre en el encabezado")
+    parser.add_argument('--salida', default='planchas_combinadas.pdf', help="PDF de salida")
+    parser.add_argument('--manifiesto', default=None,
+                        help="JSON de hojas y filas por pedido (por defecto, junto al PDF)")
+    parser.add_argument('--codificacion-qr', choices=CODIFICACIONES_QR + ('rgb',),
+                        default='flate', help="Cómo embeber los QR (ver generar_planchas_stickers)")
+    parser.add_argument('--silencioso', action='store_true', help="No imprimir mensajes")
+    args = parser.parse_args()
+
+    codificacion = None if args.codificacion_qr == 'rgb' else args.codificacion_qr
+    pedidos = []
+    try:
+        for argumento in args.pedidos:
+            nombre, _, carpeta = argumento.rpartition('=')
+            pedidos.append(cargar_pedido(carpeta, nombre or None, codificacion))
+            if not args.silencioso:
+                print(f"✓ Pedido {pedidos[-1].nombre}: {len(pedidos[-1].filas)} QR(s)")
+        generar_plancha_combinada(pedidos, args.salida, args.manifiesto,
+                                  verbose=not args.silencioso)
+    except (FileNotFoundError, ValueError) as e:
+        if not args.silencioso:
+            print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
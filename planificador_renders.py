@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Planificador de renders de la WebApp: prioridades y control de admisión
+
+Cada render pide un turno antes de dibujar. Los turnos se dan por orden de
+prioridad (urgente, normal, masivo) y, dentro de cada una, por orden de
+llegada, respetando dos límites por proceso: renders simultáneos y páginas
+en vuelo. Los trabajos grandes piden un turno por tramo de páginas (ver
+generar_pdf_reanudable), así un pedido urgente entra entre dos tramos de
+un trabajo masivo en lugar de esperar a que termine entero.
+
+- Un pedido que espera demasiado sube de prioridad (no hay inanición)
+- El primero de la cola no se saltea: si no entra por páginas, espera
+  a que se liberen y los demás esperan detrás
+- LimiteEntreProcesos reparte los renders entre los workers de gunicorn;
+  si un worker muere a mitad de un render, su lugar se libera solo
+- Con la cola llena se rechaza el pedido (ColaLlena), salvo los urgentes.
+  En un trabajo por tramos solo se controla el primero: un trabajo ya
+  admitido no se corta a mitad de camino
+- Un trabajo por tramos se marca entero con trabajo(): entre dos tramos no
+  tiene turno, pero sin_renders() igual lo ve en curso
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from itertools import count
+
+
+# Clases de prioridad, de la más a la menos urgente
+PRIORIDADES = ('urgente', 'normal', 'masivo')
+
+# Segundos de espera que suben un pedido una clase de prioridad
+ENVEJECIMIENTO = 120
+
+# Esperas registradas por prioridad para las estadísticas
+MUESTRAS_ESPERA = 200
+
+
+class ColaLlena(Exception):
+    """La cola de renders está llena; reintentar más tarde"""
+
+
+class RendersEnCurso(Exception):
+    """Hay renders activos o en cola (no se puede limpiar la carpeta de trabajo)"""
+
+
+class LimiteEntreProcesos:
+    """
+    Renders simultáneos entre procesos: un archivo de candado (flock) por
+    lugar. El sistema operativo suelta el candado cuando el proceso muere,
+    así un worker terminado por timeout u OOM no se queda con su lugar
+    (con un semáforo compartido, la capacidad bajaba hasta reiniciar).
+    Se crea antes del fork y se usa como context manager.
+
+    Un candado más, limpieza.lock, separa renders y limpieza entre procesos:
+    cada turno y cada trabajo por tramos lo tienen compartido de principio
+    a fin (trabajo()) y la limpieza lo toma exclusivo (sin_trabajos()).
+    """
+
+    # Segundos entre intentos mientras todos los lugares están ocupados
+    ESPERA = 0.1
+
+    def __init__(self, cantidad, carpeta=None):
+        """
+        Args:
+            cantidad: Renders simultáneos entre todos los procesos
+            carpeta: Carpeta de los candados (None = temporal privada,
+                borrada al salir el proceso que la creó)
+        """
+        if carpeta is None:
+            carpeta = tempfile.mkdtemp(prefix='planchas_renders-')
+            creador = os.getpid()
+            atexit.register(lambda: os.getpid() == creador and shutil.rmtree(carpeta, True))
+        self.carpeta = carpeta
+        self.lugares = [os.path.join(carpeta, f"lugar-{i}.lock") for i in range(max(1, cantidad))]
+        self.limpieza = os.path.join(carpeta, 'limpieza.lock')
+        for ruta in self.lugares + [self.limpieza]:
+            open(ruta, 'a').close()
+        # Descriptores con lugar tomado en este proceso; se sueltan en
+        # cualquier orden (el turno puede cerrarse desde otro hilo)
+        self._tomados = []
+        self._lock = threading.Lock()
+
+    def _tomar_lugar(self, ruta):
+        """Descriptor con el candado del lugar tomado, o None si está ocupado"""
+        import fcntl
+
+        fd = os.open(ruta, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+            return None
+
+    def __enter__(self):
+        while True:
+            for ruta in self.lugares:
+                fd = self._tomar_lugar(ruta)
+                if fd is not None:
+                    with self._lock:
+                        self._tomados.append(fd)
+                    return self
+            time.sleep(self.ESPERA)
+
+    def __exit__(self, *excepcion):
+        # Cerrar el descriptor suelta el candado
+        with self._lock:
+            fd = self._tomados.pop()
+        os.close(fd)
+        return False
+
+    @contextmanager
+    def trabajo(self):
+        """
+        Candado de limpieza compartido mientras dura el bloque (espera si
+        otro proceso está limpiando)
+        """
+        import fcntl
+
+        fd = os.open(self.limpieza, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def sin_trabajos(self):
+        """
+        Candado de limpieza exclusivo mientras dura el bloque
+
+        Raises:
+            RendersEnCurso: Si algún proceso tiene un turno o un trabajo en curso
+        """
+        import fcntl
+
+        fd = os.open(self.limpieza, os.O_RDWR)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RendersEnCurso("Hay un render en curso en otro proceso; "
+                                     "reintenta al terminar") from None
+            yield
+        finally:
+            os.close(fd)
+
+
+def _trabajo_de(limite):
+    """limite.trabajo() si el límite lo tiene, o un bloque vacío"""
+    trabajo = getattr(limite, 'trabajo', None)
+    return trabajo() if trabajo else nullcontext()
+
+
+class _Pedido:
+    """Un pedido de turno en la cola"""
+
+    def __init__(self, numero, prioridad, paginas, trabajo):
+        self.numero = numero
+        self.prioridad = prioridad
+        self.nivel = PRIORIDADES.index(prioridad)
+        self.paginas = paginas
+        self.trabajo = trabajo
+        self.llegada = time.monotonic()
+
+    def orden(self, ahora):
+        nivel = max(0, self.nivel - int((ahora - self.llegada) // ENVEJECIMIENTO))
+        return nivel, self.numero
+
+
+class PlanificadorRenders:
+    """Cola de turnos de render con prioridades y límites de capacidad"""
+
+    def __init__(self, renders_simultaneos=1, paginas_en_vuelo=200, cola_maxima=32,
+                 al_cambiar=None):
+        """
+        Args:
+            renders_simultaneos: Turnos activos a la vez en este proceso
+            paginas_en_vuelo: Páginas que pueden estar dibujándose a la vez
+                (un tramo más grande que el límite entra solo, sin otros)
+            cola_maxima: Pedidos esperando antes de rechazar (None = sin límite)
+            al_cambiar: Función opcional sin argumentos, llamada (fuera del
+                lock) cuando cambia la cola o los turnos activos
+        """
+        self.renders_simultaneos = max(1, renders_simultaneos)
+        self.paginas_en_vuelo = max(1, paginas_en_vuelo)
+        self.cola_maxima = cola_maxima
+        self._al_cambiar = al_cambiar
+        self._condicion = threading.Condition()
+        self._numeros = count()
+        self._cola = []
+        self._activos = []
+        # Bloques sin_renders en curso: mientras haya alguno no se dan turnos
+        self._pausas = 0
+        # Trabajos por tramos en curso (con o sin turno en este momento)
+        self._trabajos = 0
+        self._esperas = {prioridad: deque(maxlen=MUESTRAS_ESPERA) for prioridad in PRIORIDADES}
+
+    def _avisar(self):
+        if self._al_cambiar:
+            self._al_cambiar()
+
+    def _primero(self):
+        ahora = time.monotonic()
+        return min(self._cola, key=lambda pedido: pedido.orden(ahora))
+
+    def _entra(self, pedido):
+        """True si pedido es el primero de la cola y hay capacidad para él"""
+        if self._pausas or self._primero() is not pedido:
+            return False
+        if len(self._activos) >= self.renders_simultaneos:
+            return False
+        en_vuelo = sum(activo.paginas for activo in self._activos)
+        return not self._activos or en_vuelo + pedido.paginas <= self.paginas_en_vuelo
+
+    @contextmanager
+    def turno(self, prioridad='normal', paginas=1, trabajo=None, limite=None, admitido=False):
+        """
+        Espera un turno de render y lo mantiene mientras dura el bloque with
+
+        Args:
+            prioridad: 'urgente', 'normal' o 'masivo'
+            paginas: Páginas que se van a dibujar en el turno
+            trabajo: Nombre del trabajo (solo para las estadísticas)
+            limite: Límite opcional compartido entre procesos (p. ej.
+                LimiteEntreProcesos), que se toma después del turno local
+            admitido: True para los tramos siguientes de un trabajo ya
+                admitido (no se rechazan con la cola llena)
+
+        Raises:
+            ValueError: Si la prioridad no existe
+            ColaLlena: Si la cola está llena (nunca para 'urgente' ni admitido)
+        """
+        if prioridad not in PRIORIDADES:
+            raise ValueError(f"Prioridad no válida: {prioridad} (usa {', '.join(PRIORIDADES)})")
+
+        with self._condicion:
+            if (self.cola_maxima is not None and prioridad != 'urgente' and not admitido
+                    and len(self._cola) >= self.cola_maxima):
+                raise ColaLlena(f"Hay {len(self._cola)} renders en cola; reintenta en unos minutos")
+            pedido = _Pedido(next(self._numeros), prioridad, max(1, paginas), trabajo)
+            self._cola.append(pedido)
+        self._avisar()
+
+        try:
+            with self._condicion:
+                # Con timeout: el envejecimiento puede cambiar quién va primero
+                while not self._entra(pedido):
+                    self._condicion.wait(timeout=5)
+                self._cola.remove(pedido)
+                pedido.inicio = time.monotonic()
+                self._activos.append(pedido)
+                self._esperas[prioridad].append(pedido.inicio - pedido.llegada)
+                self._condicion.notify_all()
+        except BaseException:
+            with self._condicion:
+                if pedido in self._cola:
+                    self._cola.remove(pedido)
+                self._condicion.notify_all()
+            self._avisar()
+            raise
+        self._avisar()
+
+        try:
+            with _trabajo_de(limite), limite or nullcontext():
+                yield
+        finally:
+            with self._condicion:
+                self._activos.remove(pedido)
+                self._condicion.notify_all()
+            self._avisar()
+
+    @contextmanager
+    def trabajo(self, limite=None):
+        """
+        Marca un trabajo por tramos en curso mientras dura el bloque with
+        (también entre tramos, cuando no tiene turno). Si hay un bloque
+        sin_renders activo, espera a que termine antes de empezar.
+
+        Args:
+            limite: Límite entre procesos opcional; si tiene trabajo(), el
+                trabajo también se ve desde los otros procesos
+        """
+        with self._condicion:
+            while self._pausas:
+                self._condicion.wait()
+            self._trabajos += 1
+        self._avisar()
+        try:
+            with _trabajo_de(limite):
+                yield
+        finally:
+            with self._condicion:
+                self._trabajos -= 1
+                self._condicion.notify_all()
+            self._avisar()
+
+    @contextmanager
+    def sin_renders(self, limite=None):
+        """
+        Bloque sin renders (p. ej. para apartar las carpetas de trabajo): los
+        pedidos y trabajos que llegan mientras dura esperan
+
+        Args:
+            limite: Límite entre procesos opcional; si tiene sin_trabajos(),
+                se rechaza también cuando otro proceso tiene un turno o un
+                trabajo, y los otros procesos esperan mientras dura el bloque
+
+        Raises:
+            RendersEnCurso: Si hay renders activos, en cola o trabajos por
+                tramos en curso
+        """
+        with self._condicion:
+            if self._activos or self._cola or self._trabajos:
+                raise RendersEnCurso(f"Hay {len(self._activos)} render(s) en curso, "
+                                     f"{len(self._cola)} en cola y {self._trabajos} "
+                                     f"trabajo(s) por tramos; reintenta al terminar")
+            self._pausas += 1
+        try:
+            sin_trabajos = getattr(limite, 'sin_trabajos', None)
+            with sin_trabajos() if sin_trabajos else nullcontext():
+                yield
+        finally:
+            with self._condicion:
+                self._pausas -= 1
+                self._condicion.notify_all()
+
+    def turnos_por_tramo(self, prioridad='normal', trabajo=None, limite=None):
+        """
+        Función (paginas) -> context manager para el argumento turno_tramo
+        de generar_pdf_reanudable: un turno por cada tramo de páginas. El
+        control de admisión se hace solo en el primer tramo. El trabajo
+        entero va dentro de un bloque trabajo().
+        """
+        admitido = False
+        
+        @contextmanager
+        def turno_tramo(paginas):
+            nonlocal admitido
+            with self.turno(prioridad, paginas, trabajo, limite, admitido):
+                admitido = True
+                yield
+        return turno_tramo
+
+    def resumen(self):
+        """Dict corto para el estado de la UI"""
+        with self._condicion:
+            return {
+                'en_cola': len(self._cola),
+                'renders_activos': len(self._activos),
+                'trabajos_en_curso': self._trabajos,
+                'paginas_en_vuelo': sum(activo.paginas for activo in self._activos)
+            }
+
+    def estadisticas(self):
+        """
+        Returns:
+            Dict con límites, pedidos en cola y activos (con su espera
+            actual) y espera media y máxima reciente por prioridad
+        """
+        with self._condicion:
+            ahora = time.monotonic()
+            cola = sorted(self._cola, key=lambda pedido: pedido.orden(ahora))
+            esperas = {}
+            for prioridad, muestras in self._esperas.items():
+                esperas[prioridad] = {
+                    'en_cola': sum(1 for pedido in cola if pedido.prioridad == prioridad),
+                    'turnos': len(muestras),
+                    'espera_media_s': round(sum(muestras) / len(muestras), 3) if muestras else None,
+                    'espera_maxima_s': round(max(muestras), 3) if muestras else None
+                }
+            return {
+                'limites': {
+                    'renders_simultaneos': self.renders_simultaneos,
+                    'paginas_en_vuelo': self.paginas_en_vuelo,
+                    'cola_maxima': self.cola_maxima
+                },
+                'renders_activos': len(self._activos),
+                'paginas_en_vuelo': sum(activo.paginas for activo in self._activos),
+                'cola': [{'trabajo': pedido.trabajo, 'prioridad': pedido.prioridad,
+                          'paginas': pedido.paginas,
+                          'esperando_s': round(ahora - pedido.llegada, 3)}
+                         for pedido in cola],
+                'activos': [{'trabajo': pedido.trabajo, 'prioridad': pedido.prioridad,
+                             'paginas': pedido.paginas,
+                             'dibujando_s': round(ahora - pedido.inicio, 3)}
+                            for pedido in self._activos],
+                'prioridades': esperas
+            }
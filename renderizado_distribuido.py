@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Renderizado distribuido de planchas
+
+Un coordinador divide el trabajo en fragmentos alineados a página (usando
+FILAS_TOTALES_POR_HOJA), los reparte entre procesos worker por HTTP y une los
+PDFs parciales en orden. Un fragmento que falla se reintenta en otro worker
+sin rehacer el resto del trabajo.
+
+Los workers deben ver las mismas rutas de QRs y logos que el coordinador
+(almacenamiento compartido o montaje de red).
+
+Seguridad del worker:
+- Escucha en 127.0.0.1 salvo que se indique --host
+- Cada pedido lleva el token compartido en el header X-Token-Render
+  (--token o PLANCHAS_TOKEN_RENDER; sin token, el worker genera uno y lo
+  muestra al iniciar)
+- Solo lee archivos dentro de --raiz (por defecto, la carpeta actual)
+
+Uso:
+    # En cada máquina de render
+    PLANCHAS_TOKEN_RENDER=secreto python renderizado_distribuido.py worker \
+        --host 0.0.0.0 --puerto 8101 --raiz /mnt/planchas
+
+    # En el coordinador
+    PLANCHAS_TOKEN_RENDER=secreto python renderizado_distribuido.py coordinar \
+        --workers http://render1:8101,http://render2:8101 \
+        --salida output/planchas_stickers.pdf
+
+    # Prueba en una sola máquina con 4 workers locales
+    python renderizado_distribuido.py coordinar --workers-locales 4
+"""
+
+import argparse
+import hmac
+import json
+import os
+import queue
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from pdf_generator import GeneradorPlanchasPDF, RangosIds, unir_pdfs
+from mapeo_logos import MapeoLogosRangos
+
+
+# Páginas A3 por fragmento enviado a un worker
+PAGINAS_POR_FRAGMENTO = 10
+
+# Intentos por fragmento antes de abortar el trabajo
+REINTENTOS_POR_FRAGMENTO = 3
+
+# Segundos máximos de espera por la respuesta de un fragmento
+TIMEOUT_FRAGMENTO = 900
+
+# Pausa (segundos) antes de volver a usar un worker que falló; se duplica
+# con cada fallo consecutivo hasta ESPERA_MAXIMA_WORKER
+ESPERA_WORKER_FALLIDO = 1
+ESPERA_MAXIMA_WORKER = 60
+
+# Header con el token compartido entre coordinador y workers
+HEADER_TOKEN = 'X-Token-Render'
+
+# Variable de entorno con el token (no va en la línea de comandos de los
+# workers locales, donde la vería cualquier usuario con ps)
+ENV_TOKEN = 'PLANCHAS_TOKEN_RENDER'
+
+# Tamaño máximo del cuerpo JSON de un pedido
+MAXIMO_PEDIDO = 1024 * 1024
+
+
+def dividir_en_fragmentos(qrs_ordenados, paginas_por_fragmento=PAGINAS_POR_FRAGMENTO):
+    """
+    Divide la lista ordenada de QRs en fragmentos que empiezan siempre al
+    comienzo de una página, para que cada worker ubique las filas igual que
+    el trabajo completo
+
+    Args:
+        qrs_ordenados: Lista ordenada de tuplas (numero_id, ruta_qr)
+        paginas_por_fragmento: Páginas A3 por fragmento
+
+    Returns:
+        Lista de dicts {'indice', 'pagina_inicio', 'paginas', 'ids': (inicio, fin)}
+    """
+    filas_por_hoja = GeneradorPlanchasPDF.FILAS_TOTALES_POR_HOJA
+    filas_por_fragmento = max(1, paginas_por_fragmento) * filas_por_hoja
+    fragmentos = []
+
+    for desde in range(0, len(qrs_ordenados), filas_por_fragmento):
+        tramo = qrs_ordenados[desde:desde + filas_por_fragmento]
+        fragmentos.append({
+            'indice': len(fragmentos),
+            'pagina_inicio': desde // filas_por_hoja + 1,
+            'paginas': (len(tramo) + filas_por_hoja - 1) // filas_por_hoja,
+            'ids': (tramo[0][0], tramo[-1][0])
+        })
+
+    return fragmentos
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+class _ManejadorWorker(BaseHTTPRequestHandler):
+    """Atiende pedidos de render de fragmentos (POST /renderizar)"""
+
+    # Un render por proceso a la vez: el trabajo es CPU, no I/O
+    render_lock = threading.Lock()
+
+    def log_message(self, formato, *args):
+        if not self.server.silencioso:
+            super().log_message(formato, *args)
+
+    def _responder_json(self, codigo, datos):
+        cuerpo = json.dumps(datos).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if self.path == '/salud':
+            self._responder_json(200, {'success': True})
+        else:
+            self._responder_json(404, {'success': False, 'error': 'Ruta no encontrada'})
+
+    def do_POST(self):
+        if self.path != '/renderizar':
+            self._responder_json(404, {'success': False, 'error': 'Ruta no encontrada'})
+            return
+
+        token = self.headers.get(HEADER_TOKEN, '')
+        if not hmac.compare_digest(token.encode('utf-8'), self.server.token.encode('utf-8')):
+            self._responder_json(401, {'success': False, 'error': 'Token inválido'})
+            return
+
+        try:
+            largo = int(self.headers.get('Content-Length', 0))
+            if largo > MAXIMO_PEDIDO:
+                self._responder_json(413, {'success': False, 'error': 'Pedido demasiado grande'})
+                return
+            pedido = json.loads(self.rfile.read(largo))
+            pdf = renderizar_fragmento(pedido, self.server.raiz)
+        except PermissionError as e:
+            self._responder_json(403, {'success': False, 'error': str(e)})
+            return
+        except Exception as e:
+            self._responder_json(500, {'success': False, 'error': str(e)})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(pdf)))
+        self.end_headers()
+        self.wfile.write(pdf)
+
+
+def _ruta_permitida(ruta, raiz):
+    """
+    Ruta del pedido resuelta dentro de raiz (las relativas, respecto de raiz)
+
+    Raises:
+        PermissionError: Si la ruta (o su destino, si es un enlace) queda fuera
+    """
+    raiz = Path(raiz).resolve()
+    resuelta = (raiz / ruta).resolve()
+    if not resuelta.is_relative_to(raiz):
+        raise PermissionError(f"Ruta fuera de la raíz del worker: {ruta}")
+    return resuelta
+
+
+def renderizar_fragmento(pedido, raiz='.'):
+    """
+    Renderiza un fragmento a partir del pedido JSON de un coordinador
+
+    Args:
+        pedido: Dict con carpeta_qrs, logo_principal, rangos_logos
+            ([[inicio, fin, ruta], ...]), ids ([inicio, fin]) y
+            reservar_huecos (opcional)
+        raiz: Carpeta fuera de la cual no se lee ningún archivo
+
+    Returns:
+        Bytes del PDF parcial
+
+    Raises:
+        PermissionError: Si alguna ruta del pedido queda fuera de raiz
+    """
+    mapeo = MapeoLogosRangos()
+    for inicio, fin, ruta in pedido.get('rangos_logos', []):
+        mapeo.asignar(int(inicio), int(fin), str(_ruta_permitida(ruta, raiz)))
+
+    generador = GeneradorPlanchasPDF(
+        carpeta_qrs=_ruta_permitida(pedido['carpeta_qrs'], raiz),
+        logo_principal=_ruta_permitida(pedido['logo_principal'], raiz),
+        logos_especiales=mapeo,
+        reservar_huecos=bool(pedido.get('reservar_huecos'))
+    )
+    inicio, fin = pedido['ids']
+
+    with _ManejadorWorker.render_lock, tempfile.TemporaryDirectory() as carpeta:
+        archivo = Path(carpeta) / 'fragmento.pdf'
+        generador.generar_pdf(str(archivo), verbose=False,
+                              ids=RangosIds([(int(inicio), int(fin))]))
+        return archivo.read_bytes()
+
+
+def iniciar_worker(puerto, host='127.0.0.1', silencioso=False, token=None, raiz='.'):
+    """
+    Inicia un worker HTTP y atiende pedidos hasta que se interrumpa
+
+    Args:
+        puerto: Puerto TCP
+        host: Dirección donde escuchar (0.0.0.0 para otras máquinas)
+        silencioso: Si True, no muestra mensajes ni el log de pedidos
+        token: Token compartido que deben enviar los coordinadores (None =
+            PLANCHAS_TOKEN_RENDER, o uno aleatorio que se muestra)
+        raiz: Carpeta fuera de la cual no se lee ningún archivo
+    """
+    token = token or os.environ.get(ENV_TOKEN)
+    generado = not token
+    if generado:
+        token = secrets.token_urlsafe(24)
+
+    servidor = ThreadingHTTPServer((host, puerto), _ManejadorWorker)
+    servidor.silencioso = silencioso
+    servidor.token = token
+    servidor.raiz = str(Path(raiz).resolve())
+    if not silencioso:
+        print(f"🛠️  Worker de render escuchando en http://{host}:{puerto}")
+        print(f"   Raíz: {servidor.raiz}")
+        if generado:
+            print(f"   Token (usar {ENV_TOKEN} en el coordinador): {token}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+def _puerto_libre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar_worker(url, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(f"{url}/salud", timeout=2):
+                return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    return False
+
+
+def iniciar_workers_locales(cantidad, token, raiz='.'):
+    """
+    Lanza workers en procesos locales (localhost) para pruebas o para
+    aprovechar todos los núcleos de una sola máquina
+
+    Args:
+        cantidad: Workers a lanzar
+        token: Token compartido (se pasa por entorno, no por argumentos)
+        raiz: Raíz de archivos de los workers
+
+    Returns:
+        Tupla (procesos, urls)
+    """
+    procesos = []
+    urls = []
+    entorno = {**os.environ, ENV_TOKEN: token}
+    for _ in range(cantidad):
+        puerto = _puerto_libre()
+        procesos.append(subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), 'worker',
+             '--host', '127.0.0.1', '--puerto', str(puerto), '--raiz', str(raiz),
+             '--silencioso'],
+            env=entorno
+        ))
+        urls.append(f"http://127.0.0.1:{puerto}")
+
+    for url in urls:
+        if not _esperar_worker(url):
+            detener_workers_locales(procesos)
+            raise RuntimeError(f"El worker local {url} no respondió")
+
+    return procesos, urls
+
+
+def detener_workers_locales(procesos):
+    """Termina los procesos worker lanzados con iniciar_workers_locales"""
+    for proceso in procesos:
+        proceso.terminate()
+    for proceso in procesos:
+        try:
+            proceso.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+
+
+# ---------------------------------------------------------------------------
+# Coordinador
+# ---------------------------------------------------------------------------
+
+class CoordinadorRenderizado:
+    """Reparte un trabajo de planchas entre varios workers y une el resultado"""
+
+    def __init__(self, workers, carpeta_qrs="qrs", logo_principal="logo.png",
+                 logos_especiales=None, paginas_por_fragmento=PAGINAS_POR_FRAGMENTO,
+                 reintentos=REINTENTOS_POR_FRAGMENTO, reservar_huecos=False, token=None):
+        """
+        Inicializa el coordinador
+
+        Args:
+            workers: Lista de URLs base de los workers (http://host:puerto)
+            carpeta_qrs: Ruta a la carpeta con los archivos QR
+            logo_principal: Ruta al logo por defecto
+            logos_especiales: MapeoLogosRangos o dict {id_numero: ruta_logo}
+            paginas_por_fragmento: Páginas A3 por fragmento
+            reintentos: Intentos por fragmento antes de abortar
+            reservar_huecos: Si True, los IDs faltantes quedan en blanco y
+                cada página corresponde a un bloque fijo de IDs
+            token: Token compartido con los workers (None = PLANCHAS_TOKEN_RENDER)
+        """
+        if not workers:
+            raise ValueError("Se necesita al menos un worker")
+
+        self.workers = list(workers)
+        self.generador = GeneradorPlanchasPDF(carpeta_qrs, logo_principal, logos_especiales,
+                                              reservar_huecos)
+        self.paginas_por_fragmento = paginas_por_fragmento
+        self.reintentos = reintentos
+        self.token = token or os.environ.get(ENV_TOKEN, '')
+        self._fallos = {}
+        self._fallos_lock = threading.Lock()
+
+    def _pedido(self, fragmento):
+        return {
+            'carpeta_qrs': str(Path(self.generador.carpeta_qrs).resolve()),
+            'logo_principal': str(Path(self.generador.logo_principal).resolve()),
+            'rangos_logos': [
+                [inicio, fin, str(Path(ruta).resolve())]
+                for inicio, fin, ruta in self.generador.logos_especiales.rangos()
+            ],
+            'ids': list(fragmento['ids']),
+            'reservar_huecos': self.generador.reservar_huecos
+        }
+
+    def _enviar(self, url, fragmento):
+        cuerpo = json.dumps(self._pedido(fragmento)).encode('utf-8')
+        solicitud = urllib.request.Request(
+            f"{url}/renderizar", data=cuerpo,
+            headers={'Content-Type': 'application/json', HEADER_TOKEN: self.token},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(solicitud, timeout=TIMEOUT_FRAGMENTO) as respuesta:
+                return respuesta.read()
+        except urllib.error.HTTPError as e:
+            try:
+                detalle = json.loads(e.read()).get('error', e.reason)
+            except ValueError:
+                detalle = e.reason
+            raise RuntimeError(f"{url}: {detalle}")
+
+    def _devolver_worker(self, url, disponibles, fallo):
+        """
+        Devuelve un worker a la cola de libres. Si falló, queda fuera de
+        rotación un tiempo creciente para que los fragmentos se reintenten
+        en los workers sanos.
+        """
+        with self._fallos_lock:
+            fallos = self._fallos.get(url, 0) + 1 if fallo else 0
+            self._fallos[url] = fallos
+
+        if not fallo:
+            disponibles.put(url)
+            return
+
+        espera = min(ESPERA_WORKER_FALLIDO * 2 ** (fallos - 1), ESPERA_MAXIMA_WORKER)
+        temporizador = threading.Timer(espera, disponibles.put, [url])
+        temporizador.daemon = True
+        temporizador.start()
+
+    def _procesar(self, fragmento, disponibles, carpeta, verbose):
+        """Renderiza un fragmento reintentando en otro worker si falla"""
+        ultimo_error = None
+        for intento in range(1, self.reintentos + 1):
+            url = disponibles.get()
+            try:
+                pdf = self._enviar(url, fragmento)
+            except Exception as e:
+                self._devolver_worker(url, disponibles, fallo=True)
+                ultimo_error = e
+                if verbose:
+                    print(f"   ⚠️  Fragmento {fragmento['indice'] + 1} falló en {url} "
+                          f"(intento {intento}/{self.reintentos}): {e}")
+                continue
+
+            self._devolver_worker(url, disponibles, fallo=False)
+            parte = Path(carpeta) / f"parte_{fragmento['indice']:05d}.pdf"
+            parte.write_bytes(pdf)
+            if verbose:
+                paginas = fragmento['pagina_inicio'] + fragmento['paginas'] - 1
+                print(f"   ✓ Páginas {fragmento['pagina_inicio']}-{paginas} completadas ({url})")
+            return parte, intento - 1
+
+        raise RuntimeError(
+            f"El fragmento {fragmento['indice'] + 1} (IDs {fragmento['ids'][0]}-"
+            f"{fragmento['ids'][1]}) falló {self.reintentos} veces: {ultimo_error}"
+        )
+
+    def generar_pdf(self, archivo_salida="planchas_stickers.pdf", verbose=True):
+        """
+        Genera el PDF completo repartiendo los fragmentos entre los workers
+
+        Returns:
+            Tuple (ruta_pdf, estadisticas_dict)
+        """
+        advertencias = self.generador.validar_archivos()
+        filas = self.generador.obtener_filas()
+        fragmentos = dividir_en_fragmentos(filas, self.paginas_por_fragmento)
+        total_qrs = len(self.generador.qrs_ordenados)
+
+        if verbose:
+            print(f"📄 Generando PDF distribuido: {len(fragmentos)} fragmento(s) "
+                  f"en {len(self.workers)} worker(s)...")
+
+        # Cola de workers libres: cada worker procesa un fragmento a la vez
+        disponibles = queue.Queue()
+        for url in self.workers:
+            disponibles.put(url)
+
+        carpeta = tempfile.mkdtemp(prefix='planchas_fragmentos_',
+                                   dir=Path(archivo_salida).resolve().parent)
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.workers)) as pool:
+                resultados = list(pool.map(
+                    lambda f: self._procesar(f, disponibles, carpeta, verbose),
+                    fragmentos
+                ))
+
+            partes = [parte for parte, _ in resultados]
+            total_paginas = unir_pdfs(partes, archivo_salida)
+        finally:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+        estadisticas = {
+            'total_paginas': total_paginas,
+            'total_filas': total_qrs,
+            'total_logos': total_qrs * 2,
+            'total_qrs': total_qrs * 2,
+            'filas_por_pagina': GeneradorPlanchasPDF.FILAS_TOTALES_POR_HOJA,
+            'logos_especiales': len(self.generador.logos_especiales),
+            'ids_faltantes': sum(fin - inicio + 1 for inicio, fin in self.generador.huecos),
+            'ids_repetidos': len(self.generador.duplicados),
+            'filas_en_blanco': len(filas) - total_qrs,
+            'advertencias': advertencias,
+            'fragmentos': len(fragmentos),
+            'reintentos': sum(reintentos for _, reintentos in resultados)
+        }
+
+        if verbose:
+            print(f"\n✅ PDF generado exitosamente: {archivo_salida}")
+            print(f"   Total de páginas: {total_paginas}")
+            print(f"   Reintentos: {estadisticas['reintentos']}")
+
+        return archivo_salida, estadisticas
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Renderizado distribuido de planchas")
+    subparsers = parser.add_subparsers(dest='modo', required=True)
+
+    worker = subparsers.add_parser('worker', help="Atiende pedidos de render")
+    worker.add_argument('--host', default='127.0.0.1',
+                        help="Dirección donde escuchar (0.0.0.0 para otras máquinas)")
+    worker.add_argument('--puerto', type=int, default=8101)
+    worker.add_argument('--token', help=f"Token compartido (por defecto, {ENV_TOKEN})")
+    worker.add_argument('--raiz', default='.',
+                        help="Carpeta fuera de la cual no se lee ningún archivo")
+    worker.add_argument('--silencioso', action='store_true')
+
+    coordinar = subparsers.add_parser('coordinar', help="Reparte un trabajo entre workers")
+    coordinar.add_argument('--workers', default='',
+                           help="URLs de workers separadas por comas")
+    coordinar.add_argument('--workers-locales', type=int, default=0,
+                           help="Lanzar N workers en esta máquina")
+    coordinar.add_argument('--qrs', default='qrs')
+    coordinar.add_argument('--logo', default='logo.png')
+    coordinar.add_argument('--mapeo', default='logos_especiales_mapeo.json')
+    coordinar.add_argument('--salida', default='output/planchas_stickers.pdf')
+    coordinar.add_argument('--paginas-por-fragmento', type=int, default=PAGINAS_POR_FRAGMENTO)
+    coordinar.add_argument('--reintentos', type=int, default=REINTENTOS_POR_FRAGMENTO)
+    coordinar.add_argument('--reservar-huecos', action='store_true',
+                           help="Dejar en blanco las filas de IDs faltantes")
+    coordinar.add_argument('--token', help=f"Token de los workers (por defecto, {ENV_TOKEN})")
+
+    args = parser.parse_args()
+
+    if args.modo == 'worker':
+        iniciar_worker(args.puerto, args.host, args.silencioso, args.token, args.raiz)
+        return 0
+
+    workers = [url.strip().rstrip('/') for url in args.workers.split(',') if url.strip()]
+    token = args.token or os.environ.get(ENV_TOKEN)
+    procesos = []
+    try:
+        logos_especiales = MapeoLogosRangos.cargar(args.mapeo)
+        if args.workers_locales:
+            # Sin token para los workers remotos, los locales usan uno propio;
+            # su raíz es la carpeta común a todos los archivos del trabajo
+            token = token or secrets.token_urlsafe(24)
+            raiz = os.path.commonpath([
+                str(Path(ruta).resolve())
+                for ruta in [args.qrs, Path(args.logo).parent]
+                + [Path(ruta).parent for _, _, ruta in logos_especiales.rangos()]
+            ])
+            procesos, urls = iniciar_workers_locales(args.workers_locales, token, raiz)
+            workers.extend(urls)
+
+        coordinador = CoordinadorRenderizado(
+            workers,
+            carpeta_qrs=args.qrs,
+            logo_principal=args.logo,
+            logos_especiales=logos_especiales,
+            paginas_por_fragmento=args.paginas_por_fragmento,
+            reintentos=args.reintentos,
+            reservar_huecos=args.reservar_huecos,
+            token=token
+        )
+        coordinador.generar_pdf(args.salida)
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        return 1
+    finally:
+        detener_workers_locales(procesos)
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
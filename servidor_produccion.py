@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor de producción para la WebApp
+Gunicorn con varios procesos (prefork) y varios hilos por proceso
+
+- El motor PDF (pdf_generator + reportlab) se carga una sola vez en el
+  proceso maestro y los workers lo heredan al hacer fork
+- El límite de renders simultáneos es compartido por todos los workers
+  (candados de archivo creados antes del fork; un worker que muere a mitad
+  de un render libera su lugar)
+- Timeouts dimensionados para renders largos
+
+Uso:
+    python servidor_produccion.py
+    python servidor_produccion.py --workers 8 --threads 4 --renders 2
+
+Cada opción también se puede fijar por variable de entorno
+(PLANCHAS_WORKERS, PLANCHAS_THREADS, PLANCHAS_RENDERS, PLANCHAS_BIND, ...).
+"""
+
+import argparse
+import multiprocessing
+import os
+
+
+def _entero_env(nombre, defecto):
+    valor = os.environ.get(nombre)
+    return int(valor) if valor else defecto
+
+
+# Valores por defecto
+WORKERS = _entero_env('PLANCHAS_WORKERS', multiprocessing.cpu_count())
+THREADS = _entero_env('PLANCHAS_THREADS', 4)
+RENDERS_SIMULTANEOS = _entero_env('PLANCHAS_RENDERS', max(1, multiprocessing.cpu_count() // 2))
+KEEPALIVE = _entero_env('PLANCHAS_KEEPALIVE', 5)
+# Un render de cientos de páginas puede tardar varios minutos
+TIMEOUT = _entero_env('PLANCHAS_TIMEOUT', 1800)
+GRACEFUL_TIMEOUT = _entero_env('PLANCHAS_GRACEFUL_TIMEOUT', 120)
+BIND = os.environ.get('PLANCHAS_BIND', '0.0.0.0:5000')
+
+
+def precargar_motor():
+    """
+    Importa el motor PDF y sus dependencias pesadas en el proceso actual,
+    para que los workers creados por fork ya las tengan en memoria
+    """
+    import pdf_generator  # noqa: F401
+    from reportlab.pdfgen import canvas  # noqa: F401
+    from reportlab.lib.utils import ImageReader  # noqa: F401
+    try:
+        from PIL import Image  # noqa: F401
+    except ImportError:
+        pass
+
+
+def crear_aplicacion(renders_simultaneos=RENDERS_SIMULTANEOS, hilos=THREADS):
+    """
+    Importa la app Flask y le asigna el límite de renders compartido
+
+    Args:
+        renders_simultaneos: Renders a la vez entre todos los workers
+        hilos: Hilos por worker; /api/eventos usa como mucho la mitad, así
+            las pestañas abiertas no dejan sin hilos al resto de los requests
+
+    Returns:
+        Aplicación WSGI
+    """
+    precargar_motor()
+    import app as webapp
+
+    from planificador_renders import LimiteEntreProcesos
+
+    webapp.limite_renders = LimiteEntreProcesos(renders_simultaneos)
+    webapp.app.config['SSE_CONEXIONES_MAXIMAS'] = hilos // 2
+    return webapp.app
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Servidor de producción de la WebApp")
+    parser.add_argument('--bind', default=BIND, help="Dirección host:puerto")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="Procesos worker")
+    parser.add_argument('--threads', type=int, default=THREADS, help="Hilos por worker")
+    parser.add_argument('--renders', type=int, default=RENDERS_SIMULTANEOS,
+                        help="Renders simultáneos entre todos los workers")
+    parser.add_argument('--keepalive', type=int, default=KEEPALIVE,
+                        help="Segundos de keep-alive")
+    parser.add_argument('--timeout', type=int, default=TIMEOUT,
+                        help="Segundos máximos por request (renders largos)")
+    parser.add_argument('--graceful-timeout', type=int, default=GRACEFUL_TIMEOUT)
+    args = parser.parse_args()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("❌ Para el servidor de producción instala gunicorn: pip install gunicorn")
+        return 1
+
+    class ServidorProduccion(BaseApplication):
+        """Aplicación gunicorn configurada desde código"""
+
+        def __init__(self, aplicacion, opciones):
+            self.aplicacion = aplicacion
+            self.opciones = opciones
+            super().__init__()
+
+        def load_config(self):
+            for clave, valor in self.opciones.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            return self.aplicacion
+
+    opciones = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'keepalive': args.keepalive,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'preload_app': True,
+    }
+
+    print("=" * 70)
+    print("🚀 GENERADOR DE PLANCHAS DE STICKERS - SERVIDOR DE PRODUCCIÓN")
+    print("=" * 70)
+    print(f"\n📍 Escuchando en: http://{args.bind}")
+    print(f"   Workers: {args.workers} × {args.threads} hilos")
+    print(f"   Renders simultáneos: {args.renders}")
+    print(f"   Conexiones de eventos (SSE) por worker: {args.threads // 2} "
+          f"(para muchas pestañas abiertas usa app_asgi.py)")
+    print(f"   Timeout: {args.timeout}s | Keep-alive: {args.keepalive}s")
+    print("\n💡 Presiona Ctrl+C para detener el servidor\n")
+    print("=" * 70)
+
+    # La app (y el motor PDF) se cargan aquí, antes del fork de los workers
+    ServidorProduccion(crear_aplicacion(args.renders, args.threads), opciones).run()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
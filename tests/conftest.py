@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures comunes de las pruebas
+
+Los módulos del proyecto están en la raíz del repositorio (sin paquete):
+se agrega esa carpeta al path para importarlos como lo hacen los scripts.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+
+def crear_qr(ruta, semilla=0, lado=42):
+    """
+    PNG en blanco y negro con un patrón de cuadros que depende de semilla
+    (dos semillas distintas dan imágenes distintas del mismo tamaño)
+    """
+    imagen = Image.new('L', (lado, lado), 255)
+    celda = 6
+    for y in range(0, lado, celda):
+        for x in range(0, lado, celda):
+            if (x // celda * 7 + y // celda * 3 + semilla) % 5 < 2:
+                imagen.paste(0, (x, y, x + celda, y + celda))
+    imagen.save(ruta)
+    return Path(ruta)
+
+
+def crear_logo(ruta, color=(200, 30, 30), lado=60):
+    """PNG RGBA de un color sólido"""
+    Image.new('RGBA', (lado, lado), color + (255,)).save(ruta)
+    return Path(ruta)
+
+
+@pytest.fixture
+def trabajo(tmp_path):
+    """
+    Carpeta de trabajo con logo.png y qrs/whokey-001.png ... whokey-060.png
+    (60 filas: 3 páginas de 28 filas)
+
+    Returns:
+        Función (cantidad=60) -> Tupla (carpeta_qrs, logo)
+    """
+    def crear(cantidad=60):
+        carpeta_qrs = tmp_path / 'qrs'
+        carpeta_qrs.mkdir()
+        for numero in range(1, cantidad + 1):
+            crear_qr(carpeta_qrs / f"whokey-{numero:03d}.png", semilla=numero)
+        return carpeta_qrs, crear_logo(tmp_path / 'logo.png')
+
+    return crear
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Escritura atómica de subidas y contador incremental de archivos"""
+
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import almacenamiento
+from almacenamiento import ContadorArchivos, _publicar, guardar_lote
+from conftest import RAIZ
+
+
+def _temporal(carpeta, contenido):
+    ruta = carpeta / f".subida.{len(os.listdir(carpeta))}.tmp"
+    ruta.write_bytes(contenido)
+    return ruta
+
+
+@pytest.fixture
+def sin_hardlinks(monkeypatch):
+    def link(*args, **kwargs):
+        raise OSError(1, "Operación no permitida")
+    monkeypatch.setattr(almacenamiento.os, 'link', link)
+
+
+def test_publicar_nuevo_y_reemplazo(tmp_path):
+    destino = tmp_path / 'whokey-001.png'
+
+    assert _publicar(_temporal(tmp_path, b'uno'), destino) is True
+    assert _publicar(_temporal(tmp_path, b'dos'), destino) is False
+
+    assert destino.read_bytes() == b'dos'
+    # No quedan temporales
+    assert os.listdir(tmp_path) == ['whokey-001.png']
+
+
+def test_publicar_sin_hardlinks(tmp_path, sin_hardlinks):
+    destino = tmp_path / 'whokey-001.png'
+
+    assert _publicar(_temporal(tmp_path, b'uno'), destino) is True
+    assert _publicar(_temporal(tmp_path, b'dos'), destino) is False
+
+    assert destino.read_bytes() == b'dos'
+    assert os.listdir(tmp_path) == ['whokey-001.png']
+
+
+@pytest.mark.parametrize('deduplicar', [False, True])
+def test_subidas_simultaneas_del_mismo_nombre(tmp_path, deduplicar):
+    carpeta = tmp_path / 'qrs'
+    carpeta.mkdir()
+    almacen = carpeta / '.objetos' if deduplicar else None
+    contenidos = [f"contenido {i}".encode() * 1000 for i in range(16)]
+    barrera = threading.Barrier(len(contenidos))
+    creados = []
+
+    def subir(contenido):
+        barrera.wait()
+        creados.append(guardar_lote([('whokey-001.png', contenido)], carpeta,
+                                    almacen=almacen)[2])
+
+    hilos = [threading.Thread(target=subir, args=(c,)) for c in contenidos]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    # Un solo alta; el archivo final es una de las subidas completa
+    assert sum(creados) == 1
+    assert (carpeta / 'whokey-001.png').read_bytes() in contenidos
+    assert [n for n in os.listdir(carpeta) if n.startswith('.whokey')] == []
+
+
+def test_contador_tras_altas_y_reemplazos(tmp_path):
+    contador = ContadorArchivos(tmp_path, 'whokey-*.png')
+    assert contador.total() == 0
+
+    _, errores, creados = guardar_lote([('whokey-001.png', b'a'), ('whokey-002.png', b'b')],
+                                       tmp_path)
+    contador.sumar(creados)
+    assert (errores, contador.total()) == ([], 2)
+
+    # Reemplazar un QR existente no suma
+    _, _, creados = guardar_lote([('whokey-002.png', b'otro'), ('whokey-003.png', b'c')],
+                                 tmp_path, almacen=tmp_path / '.objetos')
+    contador.sumar(creados)
+    assert creados == 1
+    assert contador.total() == len(list(tmp_path.glob('whokey-*.png'))) == 3
+
+    contador.reiniciar()
+    assert contador.total() == 3
+
+
+def test_contador_de_la_app_con_subidas_simultaneas(tmp_path, monkeypatch):
+    import app as webapp
+
+    monkeypatch.chdir(tmp_path)
+    webapp.contador_qrs.reiniciar()
+    assert webapp.contador_qrs.total() == 0
+
+    barrera = threading.Barrier(8)
+
+    def subir(i):
+        barrera.wait()
+        webapp.guardar_qrs({'whokey-001.png': b'x' * (i + 1),
+                            f"whokey-{i + 10:03d}.png": b'y'})
+
+    hilos = [threading.Thread(target=subir, args=(i,)) for i in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert webapp.contador_qrs.total() == len(list((tmp_path / 'qrs').glob('whokey-*.png'))) == 9
+    webapp.contador_qrs.reiniciar()
+
+
+def test_importar_no_carga_el_pool():
+    codigo = ("import sys, mapeo_logos, almacenamiento; "
+              "print('concurrent.futures' in sys.modules)")
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True,
+                            text=True, check=True).stdout
+    assert salida.strip() == 'False'
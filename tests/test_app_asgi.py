@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Modo ASGI: subida de QRs en streaming y puente a los handlers Flask"""
+
+import asyncio
+import json
+
+import pytest
+
+import app as webapp
+import app_asgi
+from conftest import crear_qr
+
+LIMITE = b'----limite-de-prueba'
+
+
+@pytest.fixture
+def carpeta(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(webapp, '_carpetas_creadas', False)
+    webapp.contador_qrs.reiniciar()
+    yield tmp_path
+    webapp.contador_qrs.reiniciar()
+
+
+def _multipart(archivos):
+    partes = []
+    for nombre, contenido in archivos:
+        partes.append(b'--' + LIMITE + b'\r\n'
+                      b'Content-Disposition: form-data; name="files[]"; filename="'
+                      + nombre.encode() + b'"\r\nContent-Type: image/png\r\n\r\n'
+                      + contenido + b'\r\n')
+    return b''.join(partes) + b'--' + LIMITE + b'--\r\n'
+
+
+def _pedir(metodo, ruta, cuerpo=b'', headers=(), tamano_bloque=None):
+    """
+    Ejecuta un request contra asgi_app (el cuerpo llega en bloques)
+
+    Returns:
+        Tupla (status, cuerpo_respuesta)
+    """
+    tamano_bloque = tamano_bloque or max(1, len(cuerpo))
+    bloques = [cuerpo[i:i + tamano_bloque] for i in range(0, len(cuerpo), tamano_bloque)] or [b'']
+    mensajes = [{'type': 'http.request', 'body': bloque, 'more_body': i < len(bloques) - 1}
+                for i, bloque in enumerate(bloques)]
+    enviados = []
+
+    async def receive():
+        if mensajes:
+            return mensajes.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    scope = {'type': 'http', 'method': metodo, 'path': ruta, 'query_string': b'',
+             'headers': [(k.encode(), v.encode()) for k, v in headers]}
+    asyncio.run(app_asgi.asgi_app(scope, receive, send))
+    status = next(m['status'] for m in enviados if m['type'] == 'http.response.start')
+    return status, b''.join(m.get('body', b'') for m in enviados
+                            if m['type'] == 'http.response.body')
+
+
+def _subir(cuerpo, tamano_bloque=None):
+    return _pedir('POST', '/api/upload-qrs', cuerpo,
+                  [('content-type', f"multipart/form-data; boundary={LIMITE.decode()}")],
+                  tamano_bloque)
+
+
+def test_subida_en_bloques_chicos(carpeta, monkeypatch):
+    # Lotes de 2: varias escrituras mientras se sigue leyendo el cuerpo
+    monkeypatch.setattr(app_asgi, 'TAMANO_LOTE_FSYNC', 2)
+    archivos = [(f"whokey-{n:03d}.png", crear_qr(carpeta / f"{n}.png", semilla=n).read_bytes())
+                for n in range(1, 6)]
+    archivos.insert(2, ('foto.png', b'no es un QR'))
+
+    status, cuerpo = _subir(_multipart(archivos), tamano_bloque=97)
+
+    respuesta = json.loads(cuerpo)
+    assert status == 200
+    assert (respuesta['uploaded'], respuesta['total_qrs']) == (5, 5)
+    assert respuesta['errors'] == ['foto.png: debe seguir el formato whokey-NNN.png']
+    for nombre, contenido in archivos:
+        if nombre.startswith('whokey-'):
+            assert (carpeta / 'qrs' / nombre).read_bytes() == contenido
+
+
+def test_subida_sin_archivos_y_demasiado_grande(carpeta, monkeypatch):
+    assert _pedir('POST', '/api/upload-qrs', b'x')[0] == 400
+    assert _subir(b'--' + LIMITE + b'--\r\n')[0] == 400
+
+    monkeypatch.setitem(webapp.app.config, 'MAX_CONTENT_LENGTH', 100)
+    status, _ = _subir(_multipart([('whokey-001.png', b'x' * 500)]), tamano_bloque=64)
+    assert status == 413
+    assert not (carpeta / 'qrs' / 'whokey-001.png').exists()
+
+
+def test_rutas_flask_por_el_puente(carpeta):
+    _subir(_multipart([('whokey-007.png', crear_qr(carpeta / '7.png').read_bytes())]))
+
+    status, cuerpo = _pedir('GET', '/api/status')
+
+    assert status == 200
+    assert json.loads(cuerpo)['qrs_count'] == 1
+    assert _pedir('GET', '/api/no-existe')[0] == 404
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Caché de logos decodificados: ida y vuelta por mmap y recorte de las menos usadas"""
+
+import os
+import zlib
+
+import pytest
+from PIL import Image
+
+import cache_imagenes
+from cache_imagenes import CacheImagenes, preparar_imagen
+from conftest import crear_logo, crear_qr
+
+
+@pytest.fixture
+def carpeta_cache(tmp_path):
+    return tmp_path / 'cache'
+
+
+def test_ida_y_vuelta_con_alfa(tmp_path, carpeta_cache):
+    ruta = tmp_path / 'logo.png'
+    original = Image.new('RGBA', (30, 20), (10, 120, 200, 255))
+    original.paste((0, 0, 0, 0), (0, 0, 10, 20))
+    original.save(ruta)
+
+    imagen = CacheImagenes(carpeta_cache).obtener(ruta)
+
+    assert (imagen.ancho, imagen.alto, imagen.espacio) == (30, 20, 'DeviceRGB')
+    assert zlib.decompress(imagen.datos) == original.convert('RGB').tobytes()
+    assert zlib.decompress(imagen.alfa) == original.getchannel('A').tobytes()
+    assert oct(carpeta_cache.stat().st_mode & 0o777) == oct(0o700)
+
+    # Otro proceso (otra instancia) la abre sin volver a prepararla
+    otra = CacheImagenes(carpeta_cache)
+    assert otra.obtener(ruta).clave == imagen.clave
+    assert (otra.preparadas, otra.reutilizadas) == (0, 1)
+
+
+def test_gris_opaco_sin_mascara(tmp_path, carpeta_cache):
+    ruta = crear_qr(tmp_path / 'qr.png')
+
+    imagen = CacheImagenes(carpeta_cache).obtener(ruta)
+
+    assert (imagen.espacio, imagen.alfa) == ('DeviceGray', None)
+    assert zlib.decompress(imagen.datos) == Image.open(ruta).convert('L').tobytes()
+
+
+def test_recorta_las_menos_usadas(tmp_path, carpeta_cache):
+    rutas = [crear_qr(tmp_path / f"logo-{i}.png", semilla=i, lado=120) for i in range(3)]
+    tamanos = [len(preparar_imagen(ruta)) for ruta in rutas]
+    cache = CacheImagenes(carpeta_cache, presupuesto=tamanos[1] + tamanos[2])
+
+    claves = [cache.obtener(ruta).clave for ruta in rutas[:2]]
+    # La primera es la menos usada
+    os.utime(carpeta_cache / f"{claves[0]}.img", (1, 1))
+    nueva = cache.obtener(rutas[2])
+
+    assert sorted(p.stem for p in carpeta_cache.glob('*.img')) == sorted([claves[1], nueva.clave])
+    # La recortada se vuelve a preparar al pedirla (otro proceso no la tiene abierta)
+    otra = CacheImagenes(carpeta_cache, presupuesto=sum(tamanos))
+    otra.obtener(rutas[0])
+    assert otra.preparadas == 1
+
+
+def test_olvida_las_abiertas_menos_usadas(tmp_path, carpeta_cache, monkeypatch):
+    monkeypatch.setattr(cache_imagenes, 'MAXIMO_ABIERTAS', 2)
+    rutas = [crear_logo(tmp_path / f"logo-{i}.png", color=(i * 40, 0, 0)) for i in range(3)]
+    cache = CacheImagenes(carpeta_cache)
+
+    for ruta in rutas + rutas[1:]:
+        cache.obtener(ruta)
+
+    assert [firma[0] for firma in cache._abiertas] == [str(rutas[1]), str(rutas[2])]
+    assert (cache.preparadas, cache.reutilizadas) == (3, 0)
+
+
+def test_entrada_danada_se_vuelve_a_preparar(tmp_path, carpeta_cache):
+    ruta = crear_logo(tmp_path / 'logo.png')
+    clave = CacheImagenes(carpeta_cache).obtener(ruta).clave
+    (carpeta_cache / f"{clave}.img").write_bytes(b'PLIMG1\n\xff')
+
+    cache = CacheImagenes(carpeta_cache)
+    imagen = cache.obtener(ruta)
+
+    assert cache.preparadas == 1
+    assert (imagen.ancho, imagen.alto) == (60, 60)
+
+
+def test_jpeg_y_carpeta_compartida_no_usan_la_cache(tmp_path, carpeta_cache):
+    jpeg = tmp_path / 'logo.jpg'
+    Image.new('RGB', (10, 10), (1, 2, 3)).save(jpeg)
+    assert CacheImagenes(carpeta_cache).obtener(jpeg) is None
+
+    carpeta_cache.mkdir(exist_ok=True)
+    carpeta_cache.chmod(0o777)
+    assert CacheImagenes(carpeta_cache).obtener(crear_logo(tmp_path / 'logo.png')) is None
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Descarga del PDF: ETag, 304 y rangos de bytes (Range / If-Range)"""
+
+import os
+
+import pytest
+
+import app as webapp
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(webapp.app.config, 'OUTPUT_FOLDER', str(tmp_path / 'output'))
+    monkeypatch.setitem(webapp.app.config, 'PRECOMPRIMIR_DESCARGAS', False)
+    (tmp_path / 'output').mkdir()
+    return webapp.app.test_client()
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    """PDF registrado como lo deja /api/generate-pdf"""
+    ruta = tmp_path / 'output' / 'planchas_stickers.pdf'
+    ruta.write_bytes(b'%PDF-1.3\n' + bytes(range(256)) * 40)
+    webapp._registrar_pdf(ruta, 'huella-de-prueba')
+    return ruta
+
+
+def test_sin_pdf(cliente):
+    assert cliente.get('/api/download-pdf').status_code == 404
+
+
+def test_etag_y_304(cliente, pdf):
+    respuesta = cliente.get('/api/download-pdf')
+
+    assert respuesta.status_code == 200
+    assert respuesta.data == pdf.read_bytes()
+    etag = respuesta.headers['ETag']
+    assert etag.strip('"') == webapp._etag_pdf(pdf)
+    assert 'no-cache' in respuesta.headers['Cache-Control']
+
+    revalidada = cliente.get('/api/download-pdf', headers={'If-None-Match': etag})
+    assert revalidada.status_code == 304
+    assert revalidada.data == b''
+
+
+def test_etag_cambia_con_otro_pdf(cliente, pdf):
+    etag = cliente.get('/api/download-pdf').headers['ETag']
+
+    pdf.write_bytes(pdf.read_bytes() + b'%%EOF\n')
+    webapp._registrar_pdf(pdf, 'otra-huella')
+
+    respuesta = cliente.get('/api/download-pdf', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+
+
+def test_validador_viejo_no_se_usa(cliente, pdf):
+    etag = webapp._etag_pdf(pdf)
+
+    # PDF reescrito sin registrar: el ETag guardado ya no lo describe
+    pdf.write_bytes(b'%PDF-1.3\notro contenido\n')
+    assert webapp._etag_pdf(pdf) is None
+
+    respuesta = cliente.get('/api/download-pdf', headers={'If-None-Match': f'"{etag}"'})
+    assert respuesta.status_code == 200
+    assert respuesta.data == pdf.read_bytes()
+
+
+def test_range(cliente, pdf):
+    contenido = pdf.read_bytes()
+
+    respuesta = cliente.get('/api/download-pdf', headers={'Range': 'bytes=100-199'})
+
+    assert respuesta.status_code == 206
+    assert respuesta.data == contenido[100:200]
+    assert respuesta.headers['Content-Range'] == f"bytes 100-199/{len(contenido)}"
+    assert respuesta.headers['Accept-Ranges'] == 'bytes'
+
+
+def test_range_final(cliente, pdf):
+    contenido = pdf.read_bytes()
+
+    respuesta = cliente.get('/api/download-pdf', headers={'Range': 'bytes=-50'})
+
+    assert respuesta.status_code == 206
+    assert respuesta.data == contenido[-50:]
+
+
+def test_range_fuera_del_archivo(cliente, pdf):
+    tamano = os.path.getsize(pdf)
+
+    respuesta = cliente.get('/api/download-pdf', headers={'Range': f'bytes={tamano + 10}-'})
+
+    assert respuesta.status_code == 416
+
+
+def test_if_range(cliente, pdf):
+    contenido = pdf.read_bytes()
+    etag = cliente.get('/api/download-pdf').headers['ETag']
+
+    # Mismo PDF: se retoma la descarga cortada
+    respuesta = cliente.get('/api/download-pdf',
+                            headers={'Range': 'bytes=1000-', 'If-Range': etag})
+    assert respuesta.status_code == 206
+    assert respuesta.data == contenido[1000:]
+
+    # El PDF cambió desde entonces: se envía completo
+    pdf.write_bytes(contenido + b'%%EOF\n')
+    webapp._registrar_pdf(pdf, 'otra-huella')
+    respuesta = cliente.get('/api/download-pdf',
+                            headers={'Range': 'bytes=1000-', 'If-Range': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.data == pdf.read_bytes()
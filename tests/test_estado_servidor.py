@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Estado publicado por SSE: versiones, firma de disco, duración máxima y tope de conexiones"""
+
+import threading
+
+import pytest
+
+import app as webapp
+from estado_servidor import EstadoServidor
+
+
+def test_versiones_y_campos_publicados():
+    estado = EstadoServidor(lambda recontar: {'qrs_count': 3})
+
+    version, datos = estado.instantanea()
+    assert datos == {'qrs_count': 3}
+
+    estado.publicar(generacion={'activa': True})
+    nueva, datos = estado.instantanea()
+    assert nueva > version
+    assert datos == {'qrs_count': 3, 'generacion': {'activa': True}}
+
+    # Recalcular sin cambios no publica una versión nueva
+    estado.actualizar()
+    assert estado.instantanea()[0] == nueva
+
+
+def test_revisar_recuenta_solo_si_cambia_la_firma():
+    firma = [1]
+    llamadas = []
+
+    def calcular(recontar):
+        llamadas.append(recontar)
+        return {'firma': firma[0]}
+
+    estado = EstadoServidor(calcular, lambda: firma[0])
+    estado.revisar()
+    estado.revisar()
+    firma[0] = 2
+    estado.revisar()
+
+    assert llamadas == [False, True]
+    assert estado.instantanea()[1] == {'firma': 2}
+
+
+def test_flujo_sse_con_keepalive_y_duracion_maxima():
+    estado = EstadoServidor(lambda recontar: {'qrs_count': 0})
+    publicado = threading.Timer(0.15, estado.publicar, kwargs={'generacion': {'activa': True}})
+    publicado.start()
+
+    partes = list(estado.eventos_sse(intervalo_keepalive=0.05, duracion_maxima=0.4))
+    publicado.join()
+
+    assert partes[0].startswith('retry: ')
+    eventos = [parte for parte in partes if parte.startswith('id: ')]
+    assert len(eventos) == 2
+    assert 'event: estado' in eventos[1] and '"activa": true' in eventos[1]
+    assert ': keepalive\n\n' in partes
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(webapp.app.config, 'SSE_CONEXIONES_MAXIMAS', 1)
+    monkeypatch.setitem(webapp.app.config, 'SSE_DURACION_MAXIMA', 0.2)
+    return webapp.app.test_client()
+
+
+def test_tope_de_conexiones_sse(cliente):
+    abierta = cliente.get('/api/eventos', buffered=False)
+    assert abierta.status_code == 200
+
+    rechazada = cliente.get('/api/eventos')
+    assert rechazada.status_code == 503
+    assert rechazada.headers['Retry-After'] == '60'
+
+    # El flujo termina solo a los SSE_DURACION_MAXIMA segundos
+    assert 'event: estado' in abierta.get_data(as_text=True)
+    abierta.close()
+    assert webapp._conexiones_sse == 0
+    siguiente = cliente.get('/api/eventos', buffered=False)
+    assert siguiente.status_code == 200
+    siguiente.close()
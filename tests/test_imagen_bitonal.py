@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""codificar_bitonal no devuelve la codificación de un QR ya reemplazado"""
+
+import os
+
+from conftest import crear_qr
+from imagen_bitonal import codificar_bitonal
+
+
+def test_codificar_bitonal_reemplazo_con_rename(tmp_path):
+    ruta = crear_qr(tmp_path / 'whokey-001.png', semilla=1)
+    anterior = codificar_bitonal(ruta)
+
+    # Como un lote nuevo: se escribe aparte y se renombra encima (otro inodo)
+    nuevo = crear_qr(tmp_path / 'nuevo.png', semilla=2)
+    os.replace(nuevo, ruta)
+
+    assert codificar_bitonal(ruta) != anterior
+    assert codificar_bitonal(ruta) == codificar_bitonal(ruta)
+
+
+def test_codificar_bitonal_reescritura_en_el_lugar(tmp_path):
+    ruta = crear_qr(tmp_path / 'whokey-001.png', semilla=1)
+    anterior = codificar_bitonal(ruta)
+    st = os.stat(ruta)
+
+    crear_qr(ruta, semilla=3)
+    # Mismo inodo; el mtime se fuerza distinto por si el reloj no avanzó
+    os.utime(ruta, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert codificar_bitonal(ruta) != anterior
+
+
+def test_codificar_bitonal_separa_codificaciones(tmp_path):
+    ruta = crear_qr(tmp_path / 'whokey-001.png')
+    assert codificar_bitonal(ruta, 'flate')[2] == 'FlateDecode'
+    assert codificar_bitonal(ruta, 'g4')[2] in ('CCITTFaxDecode', 'FlateDecode')
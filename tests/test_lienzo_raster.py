@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""La caché de imágenes escaladas del lienzo raster sigue al archivo en disco"""
+
+import os
+
+from conftest import crear_logo
+from lienzo_raster import _imagen_escalada
+
+
+def test_imagen_escalada_reemplazo(tmp_path):
+    ruta = crear_logo(tmp_path / 'logo.png', color=(200, 30, 30))
+    anterior = _imagen_escalada(str(ruta), 30, 30)
+    assert anterior.getpixel((15, 15))[:3] == (200, 30, 30)
+
+    nuevo = crear_logo(tmp_path / 'nuevo.png', color=(30, 30, 200))
+    os.replace(nuevo, ruta)
+
+    assert _imagen_escalada(str(ruta), 30, 30).getpixel((15, 15))[:3] == (30, 30, 200)
+
+
+def test_imagen_escalada_respeta_proporcion(tmp_path):
+    ruta = crear_logo(tmp_path / 'logo.png', lado=60)
+    assert _imagen_escalada(str(ruta), 30, 90).size == (30, 30)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Limpieza contra renders: un trabajo por tramos (en este u otro proceso) la frena"""
+
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import app as webapp
+from conftest import RAIZ
+from planificador_renders import LimiteEntreProcesos, PlanificadorRenders, RendersEnCurso
+
+
+# Otro proceso con un trabajo en curso hasta que se cierra su stdin
+TRABAJO_EN_OTRO_PROCESO = """
+import sys
+from planificador_renders import LimiteEntreProcesos
+with LimiteEntreProcesos(1, sys.argv[1]).trabajo():
+    print('dentro', flush=True)
+    sys.stdin.read()
+print('fuera', flush=True)
+"""
+
+
+@contextmanager
+def _trabajo_en_otro_proceso(carpeta):
+    proceso = subprocess.Popen([sys.executable, '-c', TRABAJO_EN_OTRO_PROCESO, str(carpeta)],
+                               cwd=RAIZ, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               text=True)
+    try:
+        yield proceso
+    finally:
+        if not proceso.stdin.closed:
+            proceso.stdin.close()
+        proceso.wait(10)
+
+
+@pytest.fixture
+def candados(tmp_path):
+    carpeta = tmp_path / 'candados'
+    carpeta.mkdir()
+    return carpeta
+
+
+def test_limpieza_rechazada_por_un_trabajo_de_otro_proceso(candados):
+    limite = LimiteEntreProcesos(1, str(candados))
+    planificador = PlanificadorRenders()
+
+    with _trabajo_en_otro_proceso(candados) as proceso:
+        assert proceso.stdout.readline().strip() == 'dentro'
+        with pytest.raises(RendersEnCurso):
+            with planificador.sin_renders(limite):
+                pass
+
+    with planificador.sin_renders(limite):
+        pass
+
+
+def test_otro_proceso_espera_a_que_termine_la_limpieza(candados):
+    limite = LimiteEntreProcesos(1, str(candados))
+
+    with _trabajo_en_otro_proceso(candados) as proceso:
+        with PlanificadorRenders().sin_renders(limite):
+            # Sin entrar mientras dura la limpieza
+            with pytest.raises(subprocess.TimeoutExpired):
+                proceso.communicate(timeout=0.5)
+        assert proceso.communicate('', timeout=10)[0].split() == ['dentro', 'fuera']
+
+
+@pytest.fixture
+def webapp_con_trabajo(tmp_path, monkeypatch, trabajo, candados):
+    """
+    WebApp en tmp_path con QRs y logo, un tramo por página y el límite
+    entre procesos en candados
+
+    Returns:
+        Tupla (cliente, entre_tramos, seguir): entre_tramos se activa al
+        terminar el primer tramo de generar-pdf, que espera seguir para
+        pedir el siguiente
+    """
+    trabajo()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(webapp, '_carpetas_creadas', False)
+    monkeypatch.setattr(webapp, 'limite_renders', LimiteEntreProcesos(1, str(candados)))
+    monkeypatch.setattr(webapp.GeneradorPlanchasPDF, 'PAGINAS_POR_CHUNK', 1)
+    monkeypatch.setitem(webapp.app.config, 'PRECOMPRIMIR_DESCARGAS', False)
+    entre_tramos, seguir = threading.Event(), threading.Event()
+    turnos_por_tramo = webapp.planificador.turnos_por_tramo
+
+    def turnos_pausados(*args, **kwargs):
+        turno_tramo = turnos_por_tramo(*args, **kwargs)
+
+        @contextmanager
+        def pausado(paginas):
+            with turno_tramo(paginas):
+                yield
+            if not entre_tramos.is_set():
+                entre_tramos.set()
+                seguir.wait(10)
+        return pausado
+
+    monkeypatch.setattr(webapp.planificador, 'turnos_por_tramo', turnos_pausados)
+    return webapp.app.test_client(), entre_tramos, seguir
+
+
+def test_render_y_limpieza_a_la_vez(webapp_con_trabajo, tmp_path):
+    cliente, entre_tramos, seguir = webapp_con_trabajo
+    respuestas = []
+    hilo = threading.Thread(target=lambda: respuestas.append(
+        webapp.app.test_client().post('/api/generar-pdf')))
+    hilo.start()
+    try:
+        assert entre_tramos.wait(30)
+        # Entre dos tramos no hay turno, pero el trabajo sigue en curso
+        assert webapp.planificador.resumen()['renders_activos'] == 0
+        respuesta = cliente.post('/api/limpiar-todo')
+        assert respuesta.status_code == 409
+        assert (tmp_path / 'qrs').is_dir() and (tmp_path / 'output' / '.checkpoints').is_dir()
+    finally:
+        seguir.set()
+        hilo.join(60)
+
+    assert respuestas[0].status_code == 200
+    assert respuestas[0].get_json()['estadisticas']['total_paginas'] == 3
+    assert cliente.post('/api/limpiar-todo').status_code == 200
+
+
+def test_limpieza_rechazada_por_un_render_de_otro_worker(webapp_con_trabajo, candados):
+    cliente, _, _ = webapp_con_trabajo
+
+    with _trabajo_en_otro_proceso(candados) as proceso:
+        assert proceso.stdout.readline().strip() == 'dentro'
+        assert cliente.post('/api/limpiar-todo').status_code == 409
+
+    assert cliente.post('/api/limpiar-todo').status_code == 200
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Logos vectoriales: PDF como formulario y SVG rasterizado cuando falta svglib"""
+
+import pytest
+from pypdf import PdfReader
+
+import logos_vectoriales
+from pdf_generator import GeneradorPlanchasPDF
+from logos_vectoriales import validar_logo_vectorial
+
+SVG = ('<svg xmlns="http://www.w3.org/2000/svg" width="80" height="40">'
+       '<rect width="80" height="40" fill="#c81e1e"/></svg>')
+
+
+@pytest.fixture
+def logo_pdf(tmp_path):
+    from reportlab.pdfgen import canvas
+
+    ruta = tmp_path / 'logo.pdf'
+    c = canvas.Canvas(str(ruta), pagesize=(100, 50))
+    c.setFillColorRGB(0.8, 0.1, 0.1)
+    c.rect(0, 0, 100, 50, fill=1)
+    c.save()
+    return ruta
+
+
+@pytest.fixture
+def logo_svg(tmp_path):
+    ruta = tmp_path / 'logo.svg'
+    ruta.write_text(SVG, encoding='utf-8')
+    return ruta
+
+
+@pytest.fixture
+def modulos(monkeypatch):
+    """Función (*instalados) que simula qué dependencias opcionales hay"""
+    def simular(*instalados):
+        monkeypatch.setattr(logos_vectoriales, '_hay_modulo', lambda nombre: nombre in instalados)
+    return simular
+
+
+def _xobjetos(ruta):
+    recursos = PdfReader(ruta).pages[0]['/Resources']['/XObject']
+    return [objeto.get_object()['/Subtype'] for objeto in recursos.values()]
+
+
+def _generar(carpeta_qrs, logo, salida):
+    generador = GeneradorPlanchasPDF(carpeta_qrs, logo)
+    return generador.generar_pdf(str(salida), verbose=False)[1]
+
+
+def test_logo_pdf_como_formulario(trabajo, logo_pdf, tmp_path):
+    carpeta_qrs, _ = trabajo(cantidad=5)
+
+    estadisticas = _generar(carpeta_qrs, logo_pdf, tmp_path / 'salida.pdf')
+
+    assert validar_logo_vectorial(logo_pdf) == (100, 50)
+    assert estadisticas['advertencias'] == []
+    # Un solo formulario para los 10 logos de la página
+    assert _xobjetos(tmp_path / 'salida.pdf').count('/Form') == 1
+
+
+def test_logo_pdf_de_varias_paginas(tmp_path):
+    from reportlab.pdfgen import canvas
+
+    ruta = tmp_path / 'dos.pdf'
+    c = canvas.Canvas(str(ruta))
+    c.showPage()
+    c.showPage()
+    c.save()
+
+    with pytest.raises(ValueError, match='una sola página'):
+        validar_logo_vectorial(ruta)
+
+
+def test_svg_sin_svglib_se_rasteriza_con_advertencia(trabajo, logo_svg, tmp_path, modulos):
+    pytest.importorskip('pymupdf')
+    modulos('pymupdf')
+    carpeta_qrs, _ = trabajo(cantidad=5)
+
+    estadisticas = _generar(carpeta_qrs, logo_svg, tmp_path / 'salida.pdf')
+
+    assert validar_logo_vectorial(logo_svg) == (80, 40)
+    assert len(estadisticas['advertencias']) == 1
+    assert 'rasterizado' in estadisticas['advertencias'][0]
+    assert '/Form' not in _xobjetos(tmp_path / 'salida.pdf')
+
+
+def test_svg_sin_svglib_ni_pymupdf(trabajo, logo_svg, modulos):
+    modulos()
+    carpeta_qrs, _ = trabajo(cantidad=5)
+
+    with pytest.raises(ValueError, match='svglib'):
+        validar_logo_vectorial(logo_svg)
+    advertencias = GeneradorPlanchasPDF(carpeta_qrs, logo_svg).validar_archivos()
+    assert ['sin dibujar' in advertencia for advertencia in advertencias] == [True]
+
+
+def test_svg_con_svglib_no_advierte(trabajo, logo_svg, modulos):
+    modulos('svglib', 'pymupdf')
+    carpeta_qrs, _ = trabajo(cantidad=5)
+
+    assert GeneradorPlanchasPDF(carpeta_qrs, logo_svg).validar_archivos() == []
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""MapeoLogosRangos: asignación por rangos y formato en disco"""
+
+from mapeo_logos import MapeoLogosRangos
+
+
+def test_mapeo_asignar_parte_y_fusiona():
+    mapeo = MapeoLogosRangos()
+    mapeo.asignar(1, 100, 'a.png')
+    mapeo.asignar(40, 60, 'b.png')
+
+    assert list(mapeo.rangos()) == [(1, 39, 'a.png'), (40, 60, 'b.png'), (61, 100, 'a.png')]
+
+    # Volver a asignar el hueco con el logo de los vecinos los fusiona
+    mapeo.asignar(40, 60, 'a.png')
+    assert list(mapeo.rangos()) == [(1, 100, 'a.png')]
+
+
+def test_mapeo_guardar_y_cargar(tmp_path):
+    mapeo = MapeoLogosRangos()
+    mapeo.asignar(5, 9, 'a.png')
+    mapeo.asignar(20, 20, 'b.png')
+    archivo = tmp_path / 'mapeo.json'
+    mapeo.guardar(archivo)
+
+    assert list(MapeoLogosRangos.cargar(archivo).rangos()) == list(mapeo.rangos())
+
+
+def test_mapeo_carga_formato_por_id(tmp_path):
+    archivo = tmp_path / 'mapeo.json'
+    archivo.write_text('{"3": "a.png", "1": "a.png", "2": "a.png", "7": "b.png"}')
+
+    assert list(MapeoLogosRangos.cargar(archivo).rangos()) == [(1, 3, 'a.png'), (7, 7, 'b.png')]
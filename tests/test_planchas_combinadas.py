@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Planchas combinadas: reparto de pedidos en hojas y manifiesto"""
+
+import json
+import random
+from types import SimpleNamespace
+
+from pypdf import PdfReader
+
+from conftest import crear_logo, crear_qr
+from planchas_combinadas import cargar_pedido, empaquetar_pedidos, generar_plancha_combinada
+
+FILAS_POR_PAGINA = 28
+FILAS_POR_COLUMNA = 14
+
+
+def _pedidos(*cantidades):
+    return [SimpleNamespace(filas=[(i, None) for i in range(1, n + 1)]) for n in cantidades]
+
+
+def _ubicar(hoja):
+    """(fila_encabezado, primera_fila, ultima_fila) de cada bloque, como al dibujarlos"""
+    ubicados = []
+    fila = 0
+    for _, desde, hasta, _ in hoja:
+        if fila % FILAS_POR_COLUMNA == FILAS_POR_COLUMNA - 1:
+            fila += 1
+        ubicados.append((fila, fila + 1, fila + hasta - desde))
+        fila += 1 + hasta - desde
+    return ubicados
+
+
+def _comprobar(pedidos, hojas):
+    filas = {indice: [] for indice in range(len(pedidos))}
+    for hoja in hojas:
+        for (indice, desde, hasta, _), (encabezado, primera, ultima) in zip(hoja, _ubicar(hoja)):
+            # El encabezado va en la misma columna que su primera fila
+            assert encabezado // FILAS_POR_COLUMNA == primera // FILAS_POR_COLUMNA
+            assert ultima < FILAS_POR_PAGINA
+            filas[indice].extend(range(desde, hasta))
+    for indice, pedido in enumerate(pedidos):
+        assert filas[indice] == list(range(len(pedido.filas)))
+
+
+def test_encabezado_al_pie_de_columna_baja_a_la_siguiente():
+    # 12 filas + encabezado ocupan 0-12: el siguiente encabezado caería en la 13
+    pedidos = _pedidos(12, 5)
+
+    hojas = empaquetar_pedidos(pedidos, FILAS_POR_PAGINA, FILAS_POR_COLUMNA)
+
+    assert hojas == [[(0, 0, 12, False), (1, 0, 5, False)]]
+    assert _ubicar(hojas[0]) == [(0, 1, 12), (14, 15, 19)]
+    _comprobar(pedidos, hojas)
+
+
+def test_el_salto_de_columna_cuenta_para_el_lugar_libre():
+    # El último bloque del grande usa 13 filas: las 15 del chico entrarían
+    # justas sin el salto de columna; con él, va a una hoja nueva
+    pedidos = _pedidos(39, 14)
+
+    hojas = empaquetar_pedidos(pedidos, FILAS_POR_PAGINA, FILAS_POR_COLUMNA)
+
+    assert hojas == [[(0, 0, 27, False)], [(0, 27, 39, True)], [(1, 0, 14, False)]]
+    _comprobar(pedidos, hojas)
+
+
+def test_pedido_grande_en_hojas_propias_con_continua():
+    pedidos = _pedidos(60, 3)
+
+    hojas = empaquetar_pedidos(pedidos, FILAS_POR_PAGINA, FILAS_POR_COLUMNA)
+
+    assert [bloque for hoja in hojas for bloque in hoja if bloque[0] == 0] == [
+        (0, 0, 27, False), (0, 27, 54, True), (0, 54, 60, True)]
+    # El chico va en el lugar libre del último bloque
+    assert hojas[2] == [(0, 54, 60, True), (1, 0, 3, False)]
+    _comprobar(pedidos, hojas)
+
+
+def test_repartos_al_azar():
+    azar = random.Random(7)
+    for _ in range(200):
+        pedidos = _pedidos(*(azar.randint(1, 40) for _ in range(azar.randint(1, 8))))
+        _comprobar(pedidos, empaquetar_pedidos(pedidos, FILAS_POR_PAGINA, FILAS_POR_COLUMNA))
+
+
+def _carpeta_pedido(carpeta, ids):
+    (carpeta / 'qrs').mkdir(parents=True)
+    for numero in ids:
+        crear_qr(carpeta / 'qrs' / f"whokey-{numero:03d}.png", semilla=numero)
+    crear_logo(carpeta / 'logo.png')
+    return carpeta
+
+
+def test_genera_pdf_y_manifiesto(tmp_path):
+    pedidos = [cargar_pedido(_carpeta_pedido(tmp_path / 'acme', range(1, 13))),
+               cargar_pedido(_carpeta_pedido(tmp_path / 'bar', range(40, 45)), nombre='BAR-7')]
+    salida = tmp_path / 'combinada.pdf'
+
+    _, manifiesto = generar_plancha_combinada(pedidos, salida, verbose=False)
+
+    assert len(PdfReader(salida).pages) == manifiesto['total_paginas'] == 1
+    assert manifiesto['paginas_por_separado'] == 2
+    assert json.loads(salida.with_suffix('.json').read_text(encoding='utf-8')) == manifiesto
+    acme, bar = manifiesto['pedidos']
+    assert (acme['nombre'], acme['ids'], acme['total_qrs']) == ('acme', '1-12', 12)
+    assert acme['bloques'][0]['fila_encabezado'] == 1
+    # Fila 14 libre: el encabezado de BAR-7 va arriba de la columna derecha
+    assert bar['nombre'] == 'BAR-7'
+    assert bar['bloques'] == [{'pagina': 1, 'fila_encabezado': 15, 'filas': '16-20',
+                               'ids': '40-44', 'continua': False}]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Planificador de renders: prioridades, envejecimiento, admisión y trabajos por tramos"""
+
+import threading
+import time
+
+import pytest
+
+import planificador_renders
+from planificador_renders import ColaLlena, PlanificadorRenders, RendersEnCurso
+
+
+def _esperar(condicion, limite=5):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "tiempo de espera agotado"
+        time.sleep(0.01)
+
+
+def _ocupar(planificador):
+    """Toma el único turno en otro hilo; devuelve el Event que lo suelta"""
+    soltar = threading.Event()
+
+    def ocupar():
+        with planificador.turno('normal'):
+            soltar.wait()
+
+    threading.Thread(target=ocupar, daemon=True).start()
+    _esperar(lambda: planificador.resumen()['renders_activos'] == 1)
+    return soltar
+
+
+def _encolar(planificador, prioridades, orden):
+    """Un hilo por prioridad (en ese orden de llegada) que anota su turno"""
+    hilos = []
+    en_cola = planificador.resumen()['en_cola']
+    for prioridad in prioridades:
+        def pedir(prioridad=prioridad):
+            with planificador.turno(prioridad):
+                orden.append(prioridad)
+        hilo = threading.Thread(target=pedir, daemon=True)
+        hilo.start()
+        hilos.append(hilo)
+        _esperar(lambda: planificador.resumen()['en_cola'] == en_cola + len(hilos))
+    return hilos
+
+
+def test_turnos_por_prioridad():
+    planificador = PlanificadorRenders(renders_simultaneos=1)
+    soltar = _ocupar(planificador)
+    orden = []
+    hilos = _encolar(planificador, ['masivo', 'normal', 'urgente', 'normal'], orden)
+
+    soltar.set()
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert orden == ['urgente', 'normal', 'normal', 'masivo']
+
+
+def test_un_pedido_viejo_sube_de_prioridad(monkeypatch):
+    monkeypatch.setattr(planificador_renders, 'ENVEJECIMIENTO', 0.1)
+    planificador = PlanificadorRenders(renders_simultaneos=1)
+    soltar = _ocupar(planificador)
+    orden = []
+    hilos = _encolar(planificador, ['masivo'], orden)
+    # Dos escalones de envejecimiento: el masivo ya compite como urgente
+    time.sleep(0.25)
+    hilos += _encolar(planificador, ['urgente'], orden)
+
+    soltar.set()
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert orden == ['masivo', 'urgente']
+
+
+def test_cola_llena_rechaza_salvo_urgentes_y_admitidos():
+    planificador = PlanificadorRenders(renders_simultaneos=1, cola_maxima=1)
+    soltar = _ocupar(planificador)
+    hilos = _encolar(planificador, ['normal'], [])
+
+    with pytest.raises(ColaLlena):
+        with planificador.turno('masivo'):
+            pass
+
+    pasaron = []
+    for argumentos in ({'prioridad': 'urgente'}, {'prioridad': 'masivo', 'admitido': True}):
+        def pedir(argumentos=argumentos):
+            with planificador.turno(**argumentos):
+                pasaron.append(argumentos['prioridad'])
+        hilo = threading.Thread(target=pedir, daemon=True)
+        hilo.start()
+        hilos.append(hilo)
+    _esperar(lambda: planificador.resumen()['en_cola'] == 3)
+
+    soltar.set()
+    for hilo in hilos:
+        hilo.join(5)
+    assert sorted(pasaron) == ['masivo', 'urgente']
+    assert planificador.resumen()['en_cola'] == 0
+
+
+def test_solo_el_primer_tramo_pasa_por_admision():
+    planificador = PlanificadorRenders(renders_simultaneos=1, cola_maxima=0)
+    turno_tramo = planificador.turnos_por_tramo('normal', 'prueba')
+
+    with planificador.trabajo():
+        with pytest.raises(ColaLlena):
+            with turno_tramo(1):
+                pass
+
+    planificador.cola_maxima = 1
+    with planificador.trabajo():
+        with turno_tramo(1):
+            pass
+        # Tramos siguientes con la cola llena: el trabajo no se corta
+        planificador.cola_maxima = 0
+        with turno_tramo(1):
+            pass
+
+
+def test_sin_renders_ve_el_trabajo_entre_tramos():
+    planificador = PlanificadorRenders(renders_simultaneos=1)
+    turno_tramo = planificador.turnos_por_tramo('masivo', 'prueba')
+
+    with planificador.trabajo():
+        with turno_tramo(1):
+            pass
+        # Entre dos tramos no hay turno activo ni en cola
+        assert planificador.resumen()['renders_activos'] == 0
+        with pytest.raises(RendersEnCurso):
+            with planificador.sin_renders():
+                pass
+        with turno_tramo(1):
+            pass
+
+    with planificador.sin_renders():
+        assert planificador.resumen()['trabajos_en_curso'] == 0
+
+
+def test_un_trabajo_nuevo_espera_a_que_termine_sin_renders():
+    planificador = PlanificadorRenders()
+    eventos = []
+
+    def trabajar():
+        with planificador.trabajo():
+            eventos.append('trabajo')
+
+    with planificador.sin_renders():
+        hilo = threading.Thread(target=trabajar, daemon=True)
+        hilo.start()
+        time.sleep(0.1)
+        eventos.append('limpieza')
+    hilo.join(5)
+
+    assert eventos == ['limpieza', 'trabajo']
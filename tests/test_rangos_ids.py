@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""RangosIds y parsear_ids_texto"""
+
+import pytest
+
+from pdf_generator import ErrorIdsTexto, RangosIds, parsear_ids_texto
+
+
+def test_rangos_se_ordenan_y_fusionan():
+    rangos = RangosIds([(20, 25), (1, 5), (4, 8), (9, 9), (30, 30)])
+
+    assert rangos.rangos == [(1, 9), (20, 25), (30, 30)]
+    assert len(rangos) == 9 + 6 + 1
+    assert list(rangos)[:3] == [1, 2, 3]
+    assert rangos.texto() == "1-9, 20-25, 30"
+
+
+def test_rangos_pertenencia():
+    rangos = RangosIds([(1, 5), (10, 10), (1000, 200000)])
+
+    for numero_id in (1, 5, 10, 1000, 150000, 200000):
+        assert numero_id in rangos
+    for numero_id in (0, 6, 9, 11, 999, 200001):
+        assert numero_id not in rangos
+
+
+def test_rangos_vacios():
+    assert not RangosIds()
+    assert len(RangosIds()) == 0
+    assert RangosIds().texto() == ""
+
+
+def test_parsear_ids_texto():
+    rangos = parsear_ids_texto(" 1-5, 10,20 - 25 ,, 3 ")
+
+    assert rangos.rangos == [(1, 5), (10, 10), (20, 25)]
+    assert len(rangos) == 12
+
+
+@pytest.mark.parametrize('texto', ['', '   ', None])
+def test_parsear_ids_texto_vacio(texto):
+    assert not parsear_ids_texto(texto)
+
+
+def test_parsear_ids_texto_invalidos():
+    with pytest.raises(ErrorIdsTexto) as error:
+        parsear_ids_texto("1-5, abc, 9-3, 4-5-6, 7")
+
+    assert error.value.partes_invalidas == ['abc', '9-3', '4-5-6']
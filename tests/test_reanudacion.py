@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""generar_pdf_reanudable retoma desde el último tramo guardado"""
+
+import threading
+import time
+from contextlib import nullcontext
+
+import pytest
+from pypdf import PdfReader
+
+from conftest import crear_qr
+from pdf_generator import GeneradorPlanchasPDF
+
+
+class Interrupcion(Exception):
+    pass
+
+
+def _turnos(fallar_en=None):
+    """turno_tramo que registra cada tramo dibujado y falla en el indicado"""
+    llamadas = []
+
+    def turno_tramo(paginas):
+        if len(llamadas) == fallar_en:
+            raise Interrupcion()
+        llamadas.append(paginas)
+        return nullcontext()
+
+    return turno_tramo, llamadas
+
+
+def _generar(carpeta_qrs, logo, salida, checkpoints, turno_tramo):
+    generador = GeneradorPlanchasPDF(carpeta_qrs, logo)
+    return generador.generar_pdf_reanudable(str(salida), carpeta_checkpoints=str(checkpoints),
+                                            paginas_por_chunk=1, verbose=False,
+                                            turno_tramo=turno_tramo)
+
+
+def test_reanuda_tras_interrupcion(trabajo, tmp_path):
+    carpeta_qrs, logo = trabajo(60)
+    salida = tmp_path / 'planchas.pdf'
+    checkpoints = tmp_path / '.checkpoints'
+
+    turno, llamadas = _turnos(fallar_en=2)
+    with pytest.raises(Interrupcion):
+        _generar(carpeta_qrs, logo, salida, checkpoints, turno)
+    assert len(llamadas) == 2
+    assert not salida.exists()
+
+    turno, llamadas = _turnos()
+    _, estadisticas = _generar(carpeta_qrs, logo, salida, checkpoints, turno)
+
+    # Solo se dibuja el tramo que faltaba
+    assert llamadas == [1]
+    assert estadisticas['tramos_reanudados'] == 2
+    assert estadisticas['total_paginas'] == 3
+    assert len(PdfReader(str(salida)).pages) == 3
+    # Terminado el trabajo, sus tramos se borran
+    assert not list(checkpoints.rglob('*chunk*'))
+
+
+def test_mismo_resultado_que_sin_interrupcion(trabajo, tmp_path):
+    carpeta_qrs, logo = trabajo(60)
+
+    turno, _ = _turnos(fallar_en=1)
+    with pytest.raises(Interrupcion):
+        _generar(carpeta_qrs, logo, tmp_path / 'a.pdf', tmp_path / 'cp', turno)
+    _generar(carpeta_qrs, logo, tmp_path / 'a.pdf', tmp_path / 'cp', None)
+    _generar(carpeta_qrs, logo, tmp_path / 'b.pdf', tmp_path / 'otro', None)
+
+    paginas_a = [pagina.extract_text() for pagina in PdfReader(str(tmp_path / 'a.pdf')).pages]
+    paginas_b = [pagina.extract_text() for pagina in PdfReader(str(tmp_path / 'b.pdf')).pages]
+    assert paginas_a == paginas_b
+
+
+def test_no_reanuda_si_cambia_un_qr(trabajo, tmp_path):
+    carpeta_qrs, logo = trabajo(60)
+    salida = tmp_path / 'planchas.pdf'
+    checkpoints = tmp_path / '.checkpoints'
+
+    turno, _ = _turnos(fallar_en=2)
+    with pytest.raises(Interrupcion):
+        _generar(carpeta_qrs, logo, salida, checkpoints, turno)
+
+    # Un QR reemplazado (p. ej. un lote corregido) invalida los tramos guardados
+    crear_qr(carpeta_qrs / 'nuevo.png', semilla=99, lado=48)
+    (carpeta_qrs / 'nuevo.png').replace(carpeta_qrs / 'whokey-001.png')
+
+    turno, llamadas = _turnos()
+    _, estadisticas = _generar(carpeta_qrs, logo, salida, checkpoints, turno)
+
+    assert estadisticas['tramos_reanudados'] == 0
+    assert len(llamadas) == 3
+
+
+def test_trabajos_simultaneos_con_las_mismas_entradas(trabajo, tmp_path):
+    carpeta_qrs, logo = trabajo(60)
+    salida = tmp_path / 'planchas.pdf'
+    checkpoints = tmp_path / '.checkpoints'
+    dibujados = []
+    resultados = []
+    errores = []
+
+    def turno_lento(paginas):
+        dibujados.append(paginas)
+        time.sleep(0.05)
+        return nullcontext()
+
+    def generar():
+        try:
+            resultados.append(_generar(carpeta_qrs, logo, salida, checkpoints, turno_lento)[1])
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=generar) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    # El segundo espera al primero y reutiliza su PDF en lugar de dibujarlo otra vez
+    assert errores == []
+    assert len(dibujados) == 3
+    assert sorted(bool(r.get('reutilizado')) for r in resultados) == [False, True]
+    assert len(PdfReader(str(salida)).pages) == 3
+
+
+def test_vuelve_a_generar_si_el_pdf_cambio(trabajo, tmp_path):
+    carpeta_qrs, logo = trabajo(30)
+    salida = tmp_path / 'planchas.pdf'
+    checkpoints = tmp_path / '.checkpoints'
+    _generar(carpeta_qrs, logo, salida, checkpoints, None)
+
+    salida.write_bytes(b'otro')
+    turno, llamadas = _turnos()
+    _, estadisticas = _generar(carpeta_qrs, logo, salida, checkpoints, turno)
+
+    assert 'reutilizado' not in estadisticas
+    assert len(llamadas) == 2
+    assert len(PdfReader(str(salida)).pages) == 2
+
+
+def test_poda_carpetas_de_entradas_viejas(trabajo, tmp_path):
+    carpeta_qrs, logo = trabajo(60)
+    checkpoints = tmp_path / '.checkpoints'
+
+    turno, _ = _turnos(fallar_en=1)
+    with pytest.raises(Interrupcion):
+        _generar(carpeta_qrs, logo, tmp_path / 'a.pdf', checkpoints, turno)
+    vieja, = checkpoints.iterdir()
+
+    crear_qr(carpeta_qrs / 'whokey-061.png', semilla=61)
+    _generar(carpeta_qrs, logo, tmp_path / 'a.pdf', checkpoints, None)
+
+    assert not vieja.exists()
+    assert len(list(checkpoints.iterdir())) == 1
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Renderizado distribuido: raíz de los workers, token y PDF repartido"""
+
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+from pypdf import PdfReader
+
+from conftest import crear_logo
+from renderizado_distribuido import (HEADER_TOKEN, CoordinadorRenderizado, _ruta_permitida,
+                                     detener_workers_locales, dividir_en_fragmentos,
+                                     iniciar_workers_locales, renderizar_fragmento)
+
+TOKEN = 'token-de-prueba'
+
+
+@pytest.fixture
+def raiz(tmp_path, trabajo):
+    """Carpeta de trabajo (raíz de los workers) y un logo fuera de ella"""
+    carpeta_qrs, logo = trabajo()
+    afuera = tmp_path.parent / f"{tmp_path.name}-afuera"
+    afuera.mkdir()
+    return carpeta_qrs.parent, crear_logo(afuera / 'logo.png')
+
+
+def test_ruta_permitida(raiz):
+    carpeta, afuera = raiz
+    (carpeta / 'enlace.png').symlink_to(afuera)
+
+    assert _ruta_permitida('qrs', carpeta) == (carpeta / 'qrs').resolve()
+    assert _ruta_permitida(carpeta / 'logo.png', carpeta) == (carpeta / 'logo.png').resolve()
+    for ruta in ('../x.png', str(afuera), '/etc/passwd', 'enlace.png'):
+        with pytest.raises(PermissionError):
+            _ruta_permitida(ruta, carpeta)
+
+
+def test_fragmento_con_logo_fuera_de_la_raiz(raiz):
+    carpeta, afuera = raiz
+    pedido = {'carpeta_qrs': 'qrs', 'logo_principal': 'logo.png', 'ids': [1, 28]}
+
+    assert renderizar_fragmento(pedido, carpeta).startswith(b'%PDF')
+
+    for cambio in ({'logo_principal': str(afuera)},
+                   {'rangos_logos': [[3, 5, str(afuera)]]}):
+        with pytest.raises(PermissionError):
+            renderizar_fragmento({**pedido, **cambio}, carpeta)
+
+
+def test_fragmentos_empiezan_al_comienzo_de_una_pagina():
+    filas = [(numero, None) for numero in range(1, 61)]
+
+    fragmentos = dividir_en_fragmentos(filas, paginas_por_fragmento=2)
+
+    assert [(f['pagina_inicio'], f['paginas'], f['ids']) for f in fragmentos] == [
+        (1, 2, (1, 56)), (3, 1, (57, 60))]
+
+
+@pytest.fixture
+def workers(raiz):
+    procesos, urls = iniciar_workers_locales(2, TOKEN, raiz[0])
+    yield urls
+    detener_workers_locales(procesos)
+
+
+def test_pdf_repartido_entre_workers(raiz, workers, tmp_path):
+    carpeta, _ = raiz
+    coordinador = CoordinadorRenderizado(workers, carpeta / 'qrs', carpeta / 'logo.png',
+                                         paginas_por_fragmento=1, token=TOKEN)
+
+    salida, estadisticas = coordinador.generar_pdf(str(tmp_path / 'distribuido.pdf'),
+                                                   verbose=False)
+
+    assert (estadisticas['total_paginas'], estadisticas['fragmentos']) == (3, 3)
+    assert len(PdfReader(salida).pages) == 3
+
+
+def test_worker_rechaza_rutas_fuera_de_su_raiz(raiz, workers, tmp_path):
+    carpeta, afuera = raiz
+    coordinador = CoordinadorRenderizado(workers[:1], carpeta / 'qrs', afuera,
+                                         reintentos=1, token=TOKEN)
+
+    with pytest.raises(RuntimeError, match='fuera de la raíz'):
+        coordinador.generar_pdf(str(tmp_path / 'distribuido.pdf'), verbose=False)
+
+
+def test_worker_rechaza_token_invalido(raiz, workers):
+    carpeta, _ = raiz
+    pedido = {'carpeta_qrs': str(carpeta / 'qrs'), 'logo_principal': str(carpeta / 'logo.png'),
+              'ids': [1, 28]}
+    solicitud = urllib.request.Request(
+        f"{workers[0]}/renderizar", data=json.dumps(pedido).encode('utf-8'),
+        headers={'Content-Type': 'application/json', HEADER_TOKEN: 'otro'}, method='POST')
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(solicitud, timeout=30)
+    assert error.value.code == 401
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Vigilancia de la carpeta de QRs: serie incremental, estado y errores en una tanda"""
+
+import pytest
+from pypdf import PdfReader
+
+from conftest import crear_qr
+from pdf_generator import GeneradorPlanchasPDF
+from vigilar_carpeta import VigilanteCarpeta
+
+
+@pytest.fixture
+def vigilante(tmp_path, trabajo):
+    carpeta_qrs, logo = trabajo()
+
+    def crear():
+        return VigilanteCarpeta(carpeta_qrs, logo, carpeta_salida=tmp_path / 'serie',
+                                verbose=False)
+    return crear
+
+
+def _paginas(ruta):
+    return len(PdfReader(ruta).pages)
+
+
+def test_serie_de_paginas_completas(vigilante, tmp_path):
+    primero = vigilante()
+
+    archivo = primero.procesar()
+    assert archivo.name == 'planchas_0001.pdf'
+    assert _paginas(archivo) == 2
+    assert primero.impresos.texto() == '1-56'
+    # Las 4 filas restantes esperan a completar página
+    assert primero.procesar() is None
+
+    crear_qr(tmp_path / 'qrs' / 'whokey-061.png', semilla=61)
+    archivo = primero.procesar(vaciar=True)
+    assert (archivo.name, _paginas(archivo)) == ('planchas_0002.pdf', 1)
+
+    # Reiniciar no reimprime nada y sigue la numeración
+    segundo = vigilante()
+    assert segundo.procesar(vaciar=True) is None
+    assert (segundo.impresos.texto(), segundo.siguiente) == ('1-61', 3)
+
+
+def test_png_a_medio_escribir_queda_pendiente(vigilante, tmp_path):
+    ruta = tmp_path / 'qrs' / 'whokey-030.png'
+    ruta.write_bytes(ruta.read_bytes()[:-12])
+    actual = vigilante()
+
+    pendientes = actual.pendientes(actual._crear_generador())
+
+    assert 30 not in [numero_id for numero_id, _ in pendientes]
+    assert len(pendientes) == 59
+
+
+def test_un_error_en_la_tanda_no_detiene_la_vigilancia(vigilante, tmp_path, monkeypatch, capsys):
+    actual = vigilante()
+    actual.verbose = True
+    generar_pdf = GeneradorPlanchasPDF.generar_pdf
+
+    def falla(self, archivo_salida, **kwargs):
+        # Deja un temporal a medias, como un render interrumpido
+        open(archivo_salida, 'wb').close()
+        raise OSError(28, "No queda espacio en el dispositivo")
+
+    monkeypatch.setattr(GeneradorPlanchasPDF, 'generar_pdf', falla)
+    actual._procesar_tanda()
+
+    assert 'No queda espacio' in capsys.readouterr().out
+    assert (len(actual.impresos), actual.siguiente) == (0, 1)
+    assert not list((tmp_path / 'serie').glob('*.pdf*'))
+
+    monkeypatch.setattr(GeneradorPlanchasPDF, 'generar_pdf', generar_pdf)
+    actual._procesar_tanda()
+    assert (tmp_path / 'serie' / 'planchas_0001.pdf').exists()
+    assert actual.impresos.texto() == '1-56'
+
+
+def test_sin_logo_avisa_una_vez(vigilante, tmp_path, capsys):
+    actual = vigilante()
+    actual.verbose = True
+    (tmp_path / 'logo.png').unlink()
+
+    assert actual.procesar() is None
+    assert actual.procesar() is None
+
+    assert capsys.readouterr().out.count('Sin imprimir por ahora') == 1
@@ -3,12 +3,203 @@
 """
 Script de verificación y diagnóstico del proyecto
 Muestra información sobre archivos, configuración y validaciones
+
+Uso:
+    python verificar_proyecto.py
+    python verificar_proyecto.py --integridad
+    python verificar_proyecto.py --integridad --mapeo logos_especiales_mapeo.json --json
+
+--integridad decodifica cada QR y logo con PIL (en paralelo) y controla
+modo de color y resolución contra el tamaño de impresión, para rechazar
+entradas dañadas antes de una generación larga. Los resultados quedan en
+caché por (ruta, tamaño, mtime): volver a verificar solo decodifica lo que
+cambió.
 """
 
+import argparse
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import re
 
+from almacenamiento import guardar_atomico
+from mapeo_logos import MapeoLogosRangos
+from pdf_generator import GeneradorPlanchasPDF, analizar_secuencia, cm
+
+
+# Caché de la verificación de integridad
+ARCHIVO_CACHE_INTEGRIDAD = Path(".checkpoints") / "integridad.json"
+VERSION_CACHE_INTEGRIDAD = 2
+
+# Modos de color que reportlab imprime sin problemas (CMYK se advierte aparte)
+MODOS_IMPRIMIBLES = {'1', 'L', 'LA', 'P', 'PA', 'RGB', 'RGBA', 'CMYK'}
+
+# Resolución efectiva mínima al tamaño de impresión
+DPI_MINIMO = 150
+
+# Por debajo de esta cantidad de imágenes no conviene levantar procesos
+MINIMO_PARA_POOL = 64
+
+
+def _decodificar_imagen(ruta):
+    """
+    Abre y decodifica una imagen completa (verifica CRC y datos truncados)
+    
+    Los logos SVG/PDF se abren como vectores: modo 'vectorial' y tamaño
+    en puntos (no tienen resolución).
+    
+    Returns:
+        Dict con ancho, alto, modo y formato, o con el error encontrado
+    """
+    from PIL import Image
+    
+    if str(ruta).lower().endswith(('.svg', '.pdf')):
+        from logos_vectoriales import validar_logo_vectorial
+        
+        try:
+            ancho, alto = validar_logo_vectorial(ruta)
+        except ValueError as e:
+            return {'error': str(e)}
+        return {'ancho': round(ancho, 2), 'alto': round(alto, 2), 'modo': 'vectorial',
+                'formato': Path(ruta).suffix[1:].upper()}
+    
+    try:
+        with Image.open(ruta) as imagen:
+            imagen.verify()
+        # verify() invalida la imagen: se vuelve a abrir para decodificarla
+        with Image.open(ruta) as imagen:
+            imagen.load()
+            return {'ancho': imagen.width, 'alto': imagen.height,
+                    'modo': imagen.mode, 'formato': imagen.format}
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+
+
+def evaluar_imagen(hechos, tamano_cm, tipo):
+    """
+    Contrasta una imagen decodificada con su tamaño de impresión
+    
+    Args:
+        hechos: Resultado de _decodificar_imagen
+        tamano_cm: Lado de la caja donde se imprime, en cm
+        tipo: 'qr' o 'logo'
+        
+    Returns:
+        Tupla (errores, advertencias) con listas de textos
+    """
+    if 'error' in hechos:
+        return [f"No se puede decodificar ({hechos['error']})"], []
+    
+    errores = []
+    advertencias = []
+    modo = hechos['modo']
+    if modo == 'vectorial':
+        # Se imprime nítido a cualquier tamaño
+        return errores, advertencias
+    if modo not in MODOS_IMPRIMIBLES:
+        errores.append(f"Modo de color no imprimible: {modo}")
+    elif modo == 'CMYK':
+        advertencias.append("Imagen CMYK: los colores pueden variar respecto del resto")
+    
+    # preserveAspectRatio: el lado mayor ocupa la caja completa
+    dpi = max(hechos['ancho'], hechos['alto']) / (tamano_cm / 2.54)
+    if dpi < DPI_MINIMO:
+        advertencias.append(f"Resolución baja: {hechos['ancho']}x{hechos['alto']} px "
+                            f"a {tamano_cm:g} cm = {dpi:.0f} dpi (mínimo {DPI_MINIMO})")
+    if tipo == 'qr' and hechos['ancho'] != hechos['alto']:
+        advertencias.append(f"QR no cuadrado: {hechos['ancho']}x{hechos['alto']} px")
+    
+    return errores, advertencias
+
+
+def _cargar_cache_integridad(archivo_cache):
+    try:
+        with open(archivo_cache, 'r') as f:
+            datos = json.load(f)
+        if datos.get('version') == VERSION_CACHE_INTEGRIDAD:
+            return datos['archivos']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def verificar_imagenes(imagenes, workers=None, archivo_cache=ARCHIVO_CACHE_INTEGRIDAD):
+    """
+    Verifica la integridad de una lista de imágenes
+    
+    Args:
+        imagenes: Lista de tuplas (ruta, tipo, tamano_cm)
+        workers: Procesos para decodificar (None = todos los núcleos)
+        archivo_cache: JSON de caché por (ruta, tamaño, mtime); None = sin caché
+        
+    Returns:
+        Dict con el reporte: ok, archivos, decodificados, desde_cache,
+        errores y advertencias ([{archivo, tipo, problema}]) y segundos
+    """
+    inicio = time.perf_counter()
+    cache = _cargar_cache_integridad(archivo_cache) if archivo_cache else {}
+    resultados = {}
+    pendientes = []
+    desde_cache = 0
+    errores = []
+    advertencias = []
+    
+    for ruta, tipo, _ in imagenes:
+        clave = os.path.abspath(ruta)
+        if clave in resultados:
+            continue
+        try:
+            stat = os.stat(ruta)
+        except OSError as e:
+            resultados[clave] = {'error': f"{type(e).__name__}: {e.strerror}"}
+            continue
+        firma = [stat.st_size, stat.st_mtime_ns]
+        guardado = cache.get(clave)
+        if guardado and guardado[:2] == firma:
+            resultados[clave] = guardado[2]
+            desde_cache += 1
+        else:
+            resultados[clave] = None
+            pendientes.append((clave, firma))
+    
+    workers = workers or os.cpu_count() or 1
+    rutas = [clave for clave, _ in pendientes]
+    if workers > 1 and len(rutas) >= MINIMO_PARA_POOL:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            hechos = list(pool.map(_decodificar_imagen, rutas,
+                                   chunksize=max(1, len(rutas) // (workers * 4))))
+    else:
+        hechos = [_decodificar_imagen(ruta) for ruta in rutas]
+    
+    for (clave, firma), resultado in zip(pendientes, hechos):
+        resultados[clave] = resultado
+        cache[clave] = firma + [resultado]
+    
+    for ruta, tipo, tamano_cm in imagenes:
+        errores_imagen, advertencias_imagen = evaluar_imagen(
+            resultados[os.path.abspath(ruta)], tamano_cm, tipo)
+        errores.extend({'archivo': str(ruta), 'tipo': tipo, 'problema': problema}
+                       for problema in errores_imagen)
+        advertencias.extend({'archivo': str(ruta), 'tipo': tipo, 'problema': problema}
+                            for problema in advertencias_imagen)
+    
+    if archivo_cache and pendientes:
+        Path(archivo_cache).parent.mkdir(parents=True, exist_ok=True)
+        datos = {'version': VERSION_CACHE_INTEGRIDAD, 'archivos': cache}
+        guardar_atomico(json.dumps(datos).encode('utf-8'), archivo_cache, fsync=False)
+    
+    return {
+        'ok': not errores,
+        'archivos': len(resultados),
+        'decodificados': len(pendientes),
+        'desde_cache': desde_cache,
+        'errores': errores,
+        'advertencias': advertencias,
+        'segundos': round(time.perf_counter() - inicio, 3)
+    }
+
 
 class DiagnosticoProyecto:
     """Clase para diagnosticar el estado del proyecto"""
@@ -50,7 +241,8 @@ class DiagnosticoProyecto:
                 print(f"   Rango de IDs: {min(n for n, _ in qrs)} - {max(n for n, _ in qrs)}")
                 
                 # Calcular páginas necesarias
-                paginas = (len(qrs) + 31) // 32
+                filas_por_hoja = GeneradorPlanchasPDF.FILAS_TOTALES_POR_HOJA
+                paginas = (len(qrs) + filas_por_hoja - 1) // filas_por_hoja
                 print(f"   Páginas A3 necesarias: {paginas}")
                 print(f"   Total de stickers: {len(qrs) * 4} (Logo: {len(qrs)*2}, QR: {len(qrs)*2})")
                 
@@ -115,30 +307,86 @@ class DiagnosticoProyecto:
                 numero = int(match.group(1))
                 qrs.append((numero, archivo))
         
-        qrs.sort(key=lambda x: x[0])
+        qrs.sort(key=lambda x: (x[0], x[1].name))
         return qrs
     
     def _verificar_huecos(self, qrs):
-        """Verifica si hay huecos en la numeración"""
+        """Verifica huecos y números repetidos en la numeración (una pasada)"""
         if not qrs:
             return
         
-        numeros = [n for n, _ in qrs]
-        min_num = min(numeros)
-        max_num = max(numeros)
-        
-        esperados = set(range(min_num, max_num + 1))
-        encontrados = set(numeros)
-        faltantes = esperados - encontrados
+        _, huecos, duplicados = analizar_secuencia(qrs)
         
-        if faltantes:
+        if huecos:
+            faltantes = sum(fin - inicio + 1 for inicio, fin in huecos)
+            rangos = [str(inicio) if inicio == fin else f"{inicio}-{fin}"
+                      for inicio, fin in huecos[:10]]
             print(f"\n   ⚠️  ADVERTENCIA: Hay huecos en la numeración")
-            print(f"      IDs faltantes: {sorted(faltantes)[:10]}", end="")
-            if len(faltantes) > 10:
-                print(f"... ({len(faltantes)} en total)")
+            print(f"      IDs faltantes: {', '.join(rangos)}", end="")
+            if len(huecos) > 10:
+                print(f"... ({faltantes} en total)")
             else:
                 print()
-            self.advertencias.append(f"{len(faltantes)} IDs faltantes en la secuencia")
+            self.advertencias.append(f"{faltantes} IDs faltantes en la secuencia")
+        
+        if duplicados:
+            print(f"\n   ⚠️  ADVERTENCIA: Hay IDs repetidos (solo se imprime el primero)")
+            for numero, rutas in list(duplicados.items())[:10]:
+                print(f"      ID {numero}: {', '.join(ruta.name for ruta in rutas)}")
+            if len(duplicados) > 10:
+                print(f"      ... ({len(duplicados)} en total)")
+            self.advertencias.append(f"{len(duplicados)} IDs repetidos")
+    
+    def verificar_integridad(self, mapeo=None, workers=None,
+                             archivo_cache=ARCHIVO_CACHE_INTEGRIDAD, salida_json=False):
+        """
+        Decodifica cada QR y logo y los contrasta con el tamaño de impresión
+        
+        Args:
+            mapeo: JSON de logos especiales (opcional)
+            workers: Procesos para decodificar (None = todos los núcleos)
+            archivo_cache: JSON de caché (None = verificar todo de nuevo)
+            salida_json: Si True, imprime el reporte en JSON
+            
+        Returns:
+            Dict con el reporte (ver verificar_imagenes)
+        """
+        tamano_logo = GeneradorPlanchasPDF.TAMANO_LOGO / cm
+        tamano_qr = GeneradorPlanchasPDF.TAMANO_QR / cm
+        
+        imagenes = [(self.archivo_logo, 'logo', tamano_logo)]
+        if mapeo:
+            imagenes.extend((Path(ruta), 'logo', tamano_logo)
+                            for ruta in sorted(MapeoLogosRangos.cargar(mapeo).rutas()))
+        if self.carpeta_qrs.exists():
+            imagenes.extend((ruta, 'qr', tamano_qr) for _, ruta in self._obtener_qrs())
+        
+        reporte = verificar_imagenes(imagenes, workers, archivo_cache)
+        
+        if salida_json:
+            print(json.dumps(reporte, indent=2, ensure_ascii=False))
+            return reporte
+        
+        print("=" * 70)
+        print("🔬 VERIFICACIÓN DE INTEGRIDAD DE IMÁGENES")
+        print("=" * 70)
+        print(f"   Imágenes: {reporte['archivos']} "
+              f"({reporte['decodificados']} decodificadas, {reporte['desde_cache']} desde caché)")
+        print(f"   Tiempo: {reporte['segundos']:.2f}s")
+        
+        for titulo, icono, problemas in (("Errores", "❌", reporte['errores']),
+                                         ("Advertencias", "⚠️ ", reporte['advertencias'])):
+            if problemas:
+                print(f"\n{icono} {titulo}: {len(problemas)}")
+                for problema in problemas[:20]:
+                    print(f"   • {problema['archivo']}: {problema['problema']}")
+                if len(problemas) > 20:
+                    print(f"   ... ({len(problemas)} en total)")
+        
+        if reporte['ok']:
+            print("\n✅ Todas las imágenes se pueden imprimir")
+        print("=" * 70)
+        return reporte
     
     def _verificar_dependencias(self):
         """Verifica las dependencias de Python"""
@@ -202,7 +450,28 @@ class DiagnosticoProyecto:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Diagnóstico del proyecto")
+    parser.add_argument('--integridad', action='store_true',
+                        help="Decodificar y verificar cada QR y logo (preflight)")
+    parser.add_argument('--qrs', default='qrs', help="Carpeta de QRs")
+    parser.add_argument('--logo', default='logo.png', help="Logo principal")
+    parser.add_argument('--mapeo', help="JSON de logos especiales por rango de IDs")
+    parser.add_argument('--workers', type=int, help="Procesos (por defecto, todos los núcleos)")
+    parser.add_argument('--cache', default=str(ARCHIVO_CACHE_INTEGRIDAD),
+                        help="Archivo de caché de la verificación")
+    parser.add_argument('--sin-cache', action='store_true', help="Verificar todo de nuevo")
+    parser.add_argument('--json', action='store_true', help="Reporte en JSON")
+    args = parser.parse_args()
+    
     diagnostico = DiagnosticoProyecto()
+    diagnostico.carpeta_qrs = Path(args.qrs)
+    diagnostico.archivo_logo = Path(args.logo)
+    
+    if args.integridad:
+        reporte = diagnostico.verificar_integridad(
+            args.mapeo, args.workers, None if args.sin_cache else args.cache, args.json)
+        return 0 if reporte['ok'] else 1
+    
     diagnostico.verificar_estructura()
     
     return 0 if not diagnostico.errores else 1
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vigilancia de la carpeta de QRs con render automático
+
+Observa la carpeta donde el proveedor deja los archivos whokey-NNN.png y,
+cuando una ráfaga de archivos nuevos se calma, genera un PDF solo con las
+páginas nuevas que ya están completas (28 filas). Cada tanda se agrega a
+una serie numerada (planchas_0001.pdf, planchas_0002.pdf, ...), así la
+imprenta puede empezar mientras el proveedor sigue entregando.
+
+- En Linux usa inotify (sin dependencias extra); en otros sistemas, o con
+  --sondeo, revisa la carpeta periódicamente
+- Los IDs ya impresos se guardan en un archivo de estado: reiniciar el
+  vigilante no reimprime nada
+- Las filas que no llegan a completar una página esperan a los próximos
+  QRs, o se imprimen tras --vaciar-tras segundos sin novedades
+
+Uso:
+    python vigilar_carpeta.py --qrs qrs --salida output/serie
+    python vigilar_carpeta.py --mapeo logos_especiales_mapeo.json --vaciar-tras 600
+    python vigilar_carpeta.py --una-vez      # procesa lo pendiente y termina
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from almacenamiento import guardar_atomico
+from mapeo_logos import MapeoLogosRangos
+from pdf_generator import GeneradorPlanchasPDF, RangosIds
+
+
+# Segundos sin archivos nuevos antes de renderizar una ráfaga
+ESPERA_RAFAGA = 2.0
+
+# Si la entrega no se detiene, renderizar igual tras este tiempo (segundos)
+ESPERA_MAXIMA_RAFAGA = 30.0
+
+# Intervalo de revisión en modo sondeo (segundos)
+INTERVALO_SONDEO = 1.0
+
+# Archivo de estado dentro de la carpeta de salida
+ARCHIVO_ESTADO = '.vigilancia.json'
+
+# Eventos inotify: archivo cerrado tras escribir o movido a la carpeta
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+_EVENTO_INOTIFY = struct.Struct('iIII')
+
+
+class _Inotify:
+    """Acceso mínimo a inotify de Linux mediante ctypes"""
+
+    def __init__(self, carpeta):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify no disponible")
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+
+        if libc.inotify_add_watch(self.fd, os.fsencode(carpeta),
+                                  IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"No se pudo vigilar {carpeta}")
+
+    def esperar(self, timeout):
+        """
+        Espera eventos hasta timeout segundos
+
+        Returns:
+            Lista de nombres de archivo con eventos
+        """
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return []
+
+        try:
+            datos = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        nombres = []
+        posicion = 0
+        while posicion < len(datos):
+            _, _, _, largo = _EVENTO_INOTIFY.unpack_from(datos, posicion)
+            posicion += _EVENTO_INOTIFY.size
+            nombre = datos[posicion:posicion + largo].rstrip(b'\0')
+            posicion += largo
+            if nombre:
+                nombres.append(os.fsdecode(nombre))
+        return nombres
+
+    def cerrar(self):
+        os.close(self.fd)
+
+
+def _png_completo(ruta):
+    """True si el PNG termina con su bloque IEND (no se está escribiendo)"""
+    try:
+        with open(ruta, 'rb') as f:
+            f.seek(-12, os.SEEK_END)
+            return f.read(12)[4:8] == b'IEND'
+    except OSError:
+        return False
+
+
+class VigilanteCarpeta:
+    """Renderiza de forma incremental los QRs que van llegando a una carpeta"""
+
+    def __init__(self, carpeta_qrs="qrs", logo_principal="logo.png", archivo_mapeo=None,
+                 carpeta_salida="output/serie", espera=ESPERA_RAFAGA,
+                 espera_maxima=ESPERA_MAXIMA_RAFAGA, intervalo=INTERVALO_SONDEO,
+                 vaciar_tras=0, sondeo=False, verbose=True):
+        """
+        Inicializa el vigilante
+
+        Args:
+            carpeta_qrs: Carpeta donde llegan los archivos QR
+            logo_principal: Ruta al logo por defecto
+            archivo_mapeo: JSON de logos especiales (se relee en cada tanda)
+            carpeta_salida: Carpeta de la serie de PDFs
+            espera: Segundos sin novedades antes de renderizar
+            espera_maxima: Segundos máximos de espera con entrega continua
+            intervalo: Segundos entre revisiones en modo sondeo
+            vaciar_tras: Segundos sin novedades para imprimir una página
+                incompleta (0 = solo páginas completas)
+            sondeo: Si True, no usa inotify
+            verbose: Si True, muestra mensajes en consola
+        """
+        self.carpeta_qrs = Path(carpeta_qrs)
+        self.logo_principal = logo_principal
+        self.archivo_mapeo = archivo_mapeo
+        self.carpeta_salida = Path(carpeta_salida)
+        self.espera = espera
+        self.espera_maxima = espera_maxima
+        self.intervalo = intervalo
+        self.vaciar_tras = vaciar_tras
+        self.sondeo = sondeo
+        self.verbose = verbose
+
+        self.carpeta_salida.mkdir(parents=True, exist_ok=True)
+        self.archivo_estado = self.carpeta_salida / ARCHIVO_ESTADO
+        self.impresos = RangosIds()
+        self.siguiente = 1
+        self._instantanea = None
+        self._ultimo_aviso = None
+        self._cargar_estado()
+
+    def _cargar_estado(self):
+        if not self.archivo_estado.exists():
+            return
+        with open(self.archivo_estado, 'r') as f:
+            estado = json.load(f)
+        self.impresos = RangosIds(tuple(rango) for rango in estado.get('impresos', []))
+        self.siguiente = estado.get('siguiente', 1)
+
+    def _guardar_estado(self):
+        estado = {'impresos': self.impresos.rangos, 'siguiente': self.siguiente}
+        guardar_atomico(json.dumps(estado).encode('utf-8'), self.archivo_estado)
+
+    def _avisar(self, mensaje):
+        """Muestra un aviso una sola vez mientras no cambie (el bucle reintenta seguido)"""
+        if self.verbose and mensaje != self._ultimo_aviso:
+            print(mensaje)
+        self._ultimo_aviso = mensaje
+
+    def _crear_generador(self):
+        mapeo = None
+        if self.archivo_mapeo:
+            mapeo = MapeoLogosRangos.cargar(self.archivo_mapeo)
+        return GeneradorPlanchasPDF(self.carpeta_qrs, self.logo_principal, mapeo)
+
+    def pendientes(self, generador):
+        """
+        QRs completos que todavía no se imprimieron
+
+        Returns:
+            Lista ordenada de tuplas (numero_id, ruta_qr)
+        """
+        try:
+            generador.validar_archivos()
+        except FileNotFoundError as e:
+            # Carpeta vacía o logo ausente: se reintenta en la próxima tanda
+            motivos = str(e).replace('\n', '\n   ')
+            self._avisar(f"⏸️  Sin imprimir por ahora:\n   {motivos}")
+            return []
+        self._ultimo_aviso = None
+        return [(numero_id, ruta) for numero_id, ruta in generador.qrs_ordenados
+                if numero_id not in self.impresos and _png_completo(ruta)]
+
+    def procesar(self, vaciar=False):
+        """
+        Renderiza las páginas completas pendientes como un nuevo PDF de la serie
+
+        Args:
+            vaciar: Si True, también imprime la última página incompleta
+
+        Returns:
+            Ruta del PDF generado, o None si no había páginas para imprimir
+        """
+        generador = self._crear_generador()
+        pendientes = self.pendientes(generador)
+
+        filas_por_hoja = generador.FILAS_TOTALES_POR_HOJA
+        filas = len(pendientes) if vaciar else len(pendientes) // filas_por_hoja * filas_por_hoja
+        if not filas:
+            return None
+
+        ids = RangosIds((numero_id, numero_id) for numero_id, _ in pendientes[:filas])
+        archivo = self.carpeta_salida / f"planchas_{self.siguiente:04d}.pdf"
+        temporal = self.carpeta_salida / f".{archivo.name}.tmp"
+
+        try:
+            _, estadisticas = generador.generar_pdf(str(temporal), verbose=False, ids=ids)
+            os.replace(temporal, archivo)
+        except BaseException:
+            temporal.unlink(missing_ok=True)
+            raise
+
+        self.impresos = RangosIds(self.impresos.rangos + ids.rangos)
+        self.siguiente += 1
+        self._guardar_estado()
+
+        if self.verbose:
+            print(f"🖨️  {archivo.name}: IDs {ids.texto()} "
+                  f"({estadisticas['total_paginas']} página(s))")
+            for advertencia in estadisticas['advertencias']:
+                print(f"   ⚠️  {advertencia}")
+            restantes = len(pendientes) - filas
+            if restantes:
+                print(f"   ⏳ {restantes} fila(s) esperando completar página")
+
+        return archivo
+
+    def _procesar_tanda(self, vaciar=False):
+        """
+        Como procesar(), pero un error solo se informa: los IDs de la tanda
+        siguen pendientes y la vigilancia continúa
+        """
+        try:
+            self.procesar(vaciar)
+        except Exception as e:
+            if self.verbose:
+                print(f"❌ Error al imprimir la tanda (se reintenta en la próxima): {e}")
+
+    def _hubo_cambios_sondeo(self):
+        """Compara la carpeta con la revisión anterior (nombres, tamaños, fechas)"""
+        instantanea = {}
+        try:
+            with os.scandir(self.carpeta_qrs) as entradas:
+                for entrada in entradas:
+                    if entrada.name.lower().endswith('.png'):
+                        st = entrada.stat()
+                        instantanea[entrada.name] = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+
+        cambio = self._instantanea is not None and instantanea != self._instantanea
+        self._instantanea = instantanea
+        return cambio
+
+    def ejecutar(self):
+        """Vigila la carpeta hasta que se interrumpa con Ctrl+C"""
+        self.carpeta_qrs.mkdir(parents=True, exist_ok=True)
+
+        inotify = None
+        if not self.sondeo:
+            try:
+                inotify = _Inotify(self.carpeta_qrs)
+            except (OSError, AttributeError):
+                inotify = None
+
+        if self.verbose:
+            modo = 'inotify' if inotify else f'sondeo cada {self.intervalo}s'
+            print(f"👀 Vigilando {self.carpeta_qrs} ({modo})")
+            print(f"   Serie de salida: {self.carpeta_salida} "
+                  f"(próximo: planchas_{self.siguiente:04d}.pdf)")
+
+        # Lo que ya estaba en la carpeta al arrancar
+        self._procesar_tanda()
+
+        inicio_rafaga = None
+        ultimo_cambio = None
+        ultima_actividad = time.monotonic()
+        try:
+            while True:
+                if inotify:
+                    hubo = any(nombre.lower().endswith('.png')
+                               for nombre in inotify.esperar(self.intervalo))
+                else:
+                    time.sleep(self.intervalo)
+                    hubo = self._hubo_cambios_sondeo()
+
+                ahora = time.monotonic()
+                if hubo:
+                    inicio_rafaga = inicio_rafaga or ahora
+                    ultimo_cambio = ahora
+                    ultima_actividad = ahora
+
+                if ultimo_cambio is not None and (
+                        ahora - ultimo_cambio >= self.espera
+                        or ahora - inicio_rafaga >= self.espera_maxima):
+                    self._procesar_tanda()
+                    inicio_rafaga = None
+                    ultimo_cambio = None
+                elif self.vaciar_tras and ahora - ultima_actividad >= self.vaciar_tras:
+                    self._procesar_tanda(vaciar=True)
+                    ultima_actividad = ahora
+        except KeyboardInterrupt:
+            if self.verbose:
+                print("\n👋 Vigilancia detenida")
+        finally:
+            if inotify:
+                inotify.cerrar()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Render automático de QRs nuevos")
+    parser.add_argument('--qrs', default='qrs', help="Carpeta a vigilar")
+    parser.add_argument('--logo', default='logo.png', help="Logo por defecto")
+    parser.add_argument('--mapeo', help="JSON de logos especiales por rango de IDs")
+    parser.add_argument('--salida', default='output/serie', help="Carpeta de la serie de PDFs")
+    parser.add_argument('--espera', type=float, default=ESPERA_RAFAGA,
+                        help="Segundos sin novedades antes de renderizar")
+    parser.add_argument('--espera-maxima', type=float, default=ESPERA_MAXIMA_RAFAGA,
+                        help="Renderizar aunque la entrega siga tras estos segundos")
+    parser.add_argument('--vaciar-tras', type=float, default=0,
+                        help="Imprimir la página incompleta tras N segundos sin novedades")
+    parser.add_argument('--sondeo', action='store_true', help="No usar inotify")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_SONDEO,
+                        help="Segundos entre revisiones")
+    parser.add_argument('--una-vez', action='store_true',
+                        help="Imprimir todo lo pendiente (incluida la última página) y salir")
+    parser.add_argument('--silencioso', action='store_true')
+    args = parser.parse_args()
+
+    vigilante = VigilanteCarpeta(
+        carpeta_qrs=args.qrs,
+        logo_principal=args.logo,
+        archivo_mapeo=args.mapeo,
+        carpeta_salida=args.salida,
+        espera=args.espera,
+        espera_maxima=args.espera_maxima,
+        intervalo=args.intervalo,
+        vaciar_tras=args.vaciar_tras,
+        sondeo=args.sondeo,
+        verbose=not args.silencioso
+    )
+
+    try:
+        if args.una_vez:
+            if vigilante.procesar(vaciar=True) is None and not args.silencioso:
+                print("✓ No hay QRs pendientes de imprimir")
+        else:
+            vigilante.ejecutar()
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())